@@ -0,0 +1,189 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """
+    Raised when no connection becomes available within the checkout timeout.
+    """
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of SQLite connections.
+
+    Connections are opened lazily up to the pool size and are kept open between queries, so queries skip the
+    connection setup and the page cache of every connection stays warm. A thread checks a connection out for the
+    duration of a connection() block; nested blocks of the same thread get the same connection back. A connection
+    which has been idle for longer than the health check interval is tested before it is handed out and replaced if
+    it does not respond.
+    """
+
+    def __init__(self, connect, size=8, timeout=5.0, health_check_interval=30.0):
+        """
+        :param connect: Function without arguments opening a new connection.
+        :type connect: callable
+        :param size: Maximum number of open connections.
+        :type size: int
+        :param timeout: Seconds to wait for a free connection before PoolTimeoutError is raised.
+        :type timeout: float
+        :param health_check_interval: Idle seconds after which a connection is tested before it is handed out.
+        :type health_check_interval: float
+        """
+        if size < 1:
+            raise ValueError(f"Connection pool size must be positive, got {size}")
+        self.__connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.__idle = queue.LifoQueue()
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        self.__opened = 0
+        self.__closed = False
+        self.__stats = {"checkouts": 0, "waits": 0, "replaced": 0}
+
+    @contextmanager
+    def connection(self):
+        """
+        Checks a connection out for the current thread for the duration of the block.
+
+        :return: The checked out connection.
+        :rtype: sqlite3.Connection
+        """
+        conn = getattr(self.__local, "connection", None)
+        if conn is not None:
+            self.__local.depth += 1
+            try:
+                yield conn
+            finally:
+                self.__local.depth -= 1
+            return
+
+        conn = self.acquire()
+        self.__local.connection = conn
+        self.__local.depth = 0
+        try:
+            yield conn
+        finally:
+            self.__local.connection = None
+            self.release(conn)
+
+    def acquire(self):
+        """
+        Takes a connection out of the pool without binding it to the current thread. It must be given back with
+        release().
+
+        :return: A healthy connection.
+        :rtype: sqlite3.Connection
+        :raises PoolTimeoutError: If no connection becomes available within the timeout.
+        """
+        if self.__closed:
+            raise sqlite3.ProgrammingError("Connection pool has been closed")
+        with self.__lock:
+            self.__stats["checkouts"] += 1
+
+        while True:
+            try:
+                conn, released = self.__idle.get_nowait()
+            except queue.Empty:
+                conn = self.__open()
+                if conn is not None:
+                    return conn
+                with self.__lock:
+                    self.__stats["waits"] += 1
+                try:
+                    conn, released = self.__idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise PoolTimeoutError(f"No database connection available within {self.timeout} s")
+
+            if time.monotonic() - released < self.health_check_interval or self.__is_healthy(conn):
+                return conn
+            self.__discard(conn)
+            with self.__lock:
+                self.__stats["replaced"] += 1
+
+    def release(self, conn):
+        """
+        Gives a connection taken with acquire() back to the pool.
+
+        :param conn: The connection.
+        :type conn: sqlite3.Connection
+        """
+        if self.__closed:
+            self.__discard(conn)
+            return
+        self.__idle.put((conn, time.monotonic()))
+
+    def close(self):
+        """
+        Closes all idle connections. Connections still checked out are closed when they are released.
+        """
+        self.__closed = True
+        while True:
+            try:
+                conn, _ = self.__idle.get_nowait()
+            except queue.Empty:
+                break
+            self.__discard(conn)
+
+    def stats(self):
+        """
+        Returns the runtime statistics of the pool.
+
+        :return: Pool size, open, idle and checked out connections, number of checkouts, checkouts which had to
+            wait for a connection and connections replaced after a failed health check.
+        :rtype: dict
+        """
+        with self.__lock:
+            idle = self.__idle.qsize()
+            return {
+                "size": self.size,
+                "open": self.__opened,
+                "idle": idle,
+                "in_use": self.__opened - idle,
+                **self.__stats
+            }
+
+    def __open(self):
+        """
+        Opens a new connection if the pool is not full yet.
+
+        :return: The new connection, or None if the pool is full.
+        :rtype: sqlite3.Connection
+        """
+        with self.__lock:
+            if self.__opened >= self.size:
+                return None
+            self.__opened += 1
+        try:
+            return self.__connect()
+        except BaseException:
+            with self.__lock:
+                self.__opened -= 1
+            raise
+
+    def __discard(self, conn):
+        """
+        Closes a connection and frees its place in the pool.
+        """
+        with self.__lock:
+            self.__opened -= 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @staticmethod
+    def __is_healthy(conn):
+        """
+        Checks whether the connection still responds.
+        """
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
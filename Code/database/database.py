@@ -1,14 +1,122 @@
 import os
 import sys
+import re
+import json
 import sqlite3
+import pathlib
+import threading
+from itertools import islice
+from contextlib import contextmanager
 import bcrypt
 from Code.utils import tms_logs
+from Code.database.connection_pool import ConnectionPool
+from Code.database.storage_profile import WalCheckpointer
+from Code.utils.name_matching import name_keys, column_keys, fold_name, edit_distance
+from Code.utils.taxpayer_columns import PERSONAL_INFO_COLUMNS, CONTACT_INFO_COLUMNS, TAX_INFO_COLUMNS, TAXPAYER_COLUMNS
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_WRITE_POOL_SIZE = 2
+DEFAULT_POOL_TIMEOUT = 5.0
+DEFAULT_HEALTH_CHECK_INTERVAL = 30.0
+DEFAULT_WAL_CHECKPOINT_INTERVAL = 60.0
+DEFAULT_BULK_CHUNK_SIZE = 5000
+
+# Maximum number of people a fuzzy search reads from the name key index before ranking them
+MAX_FUZZY_CANDIDATES = 10000
+
+# Search results with more rows are not kept in the search result cache
+SEARCH_CACHE_MAX_ROWS = 1000
+
+# Table every taxpayer column is read from, the national ID is read from personal_info
+COLUMN_TABLES = {column: table for table, columns in (("tax_info", TAX_INFO_COLUMNS),
+                                                       ("contact_info", CONTACT_INFO_COLUMNS),
+                                                       ("personal_info", PERSONAL_INFO_COLUMNS))
+                 for column in columns}
+
+
+def select_list(columns, allowed=TAXPAYER_COLUMNS):
+    """
+    Builds the select list of a query reading the given taxpayer columns. Only known column names are accepted, so
+    columns requested by clients cannot inject SQL.
+
+    :param columns: The column names, in the order of the result rows.
+    :type columns: tuple of str
+    :param allowed: The columns which may be selected.
+    :type allowed: tuple of str
+    :return: The columns qualified with their table names, separated by commas.
+    :rtype: str
+    :raises ValueError: If no column or an unknown column is given.
+    """
+    unknown = [column for column in columns if column not in allowed]
+    if not columns or unknown:
+        raise ValueError(f"Columns must be some of {', '.join(allowed)}, got {', '.join(map(str, columns))}")
+    return ", ".join(f"{COLUMN_TABLES[column]}.{column}" for column in columns)
+
+
+def read_db_config(config_path):
+    """
+    Reads the database configuration file.
+
+    :param config_path: The path to the configuration file.
+    :type config_path: str
+    :return: The configuration, or an empty dict if the file does not exist, so the defaults are used.
+    :rtype: dict
+    """
+    if not os.path.exists(config_path):
+        return {}
+    with open(config_path, 'r') as config_file:
+        return json.load(config_file)
 
 
 class DatabaseServices:
-    def __init__(self, db_file=None, tms_logger=None):
+    def __init__(self, db_file=None, tms_logger=None, pool_size=DEFAULT_POOL_SIZE, pool_timeout=DEFAULT_POOL_TIMEOUT,
+                 health_check_interval=DEFAULT_HEALTH_CHECK_INTERVAL, write_pool_size=DEFAULT_WRITE_POOL_SIZE,
+                 storage_profile=None, wal_checkpoint_interval=DEFAULT_WAL_CHECKPOINT_INTERVAL,
+                 wal_checkpoint_mode="PASSIVE", search_cache=None):
+        """
+        Queries are split between two connection pools: SELECT queries run on read-only connections and are never
+        committed, all other queries and transactions run on the connections of the write pool.
+
+        :param db_file: The database file, relative paths are resolved in the database directory.
+        :type db_file: str
+        :param tms_logger: The logger, a new one is created if None.
+        :type tms_logger: TMSLogger, optional
+        :param pool_size: Maximum number of pooled read-only connections.
+        :type pool_size: int
+        :param pool_timeout: Seconds a query waits for a free pooled connection.
+        :type pool_timeout: float
+        :param health_check_interval: Idle seconds after which a pooled connection is tested before it is reused.
+        :type health_check_interval: float
+        :param write_pool_size: Maximum number of pooled connections for writes and transactions.
+        :type write_pool_size: int
+        :param storage_profile: Storage engine settings applied to every pooled connection when it is opened.
+        :type storage_profile: StorageProfile, optional
+        :param wal_checkpoint_interval: Seconds between background WAL checkpoints when the storage profile uses WAL
+            journaling, 0 disables them.
+        :type wal_checkpoint_interval: float
+        :param wal_checkpoint_mode: The mode of the background WAL checkpoints.
+        :type wal_checkpoint_mode: str
+        :param search_cache: Cache of personal_info search results. Its entries are keyed by the data version of
+            the database file, which changes with every committed write of any process, so a cached result is not
+            served after the data has changed.
+        :type search_cache: TTLCache, optional
+        """
         self.db_file = db_file
+        self.storage_profile = storage_profile
+        self.__wal_checkpoint_interval = wal_checkpoint_interval
+        self.__wal_checkpoint_mode = wal_checkpoint_mode
+        self.__storage_prepared = storage_profile is None
+        self.__storage_lock = threading.Lock()
+        self.__checkpointer = None
         self.app_mode = os.getenv('APP_MODE', 'server').lower()
+        # Connection of the transaction opened by the current thread, see transaction()
+        self.__local = threading.local()
+        # Functions notified about saved users, see add_write_listener()
+        self.__write_listeners = []
+        self.__search_cache = search_cache
+        # Connection only used to read the data version of the search cache keys, see __data_version()
+        self.__change_monitor = None
+        self.__monitor_lock = threading.Lock()
 
         if tms_logger is None:
             logger_type = "server" if self.app_mode == "server" else "client"
@@ -22,12 +130,17 @@ class DatabaseServices:
             self.tms_logger.log_debug("Initializing in server mode")
             if self.db_file:
                 self.tms_logger.log_debug(f"DB file provided: {self.db_file}")
-                self.conn, self.cursor = self.connect_to_database()
+                # The path is resolved once, pooled connections are opened straight away
+                self.__db_path = self.get_database_path()
+                self.__read_pool = ConnectionPool(self.__open_read_connection, size=pool_size, timeout=pool_timeout,
+                                                  health_check_interval=health_check_interval)
+                self.__write_pool = ConnectionPool(self.__open_write_connection, size=write_pool_size,
+                                                   timeout=pool_timeout, health_check_interval=health_check_interval)
             else:
                 raise ValueError("Database file must be specified for server mode.")
         else:
             self.tms_logger.log_debug("Initializing in client mode")
-            self.conn = self.cursor = None
+            self.__read_pool = self.__write_pool = None
 
     def get_database_path(self):
         if self.app_mode == 'server':
@@ -71,9 +184,283 @@ class DatabaseServices:
         else:
             return None, None
 
+    def __prepare_storage(self):
+        """
+        Applies the storage profile to the database file before the first pooled connection is opened: the journal
+        mode is switched on a separate connection, since read-only connections cannot change it, and the background
+        WAL checkpoints are started.
+        """
+        with self.__storage_lock:
+            if self.__storage_prepared:
+                return
+            conn = sqlite3.connect(self.__db_path)
+            try:
+                self.storage_profile.apply(conn)
+            finally:
+                conn.close()
+            self.__storage_prepared = True
+            self.tms_logger.log_debug(f"Storage profile applied: {self.storage_profile.report()}")
+            if self.storage_profile.wal and self.__wal_checkpoint_interval:
+                self.__checkpointer = WalCheckpointer(self.__write_pool, self.__wal_checkpoint_interval,
+                                                      self.__wal_checkpoint_mode, self.tms_logger)
+                self.__checkpointer.start()
+
+    def __open_read_connection(self):
+        """
+        Opens a read-only connection for the read pool. Pooled connections are handed to different threads over time.
+        """
+        if not self.__storage_prepared:
+            self.__prepare_storage()
+        uri = pathlib.Path(os.path.abspath(self.__db_path)).as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        if self.storage_profile is not None:
+            self.storage_profile.apply(conn, read_only=True)
+        return conn
+
+    def __open_write_connection(self):
+        """
+        Opens a connection for the write pool.
+        """
+        if not self.__storage_prepared:
+            self.__prepare_storage()
+        conn = sqlite3.connect(self.__db_path, check_same_thread=False)
+        if self.storage_profile is not None:
+            self.storage_profile.apply(conn)
+        return conn
+
+    @staticmethod
+    def is_read_query(query):
+        """
+        Tells whether a query only reads, so it can run on a read-only connection.
+
+        :param query: The SQL query.
+        :type query: str
+        :rtype: bool
+        """
+        return query.lstrip().upper().startswith("SELECT")
+
+    def add_write_listener(self, listener):
+        """
+        Registers a function which is called with the national IDs of users after they have been saved, e.g. to
+        invalidate cached copies of their data.
+
+        :param listener: Function called with a list of national IDs.
+        :type listener: callable
+        """
+        self.__write_listeners.append(listener)
+
+    def __notify_write_listeners(self, national_ids):
+        """
+        Tells the write listeners which users have been saved.
+        """
+        for listener in self.__write_listeners:
+            try:
+                listener(national_ids)
+            except Exception as exception:
+                # The users are saved already, a failing listener must not turn the save into an error
+                self.tms_logger.log_error(f"Write listener failed: {exception}")
+
+    def __data_version(self):
+        """
+        Returns the data version of the database file. SQLite changes it whenever a transaction is committed through
+        another connection, and the monitor connection never writes, so it changes with every write of this and of
+        all other server processes.
+
+        :rtype: int
+        """
+        with self.__monitor_lock:
+            if self.__change_monitor is None:
+                self.__change_monitor = self.__open_read_connection()
+            return self.__change_monitor.execute("PRAGMA data_version").fetchone()[0]
+
+    def search_cache_stats(self):
+        """
+        Returns the statistics of the search result cache.
+
+        :return: The cache statistics and the current data version, None before the first cached search, or None if
+            there is no cache.
+        :rtype: dict
+        """
+        if self.__search_cache is None:
+            return None
+        # Reporting statistics must not open the database
+        with self.__monitor_lock:
+            monitored = self.__change_monitor is not None
+        return {**self.__search_cache.stats(), "data_version": self.__data_version() if monitored else None}
+
+    def __cached_search(self, criteria, search):
+        """
+        Returns the result of a search from the search result cache, or runs the search and caches its result.
+
+        :param criteria: The normalized search criteria, the search method included.
+        :type criteria: tuple
+        :param search: Function without arguments running the search.
+        :type search: callable
+        :rtype: list
+        """
+        if self.__search_cache is None or self.in_transaction():
+            return search()
+        # The data version is read before the search, a result read while a write commits is stored as outdated
+        key = (self.__data_version(), criteria)
+        rows = self.__search_cache.get(key)
+        if rows is not None:
+            return list(rows)
+        rows = search()
+        if len(rows) <= SEARCH_CACHE_MAX_ROWS:
+            self.__search_cache.put(key, tuple(rows))
+        return rows
+
+    def __cached_iter(self, criteria, iterate, chunk_size):
+        """
+        Yields the result of a search in chunks, from the search result cache if it is there. A result streamed
+        from the database is cached once it has been read completely.
+
+        :param criteria: The normalized search criteria, the search method included.
+        :type criteria: tuple
+        :param iterate: Function without arguments returning a generator of chunks of rows.
+        :type iterate: callable
+        :param chunk_size: Maximum number of rows in one chunk of a cached result.
+        :type chunk_size: int
+        :return: Generator of lists of rows.
+        :rtype: generator
+        """
+        if self.__search_cache is None or self.in_transaction():
+            chunks = iterate()
+            try:
+                yield from chunks
+            finally:
+                chunks.close()
+            return
+
+        key = (self.__data_version(), criteria)
+        rows = self.__search_cache.get(key)
+        if rows is not None:
+            for start in range(0, len(rows), chunk_size):
+                yield list(rows[start:start + chunk_size])
+            return
+
+        collected = []
+        chunks = iterate()
+        try:
+            for chunk in chunks:
+                if collected is not None:
+                    collected.extend(chunk)
+                    if len(collected) > SEARCH_CACHE_MAX_ROWS:
+                        collected = None
+                yield chunk
+        finally:
+            chunks.close()
+        if collected is not None:
+            self.__search_cache.put(key, tuple(collected))
+
+    @staticmethod
+    def __normalize_national_id(national_id):
+        """
+        Converts a national ID sent as text to a number, both match the same rows.
+        """
+        if isinstance(national_id, str) and national_id.strip().isdigit():
+            return int(national_id)
+        return national_id
+
+    def pool_stats(self):
+        """
+        Returns the runtime statistics of the connection pools.
+
+        :rtype: dict
+        """
+        if self.__read_pool is None:
+            return {}
+        return {"read": self.__read_pool.stats(), "write": self.__write_pool.stats()}
+
+    def storage_stats(self):
+        """
+        Reports the applied storage profile and the statistics of the background WAL checkpoints.
+
+        :rtype: dict
+        """
+        stats = self.storage_profile.report() if self.storage_profile is not None else {"profile": None}
+        if self.__checkpointer is not None:
+            stats["wal_checkpoints"] = self.__checkpointer.stats()
+        return stats
+
+    def close(self):
+        """
+        Stops the background WAL checkpoints and closes the pooled connections.
+        """
+        if self.__checkpointer is not None:
+            self.__checkpointer.stop()
+            self.__checkpointer = None
+        with self.__monitor_lock:
+            if self.__change_monitor is not None:
+                self.__change_monitor.close()
+                self.__change_monitor = None
+        if self.__read_pool is not None:
+            self.__read_pool.close()
+            self.__write_pool.close()
+
+    def in_transaction(self):
+        """
+        Tells whether the current thread has an open transaction, see transaction().
+
+        :rtype: bool
+        """
+        return getattr(self.__local, "connection", None) is not None
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs all queries executed by the current thread inside the block on one connection and in one transaction.
+        The transaction is committed when the block ends and rolled back if the block raises an exception. Nested
+        blocks are executed as savepoints of the outer transaction.
+
+        :return: The connection of the transaction.
+        :rtype: sqlite3.Connection
+        """
+        conn = getattr(self.__local, "connection", None)
+        if conn is not None:
+            self.__local.depth += 1
+            savepoint = f"sp_{self.__local.depth}"
+            conn.execute(f"SAVEPOINT {savepoint}")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+                raise
+            else:
+                conn.execute(f"RELEASE {savepoint}")
+            finally:
+                self.__local.depth -= 1
+            return
+
+        with self.__write_pool.connection() as conn:
+            isolation_level = conn.isolation_level
+            conn.isolation_level = None
+            try:
+                conn.execute("BEGIN")
+            except sqlite3.Error:
+                conn.isolation_level = isolation_level
+                raise
+
+            self.__local.connection = conn
+            self.__local.depth = 0
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute("COMMIT")
+            finally:
+                self.__local.connection = None
+                conn.isolation_level = isolation_level
+
     def execute_query(self, query, params=None):
         """
-        Executes a SQL query on the database.
+        Executes a SQL query on the database. Inside a transaction() block the query runs on the connection of the
+        transaction and errors are raised, so the caller can roll the whole transaction back. Outside of it, SELECT
+        queries run on a read-only connection without a commit, other queries are committed on a write connection.
 
         :param query: The SQL query to execute.
         :type query: str
@@ -81,23 +468,40 @@ class DatabaseServices:
         :type params: tuple, optional
         :rtype: list
         """
-        conn, cursor = self.connect_to_database()
-        try:
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            result = cursor.fetchall()
-            # Commit changes regardless of type of query
-            conn.commit()
-            return result
-        except sqlite3.Error as error:  # Catch database-related errors
-            self.tms_logger.log_critical(f"Error executing query: {query} with params: {params}, Error: {error}")
-            # Rollback changes in case of an error
-            conn.rollback()
-            return []
-        finally:
-            conn.close()
+        transaction_conn = getattr(self.__local, "connection", None)
+        if transaction_conn is not None:
+            cursor = transaction_conn.cursor()
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                return cursor.fetchall()
+            except sqlite3.Error as error:
+                self.tms_logger.log_critical(f"Error executing query: {query} with params: {params}, Error: {error}")
+                raise
+
+        read_query = self.is_read_query(query)
+        pool = self.__read_pool if read_query else self.__write_pool
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                result = cursor.fetchall()
+                if not read_query:
+                    conn.commit()
+                return result
+            except sqlite3.Error as error:  # Catch database-related errors
+                self.tms_logger.log_critical(f"Error executing query: {query} with params: {params}, Error: {error}")
+                if not read_query:
+                    # Rollback changes in case of an error
+                    conn.rollback()
+                return []
+            finally:
+                cursor.close()
 
     def check_credentials(self, username, password):
         """
@@ -110,29 +514,36 @@ class DatabaseServices:
         :return: True if the provided credentials are valid, False otherwise.
         :rtype: bool
         """
-        # Retrieve the hashed password from the database for the given username
-        query = "SELECT password FROM tms_users WHERE username = ?"
-        result = self.execute_query(query, (username,))
-
-        if result and len(result) > 0:
-            # Retrieve the stored hashed password
-            stored_hashed_password = result[0][0]
-
-            # Check if the entered password matches the stored hashed password
-            if bcrypt.checkpw(password.encode('utf-8'), stored_hashed_password.encode('utf-8')):
-                # Passwords match
-                return True
-            else:
-                # Passwords don't match
-                return False
-        else:
+        stored_hashed_password = self.get_password_hash(username)
+        if stored_hashed_password is None:
             # No user found with the given username
             return False
 
-    def search_personal_info(self, national_id, first_name, last_name, date_of_birth):
+        # Check if the entered password matches the stored hashed password
+        return bcrypt.checkpw(password.encode('utf-8'), stored_hashed_password.encode('utf-8'))
+
+    def get_password_hash(self, username):
+        """
+        Retrieves the bcrypt hash of the password of a user, so the password can be verified without holding a
+        database connection or lock.
+
+        :param username: The username.
+        :type username: str
+        :return: The hashed password, or None if there is no user with the given username.
+        :rtype: str or None
+        """
+        result = self.execute_query("SELECT password FROM tms_users WHERE username = ?", (username,))
+        return result[0][0] if result else None
+
+    def search_personal_info(self, national_id, first_name, last_name, date_of_birth, limit=None,
+                             after_national_id=None, columns=PERSONAL_INFO_COLUMNS):
         """
         Searches for user in the database based on different input parameters.
 
+        Without a limit all matching users are returned. With a limit the users are returned page by page, ordered by
+        national ID: the next page starts after the last national ID of the previous page (keyset pagination), so
+        every page costs the same no matter how deep into the results it is.
+
         :param national_id: The national ID of user.
         :type national_id: int
         :param first_name: The first name of user.
@@ -141,25 +552,368 @@ class DatabaseServices:
         :type last_name: str
         :param date_of_birth: The date of birth of user.
         :type date_of_birth: date
+        :param limit: Maximum number of returned users.
+        :type limit: int, optional
+        :param after_national_id: Only users with a greater national ID are returned.
+        :type after_national_id: int, optional
+        :param columns: The personal_info columns of the returned rows, national_id has to be the first one when the
+            results are paged.
+        :type columns: tuple of str, optional
         :return: A list of tuples containing user data retrieved from the database.
         :rtype: list of tuples
         """
         # Search for user match in personal_info table
-        query = ("SELECT * FROM personal_info WHERE national_id = ? OR first_name = ? OR last_name = ? "
-                 "OR date_of_birth = ?")
-        return self.execute_query(query, (national_id, first_name, last_name, date_of_birth))
+        national_id = self.__normalize_national_id(national_id)
+        search_query = self.__search_query(national_id, first_name, last_name, date_of_birth, limit, after_national_id,
+                                           columns)
+        return self.__cached_search(("personal_info",) + search_query, lambda: self.execute_query(*search_query))
+
+    def iter_personal_info(self, national_id, first_name, last_name, date_of_birth, limit=None,
+                           after_national_id=None, chunk_size=100, columns=PERSONAL_INFO_COLUMNS):
+        """
+        Searches for user like search_personal_info, but yields the matching users in chunks while SQLite produces
+        them instead of collecting the whole result first.
+
+        :param chunk_size: Maximum number of users in one chunk.
+        :type chunk_size: int
+        :return: Generator of lists of tuples containing user data.
+        :rtype: generator
+        """
+        national_id = self.__normalize_national_id(national_id)
+        search_query = self.__search_query(national_id, first_name, last_name, date_of_birth, limit, after_national_id,
+                                           columns)
+        return self.__cached_iter(("personal_info",) + search_query,
+                                  lambda: self.iter_query(*search_query, chunk_size=chunk_size), chunk_size)
+
+    def iter_query(self, query, params=None, chunk_size=100):
+        """
+        Executes a read-only SQL query and yields its rows in chunks as they are fetched from the cursor. The pooled
+        connection is given back when the generator is exhausted or closed. The generator may be resumed from
+        different threads, as long as it is not resumed concurrently.
+
+        :param query: The SQL query to execute.
+        :type query: str
+        :param params: Parameters for the query.
+        :type params: tuple, optional
+        :param chunk_size: Maximum number of rows in one chunk.
+        :type chunk_size: int
+        :return: Generator of lists of rows.
+        :rtype: generator
+        """
+        conn = self.__read_pool.acquire()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        except sqlite3.Error as error:
+            self.tms_logger.log_critical(f"Error executing query: {query} with params: {params}, Error: {error}")
+            raise
+        finally:
+            cursor.close()
+            self.__read_pool.release(conn)
+
+    @staticmethod
+    def __search_query(national_id, first_name, last_name, date_of_birth, limit, after_national_id, columns):
+        """
+        Builds the query searching personal_info, see search_personal_info.
+
+        :return: The query and its parameters.
+        :rtype: tuple
+        """
+        selected = select_list(columns, PERSONAL_INFO_COLUMNS)
+        condition = "national_id = ? OR first_name = ? OR last_name = ? OR date_of_birth = ?"
+        parameters = (national_id, first_name, last_name, date_of_birth)
+        if limit is None:
+            return f"SELECT {selected} FROM personal_info WHERE {condition}", parameters
+
+        if after_national_id is None:
+            return (f"SELECT {selected} FROM personal_info WHERE ({condition}) ORDER BY national_id LIMIT ?",
+                    parameters + (limit,))
+
+        return (f"SELECT {selected} FROM personal_info WHERE ({condition}) AND national_id > ? "
+                f"ORDER BY national_id LIMIT ?", parameters + (after_national_id, limit))
+
+    def search_personal_info_by_prefix(self, first_name, last_name, limit=None, after_national_id=None,
+                                       after_rank=None, columns=PERSONAL_INFO_COLUMNS):
+        """
+        Searches for users whose names start with the given text, using the full-text index of personal_info.
+
+        Every word of the first name has to match the beginning of a word of the first name, every word of the last
+        name the beginning of a word of the last name; case and diacritics are ignored. The best matches come first.
+        With a limit the users are returned page by page: the next page starts after the rank and the national ID of
+        the last user of the previous page.
+
+        :param first_name: The beginning of the first name of user.
+        :type first_name: str
+        :param last_name: The beginning of the last name of user.
+        :type last_name: str
+        :param limit: Maximum number of returned users.
+        :type limit: int, optional
+        :param after_national_id: The national ID of the last user of the previous page.
+        :type after_national_id: int, optional
+        :param after_rank: The rank of the last user of the previous page.
+        :type after_rank: float, optional
+        :param columns: The personal_info columns of the returned rows.
+        :type columns: tuple of str, optional
+        :return: A list of tuples containing user data followed by the rank of the match, lower ranks match better.
+            Empty if the names contain no searchable words.
+        :rtype: list of tuples
+        """
+        search_query = self.__prefix_search_query(first_name, last_name, limit, after_national_id, after_rank,
+                                                  columns)
+        if search_query is None:
+            return []
+        return self.__cached_search(("prefix",) + search_query, lambda: self.execute_query(*search_query))
+
+    def iter_personal_info_by_prefix(self, first_name, last_name, limit=None, after_national_id=None,
+                                     after_rank=None, chunk_size=100, columns=PERSONAL_INFO_COLUMNS):
+        """
+        Searches for users like search_personal_info_by_prefix, but yields the matching users in chunks while
+        SQLite produces them.
 
-    def retrieve_user_details(self, national_id):
+        :param chunk_size: Maximum number of users in one chunk.
+        :type chunk_size: int
+        :return: Generator of lists of tuples containing user data followed by the rank of the match.
+        :rtype: generator
+        """
+        search_query = self.__prefix_search_query(first_name, last_name, limit, after_national_id, after_rank,
+                                                  columns)
+        if search_query is None:
+            return (chunk for chunk in ())
+        return self.__cached_iter(("prefix",) + search_query,
+                                  lambda: self.iter_query(*search_query, chunk_size=chunk_size), chunk_size)
+
+    @staticmethod
+    def prefix_match_expression(first_name, last_name):
+        """
+        Builds the full-text query matching the beginnings of the words of the names. Only letters and digits are
+        taken from the names, so user input cannot inject full-text query syntax.
+
+        :return: The full-text query, or None if the names contain no words.
+        :rtype: str
+        """
+        terms = []
+        for column, text in (("first_name", first_name), ("last_name", last_name)):
+            terms += [f'{column} : "{word}"*' for word in re.findall(r"[^\W_]+", text or "")]
+        return " AND ".join(terms) if terms else None
+
+    def __prefix_search_query(self, first_name, last_name, limit, after_national_id, after_rank, columns):
+        """
+        Builds the query searching the full-text index of personal_info, see search_personal_info_by_prefix.
+
+        :return: The query and its parameters, or None if the names contain no words.
+        :rtype: tuple
+        """
+        match_expression = self.prefix_match_expression(first_name, last_name)
+        if match_expression is None:
+            return None
+        query = (f"SELECT {select_list(columns, PERSONAL_INFO_COLUMNS)}, personal_info_fts.rank FROM personal_info_fts "
+                 "JOIN personal_info ON personal_info.national_id = personal_info_fts.rowid "
+                 "WHERE personal_info_fts MATCH ?")
+        parameters = (match_expression,)
+        if after_national_id is not None:
+            # Users with the same rank are ordered by national ID
+            query += (" AND (personal_info_fts.rank > ? OR "
+                      "(personal_info_fts.rank = ? AND personal_info.national_id > ?))")
+            parameters += (after_rank, after_rank, after_national_id)
+        query += " ORDER BY personal_info_fts.rank, personal_info.national_id"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters += (limit,)
+        return query, parameters
+
+    def search_personal_info_fuzzy(self, first_name, last_name, limit=None, after_national_id=None, after_rank=None,
+                                   columns=PERSONAL_INFO_COLUMNS):
+        """
+        Searches for users whose names sound like the given ones, e.g. "Kowalski" finds "Kowalsky".
+
+        The candidates are looked up in the phonetic name key index: every given name has to share a key with the
+        name of the user. Only the candidates are ranked by the edit distance of their names to the searched ones,
+        candidates whose names differ too much are left out. At most MAX_FUZZY_CANDIDATES candidates are ranked, the
+        likely best matches first, see fuzzy_search_truncated. With a limit the users are returned page by page: the
+        next page starts after the rank and the national ID of the last user of the previous page.
+
+        :param first_name: The first name of user, possibly misspelled.
+        :type first_name: str
+        :param last_name: The last name of user, possibly misspelled.
+        :type last_name: str
+        :param limit: Maximum number of returned users.
+        :type limit: int, optional
+        :param after_national_id: The national ID of the last user of the previous page.
+        :type after_national_id: int, optional
+        :param after_rank: The rank of the last user of the previous page.
+        :type after_rank: int, optional
+        :param columns: The personal_info columns of the returned rows, national_id has to be the first one when the
+            results are paged.
+        :type columns: tuple of str, optional
+        :return: A list of tuples containing user data followed by the edit distance of the names, the closest
+            matches first. Empty if the names contain no letters.
+        :rtype: list of tuples
+        """
+        columns = tuple(columns)
+        return self.__cached_search(("fuzzy", first_name, last_name, limit, after_national_id, after_rank, columns),
+                                    lambda: self.__search_fuzzy(first_name, last_name, limit, after_national_id,
+                                                                after_rank, columns))
+
+    def fuzzy_search_truncated(self, first_name, last_name):
+        """
+        Tells whether a fuzzy search for the given names finds more than MAX_FUZZY_CANDIDATES candidates, so only
+        part of them are ranked and more specific names should be searched for.
+
+        :param first_name: The first name of user, possibly misspelled.
+        :type first_name: str
+        :param last_name: The last name of user, possibly misspelled.
+        :type last_name: str
+        :return: True if the candidates of the search are truncated.
+        :rtype: bool
+        """
+        return self.__cached_search(("fuzzy_truncated", first_name, last_name),
+                                    lambda: [self.__count_fuzzy_candidates(first_name, last_name)
+                                             > MAX_FUZZY_CANDIDATES])[0]
+
+    def __count_fuzzy_candidates(self, first_name, last_name):
+        """
+        Counts the candidates of a fuzzy search, up to one more than MAX_FUZZY_CANDIDATES.
+        """
+        candidate_query, parameters, _ = self.__fuzzy_candidate_query(first_name, last_name)
+        if candidate_query is None:
+            return 0
+        query = f"SELECT COUNT(*) FROM ({candidate_query} LIMIT {MAX_FUZZY_CANDIDATES + 1})"
+        rows = self.execute_query(query, parameters)
+        return rows[0][0] if rows else 0
+
+    @staticmethod
+    def __fuzzy_candidate_query(first_name, last_name):
+        """
+        Builds the query of the national IDs of the people sharing a phonetic key with every given name.
+
+        :return: The query, None if the names contain no letters, its parameters, and the searched name columns
+            with their folded names.
+        :rtype: tuple
+        """
+        subqueries = []
+        parameters = []
+        searched_names = []
+        for column, name in (("first_name", first_name), ("last_name", last_name)):
+            keys = sorted(column_keys(column, name))
+            if keys:
+                subqueries.append(f"SELECT national_id FROM personal_info_name_keys WHERE name_key IN "
+                                  f"({', '.join('?' * len(keys))})")
+                parameters += keys
+                searched_names.append((column, fold_name(name)))
+        if not subqueries:
+            return None, (), []
+        return " INTERSECT ".join(subqueries), tuple(parameters), searched_names
+
+    def __search_fuzzy(self, first_name, last_name, limit, after_national_id, after_rank, columns):
+        """
+        Runs the fuzzy search, see search_personal_info_fuzzy.
+        """
+        candidate_query, parameters, searched_names = self.__fuzzy_candidate_query(first_name, last_name)
+        if candidate_query is None:
+            return []
+
+        # The ranking needs the searched names and the paging the national ID, they are read after the requested
+        # columns if these do not contain them
+        read_columns = columns + tuple(column for column in ("national_id", "first_name", "last_name")
+                                       if column not in columns)
+        # When there are too many candidates the likely best matches are kept: the ones with exactly the searched
+        # names first, then the ones whose names differ least in length, which is a lower bound of the edit
+        # distance. The national ID makes the order total, so the same candidates are kept on every call and
+        # every page; one more than the limit is read to tell whether any have been left out
+        exact_matches = " + ".join(f"(lower({column}) = ?)" for column, _ in searched_names)
+        length_differences = " + ".join(f"abs(length({column}) - ?)" for column, _ in searched_names)
+        order_parameters = (tuple(searched_name for _, searched_name in searched_names)
+                            + tuple(len(searched_name) for _, searched_name in searched_names))
+        query = (f"SELECT {select_list(read_columns, PERSONAL_INFO_COLUMNS)} FROM personal_info "
+                 f"WHERE national_id IN ({candidate_query}) "
+                 f"ORDER BY {exact_matches} DESC, {length_differences}, national_id "
+                 f"LIMIT {MAX_FUZZY_CANDIDATES + 1}")
+        candidates = self.execute_query(query, parameters + order_parameters)
+        if len(candidates) > MAX_FUZZY_CANDIDATES:
+            candidates = candidates[:MAX_FUZZY_CANDIDATES]
+            self.tms_logger.log_info(f"Fuzzy search for {first_name} {last_name} exceeded {MAX_FUZZY_CANDIDATES} "
+                                     f"candidates, only the likely best matches have been ranked")
+
+        searched_names = [(read_columns.index(column), searched_name) for column, searched_name in searched_names]
+        national_id_index = read_columns.index("national_id")
+        results = []
+        for candidate in candidates:
+            distances = [edit_distance(searched_name, fold_name(candidate[column]))
+                         for column, searched_name in searched_names]
+            # A name may differ in a third of its letters, short names in two
+            if all(distance <= max(2, len(searched_name) // 3)
+                   for distance, (_, searched_name) in zip(distances, searched_names)):
+                results.append((sum(distances), candidate[national_id_index], candidate))
+        results.sort(key=lambda result: result[:2])
+
+        if after_national_id is not None:
+            results = [result for result in results if result[:2] > (after_rank, after_national_id)]
+        if limit is not None:
+            results = results[:limit]
+        return [tuple(candidate[:len(columns)]) + (distance,) for distance, _, candidate in results]
+
+    def iter_personal_info_fuzzy(self, first_name, last_name, limit=None, after_national_id=None, after_rank=None,
+                                 chunk_size=100, columns=PERSONAL_INFO_COLUMNS):
+        """
+        Searches for users like search_personal_info_fuzzy, but yields the matching users in chunks. The candidates
+        have to be ranked before the first chunk, so the whole result is read first.
+
+        :param chunk_size: Maximum number of users in one chunk.
+        :type chunk_size: int
+        :return: Generator of lists of tuples containing user data followed by the edit distance of the names.
+        :rtype: generator
+        """
+        results = self.search_personal_info_fuzzy(first_name, last_name, limit, after_national_id, after_rank, columns)
+        for start in range(0, len(results), chunk_size):
+            yield results[start:start + chunk_size]
+
+    def index_names(self, people):
+        """
+        Stores the phonetic keys of the names of users in the name key index used by search_personal_info_fuzzy,
+        replacing their previous keys. Users are indexed automatically when they are saved; users whose names are
+        changed by other means have to be indexed again.
+
+        :param people: The national ID, first name and last name of every user.
+        :type people: iterable of tuples
+        """
+        people = list(people)
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM personal_info_name_keys WHERE national_id = ?",
+                             ((national_id,) for national_id, _, _ in people))
+            self.__insert_name_keys(conn, people)
+
+    @staticmethod
+    def __insert_name_keys(conn, people):
+        """
+        Inserts the phonetic keys of the names of new users into the name key index.
+
+        :param conn: The connection, inside an open transaction.
+        :type conn: sqlite3.Connection
+        :param people: The national ID, first name and last name of every user.
+        :type people: iterable of tuples
+        """
+        conn.executemany("INSERT OR IGNORE INTO personal_info_name_keys (name_key, national_id) VALUES (?, ?)",
+                         ((key, national_id) for national_id, first_name, last_name in people
+                          for key in name_keys(first_name, last_name)))
+
+    def retrieve_user_details(self, national_id, columns=TAXPAYER_COLUMNS):
         """
         Receives user details from three different tables in the database.
 
         :param national_id: The national ID of user.
         :type national_id: int
+        :param columns: The columns of the returned rows, any of TAXPAYER_COLUMNS.
+        :type columns: tuple of str, optional
         :return: A list of tuples containing user data retrieved from the database.
         :rtype: list of tuples
         """
-        query = """
-            SELECT * 
+        query = f"""
+            SELECT {select_list(columns)}
             FROM personal_info 
             JOIN contact_info ON personal_info.national_id = contact_info.national_id 
             JOIN tax_info ON personal_info.national_id = tax_info.national_id 
@@ -167,7 +921,8 @@ class DatabaseServices:
             """
         return self.execute_query(query, (national_id,))
 
-    def search_user(self, national_id=None, first_name=None, last_name=None, date_of_birth=None):
+    def search_user(self, national_id=None, first_name=None, last_name=None, date_of_birth=None,
+                    columns=PERSONAL_INFO_COLUMNS):
         """
         Searches for user in the database based on one or combination of parameters.
 
@@ -179,10 +934,13 @@ class DatabaseServices:
         :type last_name: str
         :param date_of_birth: The date of birth of the user.
         :type date_of_birth: str
+        :param columns: The personal_info columns of the returned rows.
+        :type columns: tuple of str, optional
         :return: A list of tuples containing user data retrieved from the database.
         :rtype: list of tuples
         """
-        query = "SELECT * FROM personal_info WHERE 1=1"
+        national_id = self.__normalize_national_id(national_id)
+        query = f"SELECT {select_list(columns, PERSONAL_INFO_COLUMNS)} FROM personal_info WHERE 1=1"
         params = []
 
         if national_id:
@@ -197,7 +955,7 @@ class DatabaseServices:
         if date_of_birth:
             query += " AND date_of_birth = ?"
             params.append(date_of_birth)
-        return self.execute_query(query, params)
+        return self.__cached_search(("search_user", query, tuple(params)), lambda: self.execute_query(query, params))
 
     def save_to_sql(self, national_id, first_name, last_name, date_of_birth, gender, address_country, address_zip_code,
                     address_city, address_street, address_house_number, phone_country_code, phone_number,
@@ -246,36 +1004,90 @@ class DatabaseServices:
         :type loans: int or None
         :param property_tax: The property tax of the user (optional).
         :type property_tax: int or None
-        :return: None
-        :rtype: None
+        :return: True if the user has been saved, False if nothing has been saved.
+        :rtype: bool
         """
 
-        # SQL INSERT statements for each table
+        # SQL INSERT statements for each table, executed in one transaction so a user is never saved partially
         try:
-            # Insert into personal_info table
-            personal_info_query = """
-                INSERT INTO personal_info (national_id, first_name, last_name, date_of_birth, gender) 
-                VALUES (?, ?, ?, ?, ?)
-            """
-            self.execute_query(personal_info_query, (national_id, first_name, last_name, date_of_birth, gender))
+            with self.transaction() as conn:
+                # Insert into personal_info table
+                personal_info_query = """
+                    INSERT INTO personal_info (national_id, first_name, last_name, date_of_birth, gender) 
+                    VALUES (?, ?, ?, ?, ?)
+                """
+                self.execute_query(personal_info_query, (national_id, first_name, last_name, date_of_birth, gender))
 
-            # Insert into contact_info table
-            contact_info_query = """
-                INSERT INTO contact_info (national_id, address_country, address_zip_code, address_city, address_street,
-                address_house_number, phone_country_code, phone_number) 
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            self.execute_query(contact_info_query, (national_id, address_country, address_zip_code, address_city,
-                                                    address_street, address_house_number, phone_country_code,
-                                                    phone_number))
-
-            # Insert into tax_info table with only the provided fields
-            tax_info_query = """
-                INSERT INTO tax_info (national_id, marital_status) 
-                VALUES (?, ?)
-            """
-            self.execute_query(tax_info_query, (national_id, marital_status))
+                # Insert into contact_info table
+                contact_info_query = """
+                    INSERT INTO contact_info (national_id, address_country, address_zip_code, address_city,
+                    address_street, address_house_number, phone_country_code, phone_number) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """
+                self.execute_query(contact_info_query, (national_id, address_country, address_zip_code, address_city,
+                                                        address_street, address_house_number, phone_country_code,
+                                                        phone_number))
+
+                # Insert into tax_info table with only the provided fields
+                tax_info_query = """
+                    INSERT INTO tax_info (national_id, marital_status) 
+                    VALUES (?, ?)
+                """
+                self.execute_query(tax_info_query, (national_id, marital_status))
 
+                # Index the names for fuzzy searches
+                self.__insert_name_keys(conn, [(national_id, first_name, last_name)])
+            self.__notify_write_listeners([national_id])
             self.tms_logger.log_debug("User data saved successfully.")
+            return True
         except Exception as exception:
             self.tms_logger.log_critical(f"Error saving user data: {exception}")
+            return False
+
+    def save_many_to_sql(self, records, chunk_size=DEFAULT_BULK_CHUNK_SIZE, chunk_callback=None):
+        """
+        Saves many users at once. The records are consumed chunk by chunk, so the iterable may be a generator over
+        a file of any size; every chunk is inserted with executemany in its own transaction.
+
+        :param records: The users, each one a dict with the keys of PERSONAL_INFO_COLUMNS, CONTACT_INFO_COLUMNS and
+            TAX_INFO_COLUMNS. Missing keys are saved as NULL.
+        :type records: iterable of dict
+        :param chunk_size: Number of users inserted in one transaction.
+        :type chunk_size: int
+        :param chunk_callback: Function called with the total number of saved users after every committed chunk.
+        :type chunk_callback: callable, optional
+        :return: The number of saved users.
+        :rtype: int
+        :raises sqlite3.Error: If a chunk cannot be saved. The chunk is rolled back, the chunks before it stay saved.
+        """
+        if chunk_size < 1:
+            raise ValueError(f"Chunk size must be positive, got {chunk_size}")
+        queries = [(self.__insert_query(table, columns), columns) for table, columns in (
+            ("personal_info", PERSONAL_INFO_COLUMNS),
+            ("contact_info", CONTACT_INFO_COLUMNS),
+            ("tax_info", TAX_INFO_COLUMNS))]
+
+        saved = 0
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            with self.transaction() as conn:
+                for query, columns in queries:
+                    conn.executemany(query, ([record.get(column) for column in columns] for record in chunk))
+                self.__insert_name_keys(conn, ((record.get("national_id"), record.get("first_name"),
+                                                record.get("last_name")) for record in chunk))
+            self.__notify_write_listeners([record.get("national_id") for record in chunk])
+            saved += len(chunk)
+            self.tms_logger.log_debug(f"Saved chunk of {len(chunk)} users, {saved} in total")
+            if chunk_callback is not None:
+                chunk_callback(saved)
+        return saved
+
+    @staticmethod
+    def __insert_query(table, columns):
+        """
+        Builds the INSERT statement of a table for the given columns.
+        """
+        return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
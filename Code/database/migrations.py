@@ -0,0 +1,226 @@
+import sqlite3
+import time
+from Code.utils.name_matching import name_keys
+
+
+class Migration:
+    """
+    A single schema change, identified by its version number.
+    """
+
+    def __init__(self, version, description, statements):
+        """
+        :param version: The schema version reached by the migration. Versions start at 1 and increase by one.
+        :type version: int
+        :param description: Short description logged when the migration is applied.
+        :type description: str
+        :param statements: The SQL statements of the migration, executed in order. A step which cannot be written
+            in SQL is given as a function, which is called with the connection.
+        :type statements: list of str or callable
+        """
+        self.version = version
+        self.description = description
+        self.statements = statements
+
+    def apply(self, conn):
+        """
+        Executes the statements of the migration on the connection.
+
+        :param conn: The connection, inside an open transaction.
+        :type conn: sqlite3.Connection
+        """
+        for statement in self.statements:
+            if callable(statement):
+                statement(conn)
+            else:
+                conn.execute(statement)
+
+
+def index_name_keys(conn):
+    """
+    Fills the name key index with the phonetic keys of all people in personal_info.
+
+    :param conn: The connection, inside an open transaction.
+    :type conn: sqlite3.Connection
+    """
+    rows = conn.execute("SELECT national_id, first_name, last_name FROM personal_info")
+    conn.executemany("INSERT OR IGNORE INTO personal_info_name_keys (name_key, national_id) VALUES (?, ?)",
+                     ((key, national_id) for national_id, first_name, last_name in rows
+                      for key in name_keys(first_name, last_name)))
+
+
+MIGRATIONS = [
+    Migration(1, "Add primary key to tax_info", [
+        """
+        CREATE TABLE tax_info_new (
+            national_id INTEGER PRIMARY KEY,
+            marital_status TEXT,
+            tax_rate INTEGER,
+            yearly_income INTEGER,
+            advance_tax INTEGER,
+            tax_paid_this_year INTEGER,
+            property_value INTEGER,
+            loans INTEGER,
+            property_tax INTEGER
+        )
+        """,
+        # Fails on duplicate national IDs, which have to be cleaned up by hand instead of being dropped silently
+        """
+        INSERT INTO tax_info_new (national_id, marital_status, tax_rate, yearly_income, advance_tax,
+                                  tax_paid_this_year, property_value, loans, property_tax)
+        SELECT national_id, marital_status, tax_rate, yearly_income, advance_tax, tax_paid_this_year, property_value,
+               loans, property_tax
+        FROM tax_info
+        """,
+        "DROP TABLE tax_info",
+        "ALTER TABLE tax_info_new RENAME TO tax_info",
+    ]),
+    Migration(2, "Index personal_info names and date of birth", [
+        "CREATE INDEX IF NOT EXISTS idx_personal_info_name ON personal_info (last_name, first_name)",
+        # The OR search uses an index per term, first names alone are not covered by the name index
+        "CREATE INDEX IF NOT EXISTS idx_personal_info_first_name ON personal_info (first_name)",
+        "CREATE INDEX IF NOT EXISTS idx_personal_info_date_of_birth ON personal_info (date_of_birth)",
+    ]),
+    Migration(3, "Collect query planner statistics", [
+        "ANALYZE",
+    ]),
+    Migration(4, "Add full-text index of personal_info names", [
+        # External content table: the index stores only the tokens, the names are read from personal_info. The
+        # prefix indexes keep searches for the first two or three letters of a name from scanning the whole index.
+        """
+        CREATE VIRTUAL TABLE personal_info_fts USING fts5(
+            first_name,
+            last_name,
+            content='personal_info',
+            content_rowid='national_id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER personal_info_fts_insert AFTER INSERT ON personal_info BEGIN
+            INSERT INTO personal_info_fts (rowid, first_name, last_name)
+            VALUES (new.national_id, new.first_name, new.last_name);
+        END
+        """,
+        """
+        CREATE TRIGGER personal_info_fts_delete AFTER DELETE ON personal_info BEGIN
+            INSERT INTO personal_info_fts (personal_info_fts, rowid, first_name, last_name)
+            VALUES ('delete', old.national_id, old.first_name, old.last_name);
+        END
+        """,
+        """
+        CREATE TRIGGER personal_info_fts_update AFTER UPDATE ON personal_info BEGIN
+            INSERT INTO personal_info_fts (personal_info_fts, rowid, first_name, last_name)
+            VALUES ('delete', old.national_id, old.first_name, old.last_name);
+            INSERT INTO personal_info_fts (rowid, first_name, last_name)
+            VALUES (new.national_id, new.first_name, new.last_name);
+        END
+        """,
+        "INSERT INTO personal_info_fts (personal_info_fts) VALUES ('rebuild')",
+    ]),
+    Migration(5, "Add phonetic name key index of personal_info", [
+        # The keys are computed in Python when people are saved, see Code/utils/name_matching.py
+        """
+        CREATE TABLE personal_info_name_keys (
+            name_key TEXT NOT NULL,
+            national_id INTEGER NOT NULL,
+            PRIMARY KEY (name_key, national_id)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX idx_personal_info_name_keys_national_id ON personal_info_name_keys (national_id)",
+        """
+        CREATE TRIGGER personal_info_name_keys_delete AFTER DELETE ON personal_info BEGIN
+            DELETE FROM personal_info_name_keys WHERE national_id = old.national_id;
+        END
+        """,
+        # SQLite cannot compute the keys of a changed name, the stale keys are removed until the person is indexed
+        # again with DatabaseServices.index_names()
+        """
+        CREATE TRIGGER personal_info_name_keys_update AFTER UPDATE OF first_name, last_name ON personal_info BEGIN
+            DELETE FROM personal_info_name_keys WHERE national_id = old.national_id;
+        END
+        """,
+        index_name_keys,
+    ]),
+]
+
+
+class MigrationRunner:
+    """
+    Brings the database schema up to date by applying the pending migrations in version order.
+
+    The schema version is kept in the user_version field of the database header. Every migration runs in its own
+    transaction together with the update of the version, so a failed migration leaves the database at the previous
+    version and running the migrations again is safe.
+    """
+
+    def __init__(self, db_path, tms_logger, migrations=None):
+        """
+        :param db_path: The path to the database file.
+        :type db_path: str
+        :param tms_logger: Logger for the applied migrations.
+        :type tms_logger: TMSLogger
+        :param migrations: The migrations to apply, defaults to MIGRATIONS.
+        :type migrations: list of Migration, optional
+        """
+        self.db_path = db_path
+        self.tms_logger = tms_logger
+        self.migrations = sorted(MIGRATIONS if migrations is None else migrations,
+                                 key=lambda migration: migration.version)
+        for expected_version, migration in enumerate(self.migrations, start=1):
+            if migration.version != expected_version:
+                raise ValueError(f"Migration versions must be consecutive, expected {expected_version} but got "
+                                 f"{migration.version}")
+
+    @property
+    def latest_version(self):
+        """
+        The schema version reached when all migrations are applied.
+        """
+        return self.migrations[-1].version if self.migrations else 0
+
+    def current_version(self):
+        """
+        Reads the schema version of the database.
+
+        :rtype: int
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            conn.close()
+
+    def run(self):
+        """
+        Applies all pending migrations.
+
+        :return: The versions of the applied migrations.
+        :rtype: list of int
+        :raises sqlite3.Error: If a migration fails. The database stays at the version of the last successful one.
+        """
+        applied = []
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            for migration in self.migrations:
+                # The write lock is taken before the version is checked, so concurrent runners apply each migration once
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if conn.execute("PRAGMA user_version").fetchone()[0] >= migration.version:
+                        conn.execute("COMMIT")
+                        continue
+                    started = time.perf_counter()
+                    migration.apply(conn)
+                    conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    self.tms_logger.log_critical(f"Migration {migration.version} '{migration.description}' failed")
+                    raise
+                self.tms_logger.log_debug(f"Applied migration {migration.version} '{migration.description}' in "
+                                          f"{(time.perf_counter() - started) * 1000:.1f} ms")
+                applied.append(migration.version)
+        finally:
+            conn.close()
+        return applied
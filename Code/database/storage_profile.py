@@ -0,0 +1,199 @@
+import re
+import sqlite3
+import threading
+import time
+
+# Pragmas a storage profile may set, in the order they are applied
+STORAGE_PRAGMAS = ("journal_mode", "synchronous", "mmap_size", "cache_size", "temp_store")
+
+# Pragmas which change the database file and cannot be set on read-only connections
+PERSISTENT_PRAGMAS = ("journal_mode",)
+
+SYNCHRONOUS_LEVELS = {0: "off", 1: "normal", 2: "full", 3: "extra"}
+TEMP_STORE_MODES = {0: "default", 1: "file", 2: "memory"}
+
+WAL_CHECKPOINT_MODES = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+
+
+class StorageProfile:
+    """
+    A named set of SQLite pragmas tuning the storage engine, applied to every connection when it is opened.
+
+    The values SQLite actually uses are read back after they are set, so the report shows what has been applied,
+    e.g. journal_mode stays "delete" if WAL is not available for the database file.
+    """
+
+    def __init__(self, name, settings):
+        """
+        :param name: The name of the profile.
+        :type name: str
+        :param settings: The pragma values keyed by pragma name, see STORAGE_PRAGMAS.
+        :type settings: dict
+        :raises ValueError: If a pragma is not supported or its value is not a plain number or keyword.
+        """
+        for pragma, value in settings.items():
+            if pragma not in STORAGE_PRAGMAS:
+                raise ValueError(f"Unsupported pragma '{pragma}' in storage profile '{name}'")
+            # Pragma values cannot be passed as query parameters, only numbers and keywords are accepted
+            if isinstance(value, bool) or not (isinstance(value, int) or re.fullmatch(r"[A-Za-z]+", str(value))):
+                raise ValueError(f"Invalid value {value!r} of pragma '{pragma}' in storage profile '{name}'")
+        self.name = name
+        self.settings = {pragma: settings[pragma] for pragma in STORAGE_PRAGMAS if pragma in settings}
+        self.__applied = {}
+        self.__lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, db_config):
+        """
+        Creates the profile selected by the "storage_profile" key of the database configuration from the profiles
+        defined under "storage_profiles".
+
+        :param db_config: The database configuration.
+        :type db_config: dict
+        :return: The selected profile, or None if no profile is selected.
+        :rtype: StorageProfile
+        :raises ValueError: If the selected profile is not defined.
+        """
+        name = db_config.get("storage_profile")
+        if not name:
+            return None
+        profiles = db_config.get("storage_profiles", {})
+        if name not in profiles:
+            raise ValueError(f"Storage profile '{name}' is not defined. Available profiles: {list(profiles)}")
+        return cls(name, profiles[name])
+
+    @property
+    def wal(self):
+        """
+        Tells whether the profile asks for WAL journaling.
+        """
+        return str(self.settings.get("journal_mode", "")).lower() == "wal"
+
+    def apply(self, conn, read_only=False):
+        """
+        Sets the pragmas of the profile on a connection.
+
+        :param conn: The connection.
+        :type conn: sqlite3.Connection
+        :param read_only: Whether the connection is read-only, pragmas changing the database file are skipped.
+        :type read_only: bool
+        :return: The values in effect after applying the profile.
+        :rtype: dict
+        """
+        applied = {}
+        for pragma, value in self.settings.items():
+            if read_only and pragma in PERSISTENT_PRAGMAS:
+                continue
+            conn.execute(f"PRAGMA {pragma} = {value}").fetchall()
+            applied[pragma] = self.__describe(pragma, conn.execute(f"PRAGMA {pragma}").fetchone()[0])
+        with self.__lock:
+            self.__applied.update(applied)
+        return applied
+
+    def report(self):
+        """
+        Reports the requested and the applied settings of the profile.
+
+        :rtype: dict
+        """
+        with self.__lock:
+            return {"profile": self.name, "requested": dict(self.settings), "applied": dict(self.__applied)}
+
+    @staticmethod
+    def __describe(pragma, value):
+        """
+        Converts the numeric value reported by SQLite to the keyword used in the configuration.
+        """
+        if pragma == "synchronous":
+            return SYNCHRONOUS_LEVELS.get(value, value)
+        if pragma == "temp_store":
+            return TEMP_STORE_MODES.get(value, value)
+        return value
+
+
+class WalCheckpointer:
+    """
+    Background thread which periodically checkpoints the write-ahead log into the database file, so the WAL file
+    does not keep growing and readers do not have to search a long log.
+    """
+
+    def __init__(self, connection_pool, interval, mode="PASSIVE", tms_logger=None):
+        """
+        :param connection_pool: The pool providing write connections.
+        :type connection_pool: ConnectionPool
+        :param interval: Seconds between two checkpoints.
+        :type interval: float
+        :param mode: The checkpoint mode, one of WAL_CHECKPOINT_MODES.
+        :type mode: str
+        :param tms_logger: Logger for checkpoint errors.
+        :type tms_logger: TMSLogger, optional
+        """
+        mode = mode.upper()
+        if mode not in WAL_CHECKPOINT_MODES:
+            raise ValueError(f"Unknown WAL checkpoint mode '{mode}'. Available modes: {WAL_CHECKPOINT_MODES}")
+        self.__pool = connection_pool
+        self.interval = interval
+        self.mode = mode
+        self.tms_logger = tms_logger
+        self.__stop = threading.Event()
+        self.__thread = None
+        self.__stats_lock = threading.Lock()
+        self.__stats = {"checkpoints": 0, "busy": 0, "errors": 0, "last_log_frames": 0, "last_checkpointed_frames": 0,
+                        "last_duration_ms": 0.0}
+
+    def start(self):
+        """
+        Starts the checkpoint thread.
+        """
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.__run, name="wal_checkpointer", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Stops the checkpoint thread.
+        """
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def checkpoint(self):
+        """
+        Runs one checkpoint.
+
+        :return: The busy flag, the number of frames in the log and the number of checkpointed frames.
+        :rtype: tuple
+        """
+        started = time.perf_counter()
+        with self.__pool.connection() as conn:
+            busy, log_frames, checkpointed_frames = conn.execute(f"PRAGMA wal_checkpoint({self.mode})").fetchone()
+        with self.__stats_lock:
+            self.__stats["checkpoints"] += 1
+            self.__stats["busy"] += 1 if busy else 0
+            self.__stats["last_log_frames"] = log_frames
+            self.__stats["last_checkpointed_frames"] = checkpointed_frames
+            self.__stats["last_duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return busy, log_frames, checkpointed_frames
+
+    def stats(self):
+        """
+        Returns the checkpoint statistics.
+
+        :rtype: dict
+        """
+        with self.__stats_lock:
+            return {"interval": self.interval, "mode": self.mode, **self.__stats}
+
+    def __run(self):
+        """
+        Checkpoints the log every interval until the checkpointer is stopped.
+        """
+        while not self.__stop.wait(self.interval):
+            try:
+                self.checkpoint()
+            except sqlite3.Error as error:
+                with self.__stats_lock:
+                    self.__stats["errors"] += 1
+                if self.tms_logger is not None:
+                    self.tms_logger.log_error(f"WAL checkpoint failed: {error}")
@@ -0,0 +1,365 @@
+import os
+import csv
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from contextlib import nullcontext
+from itertools import islice
+from Code.utils.taxpayer_validation import validate_taxpayer
+from Code.utils.taxpayer_columns import TAXPAYER_COLUMNS
+
+CSV_FORMAT = "csv"
+JSONL_FORMAT = "jsonl"
+IMPORT_FORMATS = (CSV_FORMAT, JSONL_FORMAT)
+DEFAULT_IMPORT_BATCH_SIZE = 10000
+
+
+def detect_format(path):
+    """
+    Detects the format of an import file from its extension.
+
+    :param path: The path to the import file.
+    :type path: str
+    :return: Either "csv" or "jsonl".
+    :rtype: str
+    :raises ValueError: If the extension is not supported.
+    """
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    if extension in (JSONL_FORMAT, "ndjson"):
+        return JSONL_FORMAT
+    if extension == CSV_FORMAT:
+        return CSV_FORMAT
+    raise ValueError(f"Unsupported import file extension '{extension}'. Supported formats: {IMPORT_FORMATS}")
+
+
+class MalformedRecord:
+    """
+    Stands in for a line of an import file which cannot be parsed, so it is rejected like an invalid record instead
+    of stopping the import.
+    """
+
+    def __init__(self, error):
+        self.error = error
+
+
+def _parse_json_line(line):
+    """
+    Parses a line of a JSONL file, blank lines are empty records.
+    """
+    if not line.strip():
+        return {}
+    try:
+        return json.loads(line)
+    except ValueError as error:
+        return MalformedRecord(f"Line is not valid JSON: {error}")
+
+
+def read_records(import_file, file_format, start=0):
+    """
+    Reads the records of an import file one by one. Lines which cannot be parsed are passed on as MalformedRecord.
+
+    :param import_file: The open import file.
+    :type import_file: file object
+    :param file_format: Either "csv" (with a header line) or "jsonl" (one JSON object per line).
+    :type file_format: str
+    :param start: Number of records to skip, e.g. the ones imported before an interruption.
+    :type start: int
+    :return: Generator of (position, record) tuples, the position counting the records from 1.
+    :rtype: generator
+    """
+    if file_format == CSV_FORMAT:
+        records = csv.DictReader(import_file)
+    else:
+        records = (_parse_json_line(line) for line in import_file)
+    position = 0
+    while True:
+        try:
+            record = next(records)
+        except StopIteration:
+            return
+        except csv.Error as error:
+            # The reader continues with the next line
+            record = MalformedRecord(f"Line is not valid CSV: {error}")
+        position += 1
+        if position > start:
+            yield position, record
+
+
+def validate_records(records, rejected_callback):
+    """
+    Passes on the valid records with the taxpayer columns only and hands the invalid ones to the callback.
+
+    :param records: The (position, record) tuples.
+    :type records: iterable
+    :param rejected_callback: Function called with the position, the record and the list of validation errors.
+    :type rejected_callback: callable
+    :return: Generator of (position, record) tuples of valid records.
+    :rtype: generator
+    """
+    for position, record in records:
+        if isinstance(record, MalformedRecord):
+            errors = [record.error]
+        else:
+            errors = validate_taxpayer(record) if isinstance(record, dict) else ["Record must be an object."]
+        if errors:
+            rejected_callback(position, record, errors)
+            continue
+        yield position, {column: _clean(record.get(column)) for column in TAXPAYER_COLUMNS}
+
+
+def batch_records(records, batch_size):
+    """
+    Groups records into batches.
+
+    :param records: The (position, record) tuples.
+    :type records: iterable
+    :param batch_size: Maximum number of records in a batch.
+    :type batch_size: int
+    :return: Generator of (last position, list of (position, record) tuples) tuples.
+    :rtype: generator
+    """
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield batch[-1][0], batch
+
+
+def _clean(value):
+    """
+    Strips text values and stores empty ones as NULL.
+    """
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+class TaxpayerImporter:
+    """
+    Imports taxpayers from CSV or JSONL files into personal_info, contact_info and tax_info.
+
+    The file is streamed through a generator pipeline (read, validate, batch, insert), so memory use is bounded by
+    the batch size whatever the size of the file. Every batch is inserted with executemany in one transaction; if
+    it conflicts with saved taxpayers, its records are inserted one by one in the same transaction and the
+    conflicting ones are rejected.
+    After every committed batch the position in the file is written to a checkpoint file, so an interrupted
+    import resumes after the last committed batch.
+    """
+
+    def __init__(self, database, tms_logger, batch_size=DEFAULT_IMPORT_BATCH_SIZE, batch_lock=None,
+                 progress_callback=None):
+        """
+        :param database: The database the taxpayers are saved to.
+        :type database: DatabaseServices
+        :param tms_logger: Logger for progress and rejected records.
+        :type tms_logger: TMSLogger
+        :param batch_size: Number of records inserted in one transaction.
+        :type batch_size: int
+        :param batch_lock: Function returning a context manager held while a batch is inserted, e.g. the write
+            side of the server database lock.
+        :type batch_lock: callable, optional
+        :param progress_callback: Function called with the progress report after every committed batch.
+        :type progress_callback: callable, optional
+        """
+        if batch_size < 1:
+            raise ValueError(f"Batch size must be positive, got {batch_size}")
+        self.database = database
+        self.tms_logger = tms_logger
+        self.batch_size = batch_size
+        self.batch_lock = batch_lock or nullcontext
+        self.progress_callback = progress_callback
+
+    @staticmethod
+    def checkpoint_path(path):
+        """
+        Returns the path of the checkpoint file of an import file.
+        """
+        return f"{path}.checkpoint.json"
+
+    def run(self, path, file_format=None, resume=True):
+        """
+        Imports a file.
+
+        :param path: The path to the import file.
+        :type path: str
+        :param file_format: Either "csv" or "jsonl", detected from the extension if None.
+        :type file_format: str, optional
+        :param resume: Whether to continue after the checkpoint of a previous, interrupted import of the file.
+        :type resume: bool
+        :return: The import report: processed, imported and rejected records, batches, duration and throughput.
+        :rtype: dict
+        :raises sqlite3.Error: If a batch cannot be saved for another reason than conflicting records. The batches
+            before it stay saved and the import can be resumed.
+        """
+        file_format = file_format or detect_format(path)
+        if file_format not in IMPORT_FORMATS:
+            raise ValueError(f"Unsupported import format '{file_format}'. Supported formats: {IMPORT_FORMATS}")
+
+        checkpoint = self.__read_checkpoint(path) if resume else None
+        report = {"path": path, "format": file_format, "processed": 0, "imported": 0, "rejected": 0, "batches": 0,
+                  "resumed_at": 0}
+        if checkpoint:
+            report.update({key: checkpoint[key] for key in ("processed", "imported", "rejected")})
+            report["resumed_at"] = checkpoint["processed"]
+            self.tms_logger.log_debug(f"Resuming import of {path} after record {checkpoint['processed']}")
+
+        last_rejected = [0]
+
+        def reject(position, record, errors):
+            report["rejected"] += 1
+            last_rejected[0] = position
+            self.tms_logger.log_error(f"Rejected record {position} of {path}: {' '.join(errors)}")
+
+        started = time.perf_counter()
+        with open(path, 'r', newline='', encoding='utf-8') as import_file:
+            records = read_records(import_file, file_format, start=report["processed"])
+            batches = batch_records(validate_records(records, reject), self.batch_size)
+            for last_position, batch in batches:
+                batch_started = time.perf_counter()
+                with self.batch_lock():
+                    saved = self.__save_batch(batch, reject)
+                batch_time = time.perf_counter() - batch_started
+
+                report["processed"] = last_position
+                report["imported"] += saved
+                report["batches"] += 1
+                self.__write_checkpoint(path, report)
+                self.tms_logger.log_debug(f"Imported batch {report['batches']} of {saved} records in "
+                                          f"{batch_time * 1000:.1f} ms ({saved / max(batch_time, 1e-9):.0f} "
+                                          f"records/s), {report['processed']} records processed")
+                if self.progress_callback is not None:
+                    self.progress_callback(dict(report))
+
+        # Rejected records after the last batch count as processed as well
+        report["processed"] = max(report["processed"], last_rejected[0])
+
+        elapsed = time.perf_counter() - started
+        report["seconds"] = round(elapsed, 3)
+        report["records_per_second"] = round((report["imported"] - (checkpoint or {}).get("imported", 0))
+                                             / max(elapsed, 1e-9), 1)
+        self.__remove_checkpoint(path)
+        self.tms_logger.log_debug(f"Import of {path} finished: {report}")
+        return report
+
+    def __save_batch(self, batch, rejected_callback):
+        """
+        Saves a batch of valid records. If a record conflicts with a saved taxpayer, e.g. its national ID is taken,
+        the batch is rolled back and saved again record by record, rejecting the conflicting records.
+
+        :param batch: The (position, record) tuples.
+        :type batch: list
+        :param rejected_callback: Function called with the position, the record and the list of errors.
+        :type rejected_callback: callable
+        :return: The number of saved records.
+        :rtype: int
+        """
+        try:
+            return self.database.save_many_to_sql([record for _, record in batch], chunk_size=len(batch))
+        except sqlite3.IntegrityError as error:
+            self.tms_logger.log_debug(f"Batch conflicts with saved taxpayers ({error}), saving it record by record")
+
+        saved = 0
+        with self.database.transaction():
+            for position, record in batch:
+                try:
+                    # Nested in the batch transaction, a conflicting record only rolls back its own savepoint
+                    self.database.save_many_to_sql([record])
+                except sqlite3.IntegrityError as error:
+                    rejected_callback(position, record, [f"Record conflicts with a saved taxpayer: {error}."])
+                else:
+                    saved += 1
+        return saved
+
+    def __read_checkpoint(self, path):
+        """
+        Reads the checkpoint of a previous import of the file.
+
+        :return: The checkpoint, or None if there is none or it belongs to a different file.
+        :rtype: dict
+        """
+        try:
+            with open(self.checkpoint_path(path), 'r') as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+        except (OSError, ValueError):
+            return None
+        if checkpoint.get("size") != os.path.getsize(path):
+            self.tms_logger.log_error(f"Ignoring checkpoint of {path}, the file has changed since")
+            return None
+        return checkpoint
+
+    def __write_checkpoint(self, path, report):
+        """
+        Atomically replaces the checkpoint of the file with the current progress.
+        """
+        checkpoint = {key: report[key] for key in ("processed", "imported", "rejected")}
+        checkpoint["size"] = os.path.getsize(path)
+        temporary_path = self.checkpoint_path(path) + ".tmp"
+        with open(temporary_path, 'w') as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(temporary_path, self.checkpoint_path(path))
+
+    def __remove_checkpoint(self, path):
+        """
+        Removes the checkpoint of a completed import.
+        """
+        try:
+            os.remove(self.checkpoint_path(path))
+        except FileNotFoundError:
+            pass
+
+
+def main(argv=None):
+    """
+    Command line entry point importing a taxpayer file straight into the database.
+    """
+    parser = argparse.ArgumentParser(description="Import taxpayers from a CSV or JSONL file.")
+    parser.add_argument("path", help="The CSV (with header line) or JSONL file to import.")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="File format, detected from the extension if "
+                                                                 "omitted.")
+    parser.add_argument("--db", default="taxpayers.db", help="The database file, relative to Code/database.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_IMPORT_BATCH_SIZE,
+                        help="Number of records inserted in one transaction.")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint of a previous import.")
+    arguments = parser.parse_args(argv)
+
+    from Code.utils import tms_logs
+    from Code.database.database import DatabaseServices
+    from Code.database.migrations import MigrationRunner
+
+    os.environ['APP_MODE'] = 'SERVER'
+    import_logger = tms_logs.TMSLogger("server")
+    if not import_logger.setup():
+        return 1
+
+    def print_progress(report):
+        print(f"{report['processed']} records processed, {report['imported']} imported, "
+              f"{report['rejected']} rejected", flush=True)
+
+    database = DatabaseServices(db_file=arguments.db, tms_logger=import_logger)
+    # Saving taxpayers writes tables added by migrations, e.g. the name key index
+    try:
+        MigrationRunner(database.get_database_path(), import_logger).run()
+    except Exception as exception:
+        print(f"Could not migrate the database schema: {exception}", file=sys.stderr)
+        database.close()
+        return 1
+
+    importer = TaxpayerImporter(database, import_logger, batch_size=arguments.batch_size,
+                                progress_callback=print_progress)
+    try:
+        report = importer.run(arguments.path, arguments.format, resume=not arguments.restart)
+    except Exception as exception:
+        print(f"Import failed: {exception}. Run the import again to resume it.", file=sys.stderr)
+        return 1
+    finally:
+        database.close()
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
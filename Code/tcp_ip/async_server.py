@@ -0,0 +1,148 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from Code.tcp_ip.protocol import (ConnectionState, FrameTooLargeError, DELIMITER, FRAME_HEADER,
+                                  LENGTH_PREFIXED_FRAMING)
+
+
+class AsyncTCPServer:
+    """
+    Asyncio based server engine which serves the same commands as TCPServer.
+
+    Instead of starting a new thread for every accepted connection, all connections are multiplexed on a single
+    event loop using asyncio stream readers and writers. Blocking work (SQLite queries and bcrypt checks inside
+    TCPServer.process_request) is handed over to a bounded executor so the event loop is never blocked.
+    """
+
+    def __init__(self, tcp_server, executor_workers=None):
+        """
+        Initializes the asyncio engine on top of an already bound TCPServer.
+
+        Args:
+            tcp_server (TCPServer): The server whose listening socket and request processing are used.
+            executor_workers (int, optional): Number of executor threads for blocking work. Defaults to the
+                ThreadPoolExecutor default.
+        """
+        self.tcp_server = tcp_server
+        self.server_logger = tcp_server.server_logger
+        self.executor = ThreadPoolExecutor(max_workers=executor_workers, thread_name_prefix="tms_executor")
+
+    async def handle_connection(self, reader, writer):
+        """
+        Handles a single client connection: reads requests, executes them on the executor and writes the responses.
+        Kept alive connections are served until the client disconnects or stays idle for longer than the idle
+        timeout of the TCPServer; the timeout also applies to the first request of a connection.
+
+        Args:
+            reader (asyncio.StreamReader): The stream reader of the connection.
+            writer (asyncio.StreamWriter): The stream writer of the connection.
+        """
+        client_address = writer.get_extra_info("peername")
+        self.server_logger.log_debug(f"Connected client: {client_address}")
+        connection = ConnectionState(client_address)
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(self.read_message(reader, connection),
+                                                     self.tcp_server.idle_timeout)
+                except asyncio.IncompleteReadError as incomplete_read:
+                    # The client closed the connection before sending the delimiter, handle what has been received
+                    message = incomplete_read.partial
+                    if connection.framing == LENGTH_PREFIXED_FRAMING or (not message and connection.requests):
+                        self.server_logger.log_debug("Client closed kept alive connection")
+                        break
+                self.server_logger.log_debug(f"Complete data received: {message}")
+
+                response = await loop.run_in_executor(self.executor, self.tcp_server.process_request,
+                                                      message.decode().strip(), connection)
+                if isinstance(response, bytes):
+                    writer.write(response)
+                    await writer.drain()
+                elif response is not None:
+                    await self.write_stream(writer, response)
+
+                if not connection.keep_alive or reader.at_eof():
+                    break
+
+        except asyncio.TimeoutError:
+            self.server_logger.log_debug("Connection idle timeout")
+
+        except (asyncio.LimitOverrunError, FrameTooLargeError) as limit_error:
+            self.server_logger.log_error(f"Request rejected: {limit_error}")
+
+        except OSError as socket_error:
+            self.server_logger.log_error(f"Socket error occurred while handling request: {socket_error}")
+
+        except Exception as exception:
+            self.server_logger.log_error(f"Unexpected exception: {exception}")
+
+        finally:
+            self.server_logger.log_debug("Closing client socket")
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def read_message(self, reader, connection):
+        """
+        Reads the next request message in the framing mode negotiated for the connection.
+
+        Args:
+            reader (asyncio.StreamReader): The stream reader of the connection.
+            connection (ConnectionState): The state of the connection.
+        Returns:
+            bytes: The received message.
+        Raises:
+            asyncio.IncompleteReadError: If the connection was closed before the message was complete.
+            FrameTooLargeError: If the announced frame size exceeds the maximum frame size.
+        """
+        if connection.framing != LENGTH_PREFIXED_FRAMING:
+            return await reader.readuntil(DELIMITER)
+
+        frame_header = await reader.readexactly(FRAME_HEADER.size)
+        (length,) = FRAME_HEADER.unpack(frame_header)
+        if length > self.tcp_server.max_frame_size:
+            raise FrameTooLargeError(f"Frame of {length} bytes exceeds the maximum of "
+                                     f"{self.tcp_server.max_frame_size} bytes")
+        return await reader.readexactly(length)
+
+    async def write_stream(self, writer, messages):
+        """
+        Writes the messages of a streamed response as they are produced. The messages are produced on the executor,
+        since producing them reads from the database.
+
+        Args:
+            writer (asyncio.StreamWriter): The stream writer of the connection.
+            messages (generator): The encoded messages returned by TCPServer.process_request.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                message = await loop.run_in_executor(self.executor, next, messages, None)
+                if message is None:
+                    break
+                writer.write(message)
+                # A client which stops receiving must not keep the stream and its database cursor open
+                await asyncio.wait_for(writer.drain(), self.tcp_server.idle_timeout)
+        finally:
+            await loop.run_in_executor(self.executor, messages.close)
+
+    async def serve_forever(self):
+        """
+        Serves client connections on the listening socket of the TCPServer until cancelled.
+        """
+        server = await asyncio.start_server(self.handle_connection, sock=self.tcp_server.server_socket,
+                                            limit=self.tcp_server.max_frame_size)
+        self.server_logger.log_debug("Asyncio server engine has been started")
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        """
+        Runs the event loop of the asyncio engine. Blocks until the server is stopped.
+        """
+        try:
+            asyncio.run(self.serve_forever())
+        finally:
+            self.executor.shutdown(wait=False)
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import deque
+
+# Database access declared by a command. It decides how the command takes the database lock.
+READ_ACCESS = "read"
+WRITE_ACCESS = "write"
+NO_ACCESS = "none"
+
+# Number of most recent latency samples per command used for the percentiles
+LATENCY_WINDOW = 1024
+
+
+class CommandRegistry:
+    """
+    Maps command names to their handlers and measures every handler call.
+
+    Each command is registered with the database access it needs. Dispatching is a single dictionary lookup, so
+    adding commands does not slow down the others. Every call is timed with a high-resolution clock and failed calls
+    are counted, so per-command latency and throughput can be reported.
+    """
+
+    def __init__(self):
+        self.__commands = {}
+        self.__stats = {}
+        self.__stats_lock = threading.Lock()
+        self.__started = time.monotonic()
+
+    def register(self, name, handler, access=READ_ACCESS):
+        """
+        Registers a command handler.
+        Args:
+            name (str): The command name as sent by clients.
+            handler (callable): Function called with the parsed request message, returning the response.
+            access (str, optional): The database access of the command: "read", "write" or "none".
+        """
+        if access not in (READ_ACCESS, WRITE_ACCESS, NO_ACCESS):
+            raise ValueError(f"Unknown access '{access}' for command '{name}'")
+        self.__commands[name] = (handler, access)
+        with self.__stats_lock:
+            self.__stats[name] = {"calls": 0, "errors": 0, "total_time": 0, "max_time": 0,
+                                  "latencies": deque(maxlen=LATENCY_WINDOW)}
+
+    def __contains__(self, name):
+        return name in self.__commands
+
+    def access(self, name):
+        """
+        Returns the database access declared by a command.
+        Args:
+            name (str): The command name.
+        Returns:
+            str: The declared access, or None if the command is not registered.
+        """
+        command = self.__commands.get(name)
+        return command[1] if command else None
+
+    def dispatch(self, name, request_data):
+        """
+        Calls the handler of a command and records its latency.
+        Args:
+            name (str): The command name.
+            request_data (dict): The parsed request message.
+        Returns:
+            The response returned by the handler.
+        Raises:
+            KeyError: If the command is not registered.
+        """
+        handler, _ = self.__commands[name]
+        started = time.perf_counter_ns()
+        failed = True
+        try:
+            response = handler(request_data)
+            failed = False
+            return response
+        finally:
+            self.__record(name, time.perf_counter_ns() - started, failed)
+
+    def stats(self):
+        """
+        Returns the per-command statistics.
+        Returns:
+            dict: For every command its call and error counts, throughput since the registry was created and
+            latencies in milliseconds (average, maximum and percentiles of the most recent calls).
+        """
+        uptime = max(time.monotonic() - self.__started, 1e-9)
+        stats = {}
+        with self.__stats_lock:
+            for name, command_stats in self.__stats.items():
+                calls = command_stats["calls"]
+                latencies = sorted(command_stats["latencies"])
+                stats[name] = {
+                    "access": self.__commands[name][1],
+                    "calls": calls,
+                    "errors": command_stats["errors"],
+                    "calls_per_second": round(calls / uptime, 3),
+                    "avg_ms": round(command_stats["total_time"] / calls / 1e6, 3) if calls else 0.0,
+                    "max_ms": round(command_stats["max_time"] / 1e6, 3),
+                    "p50_ms": self.__percentile(latencies, 0.50),
+                    "p95_ms": self.__percentile(latencies, 0.95)
+                }
+        return stats
+
+    def __record(self, name, elapsed, failed):
+        """
+        Accounts one call of a command.
+        """
+        with self.__stats_lock:
+            command_stats = self.__stats[name]
+            command_stats["calls"] += 1
+            if failed:
+                command_stats["errors"] += 1
+            command_stats["total_time"] += elapsed
+            command_stats["max_time"] = max(command_stats["max_time"], elapsed)
+            command_stats["latencies"].append(elapsed)
+
+    @staticmethod
+    def __percentile(sorted_latencies, fraction):
+        """
+        Returns the given percentile of sorted latencies in milliseconds.
+        """
+        if not sorted_latencies:
+            return 0.0
+        index = min(int(len(sorted_latencies) * fraction), len(sorted_latencies) - 1)
+        return round(sorted_latencies[index] / 1e6, 3)
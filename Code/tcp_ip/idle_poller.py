@@ -0,0 +1,158 @@
+import socket
+import selectors
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class IdleConnectionPoller:
+    """
+    Watches kept alive connections between their requests, so an idle connection does not occupy a worker thread.
+
+    After a response, the worker parks the connection here and turns to the next one. A single thread waits with a
+    selector until a parked connection becomes readable, i.e. the client sent its next request or closed the
+    connection, and hands it back to the ready handler, e.g. the submit method of the worker pool. Connections which
+    stay idle for longer than the idle timeout are closed. Connections are parked from any thread; they are
+    registered with the selector by the polling thread only.
+    """
+
+    def __init__(self, ready_handler, idle_timeout, server_logger, clock=time.monotonic):
+        """
+        Args:
+            ready_handler (callable): Function called with a readable client socket and the state it was parked with.
+            idle_timeout (float): Seconds a parked connection may stay idle before it is closed.
+            server_logger (TMSLogger): Logger instance for logging events.
+            clock (callable, optional): Function returning the current time in seconds.
+        """
+        if idle_timeout <= 0:
+            raise ValueError(f"Idle timeout must be positive, got {idle_timeout}")
+        self.ready_handler = ready_handler
+        self.idle_timeout = idle_timeout
+        self.server_logger = server_logger
+        self.__clock = clock
+        self.__selector = selectors.DefaultSelector()
+        self.__wakeup_receiver, self.__wakeup_sender = socket.socketpair()
+        self.__wakeup_receiver.setblocking(False)
+        self.__wakeup_sender.setblocking(False)
+        self.__selector.register(self.__wakeup_receiver, selectors.EVENT_READ)
+        self.__incoming = deque()
+        # Parked sockets by the time they were parked, the oldest first
+        self.__deadlines = OrderedDict()
+        self.__thread = None
+        self.__running = False
+        self.__stats_lock = threading.Lock()
+        self.__parked = 0
+        self.__resumed = 0
+        self.__expired = 0
+
+    def start(self):
+        """
+        Starts the polling thread.
+        """
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__poll, name="tms_idle_poller", daemon=True)
+        self.__thread.start()
+        self.server_logger.log_debug(f"Idle connection poller started with an idle timeout of "
+                                     f"{self.idle_timeout} seconds")
+
+    def stop(self):
+        """
+        Stops the polling thread and closes the connections which are still parked.
+        """
+        self.__running = False
+        self.__wake_up()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        while self.__incoming:
+            self.__incoming.popleft()[0].close()
+        for client_socket_ in list(self.__deadlines):
+            self.__selector.unregister(client_socket_)
+            client_socket_.close()
+        self.__deadlines.clear()
+        self.__selector.close()
+        self.__wakeup_receiver.close()
+        self.__wakeup_sender.close()
+
+    def park(self, client_socket_, *state):
+        """
+        Hands an idle connection to the poller.
+
+        Args:
+            client_socket_ (socket.socket): The client socket, without buffered unread data.
+            *state: Passed to the ready handler together with the socket, e.g. the state of the connection.
+        """
+        self.__incoming.append((client_socket_, state))
+        with self.__stats_lock:
+            self.__parked += 1
+        self.__wake_up()
+
+    def stats(self):
+        """
+        Returns the runtime statistics of the poller.
+
+        Returns:
+            dict: Idle timeout, number of idle connections and counts of parked, resumed and expired connections.
+        """
+        with self.__stats_lock:
+            return {
+                "idle_timeout": self.idle_timeout,
+                "idle_connections": len(self.__deadlines) + len(self.__incoming),
+                "parked": self.__parked,
+                "resumed": self.__resumed,
+                "expired": self.__expired
+            }
+
+    def __wake_up(self):
+        """
+        Interrupts the selector wait of the polling thread.
+        """
+        try:
+            self.__wakeup_sender.send(b'\0')
+        except (BlockingIOError, OSError):
+            # A wake-up is pending already, or the poller has been stopped
+            pass
+
+    def __poll(self):
+        """
+        Polling thread loop: registers parked connections, resumes the readable ones and closes the expired ones.
+        """
+        while self.__running:
+            while self.__incoming:
+                with self.__stats_lock:
+                    client_socket_, state = self.__incoming.popleft()
+                    self.__deadlines[client_socket_] = self.__clock() + self.idle_timeout
+                self.__selector.register(client_socket_, selectors.EVENT_READ, state)
+
+            timeout = None
+            if self.__deadlines:
+                timeout = max(0.0, next(iter(self.__deadlines.values())) - self.__clock())
+            for key, _ in self.__selector.select(timeout):
+                if key.fileobj is self.__wakeup_receiver:
+                    try:
+                        while self.__wakeup_receiver.recv(1024):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                self.__selector.unregister(key.fileobj)
+                del self.__deadlines[key.fileobj]
+                with self.__stats_lock:
+                    self.__resumed += 1
+                try:
+                    self.ready_handler(key.fileobj, *key.data)
+                except Exception as exception:
+                    self.server_logger.log_error(f"Resuming idle connection failed: {exception}")
+                    key.fileobj.close()
+
+            now = self.__clock()
+            while self.__deadlines:
+                client_socket_, deadline = next(iter(self.__deadlines.items()))
+                if deadline > now:
+                    break
+                del self.__deadlines[client_socket_]
+                self.__selector.unregister(client_socket_)
+                client_socket_.close()
+                with self.__stats_lock:
+                    self.__expired += 1
+                self.server_logger.log_debug("Connection idle timeout")
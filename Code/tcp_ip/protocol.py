@@ -0,0 +1,230 @@
+import json
+import struct
+
+DELIMITER = b'\r\n'
+
+# Framing modes negotiated through the "Framing" key of the request header block
+DELIMITED_FRAMING = "delimiter"
+LENGTH_PREFIXED_FRAMING = "length-prefixed"
+
+# Every length-prefixed frame starts with the payload size as an unsigned 32-bit big-endian integer
+FRAME_HEADER = struct.Struct("!I")
+DEFAULT_MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+
+class FrameTooLargeError(ValueError):
+    """
+    Raised when a received message exceeds the configured maximum frame size.
+    """
+
+
+class ConnectionState:
+    """
+    Keeps the protocol state of a single client connection between its requests.
+    """
+
+    def __init__(self, client_address=None):
+        """
+        Args:
+            client_address (tuple, optional): The address of the connected client.
+        """
+        self.client_address = client_address
+        self.keep_alive = False
+        self.framing = DELIMITED_FRAMING
+        self.requests = 0
+
+
+class StreamingResponse:
+    """
+    A response sent as a sequence of messages, each one in its own frame (or terminated by the delimiter), while
+    the messages are still being produced. All messages but the last one carry "partial": true.
+    """
+
+    def __init__(self, messages):
+        """
+        Args:
+            messages (iterable): The messages of the response. A generator is closed together with the response,
+                so it can release the resources it holds.
+        """
+        self.__messages = messages
+
+    def __iter__(self):
+        return iter(self.__messages)
+
+    def close(self):
+        """
+        Releases the message source, also when the response has not been sent completely.
+        """
+        close = getattr(self.__messages, "close", None)
+        if close is not None:
+            close()
+
+
+class EncodedResponse:
+    """
+    A response message serialized to JSON once, so it can be sent many times, e.g. from a cache, without being
+    serialized again.
+    """
+
+    def __init__(self, message):
+        """
+        Args:
+            message (dict): The response message.
+        """
+        self.message = message
+        self.payload = json.dumps(message).encode()
+
+
+def encode_frame(payload):
+    """
+    Prefixes the payload with its length.
+    Args:
+        payload (bytes): The message payload.
+    Returns:
+        bytes: The length-prefixed frame.
+    """
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+class FrameReader:
+    """
+    Reads messages from a socket into a single preallocated receive buffer.
+
+    Data is received with recv_into straight into a bytearray, so received bytes are copied only once, when a
+    complete message is taken out of the buffer. Delimited messages are searched incrementally, without rescanning
+    the bytes which have already been checked for the delimiter.
+    """
+
+    def __init__(self, socket_, max_frame_size=DEFAULT_MAX_FRAME_SIZE, buffer_size=64 * 1024):
+        """
+        Args:
+            socket_ (socket.socket): The socket to read from.
+            max_frame_size (int, optional): Maximum size of a single message in bytes.
+            buffer_size (int, optional): Initial size of the receive buffer in bytes.
+        """
+        self.__socket = socket_
+        self.max_frame_size = max_frame_size
+        self.__buffer = bytearray(buffer_size)
+        self.__view = memoryview(self.__buffer)
+        self.__start = 0
+        self.__end = 0
+        self.__eof = False
+
+    def read_frame(self):
+        """
+        Reads one length-prefixed frame.
+        Returns:
+            bytes: The frame payload, or None if the connection was closed before a new frame started.
+        Raises:
+            FrameTooLargeError: If the announced frame size exceeds the maximum frame size.
+            ConnectionError: If the connection was closed in the middle of a frame.
+        """
+        if not self.__fill(FRAME_HEADER.size):
+            if self.__end == self.__start:
+                return None
+            raise ConnectionError("Connection closed in the middle of a frame header")
+
+        (length,) = FRAME_HEADER.unpack_from(self.__buffer, self.__start)
+        if length > self.max_frame_size:
+            raise FrameTooLargeError(f"Frame of {length} bytes exceeds the maximum of {self.max_frame_size} bytes")
+
+        if not self.__fill(FRAME_HEADER.size + length):
+            raise ConnectionError("Connection closed in the middle of a frame")
+
+        payload_start = self.__start + FRAME_HEADER.size
+        payload = self.__view[payload_start:payload_start + length].tobytes()
+        self.__consume(FRAME_HEADER.size + length)
+        return payload
+
+    def read_until(self, delimiter=DELIMITER):
+        """
+        Reads one message terminated by the delimiter.
+        Returns:
+            bytes: The message including the delimiter. If the connection was closed before the delimiter arrived,
+            the data received so far is returned (empty bytes if there was none).
+        Raises:
+            FrameTooLargeError: If the message grows beyond the maximum frame size.
+        """
+        scanned = self.__start
+        while True:
+            position = self.__buffer.find(delimiter, scanned, self.__end)
+            if position >= 0:
+                message_end = position + len(delimiter)
+                message = self.__view[self.__start:message_end].tobytes()
+                self.__consume(message_end - self.__start)
+                return message
+
+            if self.__end - self.__start > self.max_frame_size:
+                raise FrameTooLargeError(f"Message exceeds the maximum of {self.max_frame_size} bytes")
+
+            # The delimiter may be split between the received data and the next chunk
+            scanned = max(self.__start, self.__end - len(delimiter) + 1)
+            offset = self.__start
+            if not self.__receive():
+                message = self.__view[self.__start:self.__end].tobytes()
+                self.__consume(self.__end - self.__start)
+                return message
+            scanned -= offset - self.__start
+
+    def buffered(self):
+        """
+        Returns the number of received bytes which have not been read as a message yet, e.g. the beginning of a
+        request the client sent right after the previous one.
+        Returns:
+            int: The number of buffered bytes.
+        """
+        return self.__end - self.__start
+
+    def __fill(self, size):
+        """
+        Receives data until at least size bytes are buffered.
+        Returns:
+            bool: True if enough data is buffered, False if the connection was closed before.
+        """
+        while self.__end - self.__start < size:
+            if len(self.__buffer) - self.__start < size:
+                self.__make_room(size)
+            if not self.__receive():
+                return False
+        return True
+
+    def __receive(self):
+        """
+        Receives the next chunk of data into the free part of the buffer.
+        Returns:
+            bool: False if the connection has been closed, True otherwise.
+        """
+        if self.__eof:
+            return False
+        if self.__end == len(self.__buffer):
+            self.__make_room(self.__end - self.__start + 1)
+        received = self.__socket.recv_into(self.__view[self.__end:])
+        if received == 0:
+            self.__eof = True
+            return False
+        self.__end += received
+        return True
+
+    def __make_room(self, size):
+        """
+        Moves the buffered data to the beginning of the buffer and grows the buffer if it cannot hold size bytes.
+        """
+        pending = self.__end - self.__start
+        if size > len(self.__buffer):
+            self.__view.release()
+            buffer = bytearray(max(size, 2 * len(self.__buffer)))
+            buffer[:pending] = self.__buffer[self.__start:self.__end]
+            self.__buffer = buffer
+            self.__view = memoryview(self.__buffer)
+        elif self.__start:
+            self.__buffer[:pending] = self.__buffer[self.__start:self.__end]
+        self.__start = 0
+        self.__end = pending
+
+    def __consume(self, size):
+        """
+        Marks size bytes at the beginning of the buffered data as read.
+        """
+        self.__start += size
+        if self.__start == self.__end:
+            self.__start = self.__end = 0
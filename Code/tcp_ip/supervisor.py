@@ -0,0 +1,112 @@
+import multiprocessing
+import time
+from multiprocessing.connection import wait
+
+
+class ProcessSupervisor:
+    """
+    Starts a fixed number of server worker processes and restarts the ones which exit.
+
+    Worker processes are started with the "spawn" method, so every worker imports the server modules on its own
+    and opens its own database connections instead of sharing the ones of the supervisor.
+    """
+
+    def __init__(self, target, args, processes, server_logger, restart_delay=1.0, min_uptime=5.0):
+        """
+        Args:
+            target (callable): Module level function run by every worker process.
+            args (tuple): Arguments passed to the target. They must be picklable.
+            processes (int): Number of worker processes.
+            server_logger (TMSLogger): Logger instance for logging events.
+            restart_delay (float, optional): Seconds to wait before restarting a worker which crashed quickly.
+            min_uptime (float, optional): Workers exiting sooner than this number of seconds are restarted with
+                a delay, so a worker failing at start-up does not end in a tight restart loop.
+        """
+        if processes < 1:
+            raise ValueError(f"Number of worker processes must be positive, got {processes}")
+
+        self.target = target
+        self.args = args
+        self.processes = processes
+        self.server_logger = server_logger
+        self.restart_delay = restart_delay
+        self.min_uptime = min_uptime
+        self.__context = multiprocessing.get_context("spawn")
+        self.__workers = {}
+        self.__restarts = 0
+
+    def start(self):
+        """
+        Starts all worker processes.
+        """
+        for slot in range(self.processes):
+            self.__start_worker(slot)
+        self.server_logger.log_debug(f"Supervisor started {self.processes} worker processes")
+
+    def monitor(self, timeout=None):
+        """
+        Waits until a worker process exits and restarts it.
+        Args:
+            timeout (float, optional): Maximum number of seconds to wait. Waits forever if None.
+        Returns:
+            list: The slots of the restarted workers.
+        """
+        sentinels = {process.sentinel: slot for slot, (process, _) in self.__workers.items()}
+        restarted = []
+        for sentinel in wait(list(sentinels), timeout):
+            slot = sentinels[sentinel]
+            process, started = self.__workers[slot]
+            process.join()
+            uptime = time.monotonic() - started
+            self.server_logger.log_error(f"Worker process {process.pid} exited with code {process.exitcode} "
+                                         f"after {uptime:.1f} s, restarting it")
+            if uptime < self.min_uptime:
+                time.sleep(self.restart_delay)
+            self.__start_worker(slot)
+            self.__restarts += 1
+            restarted.append(slot)
+        return restarted
+
+    def run(self):
+        """
+        Starts the worker processes and keeps them running until the supervisor is interrupted.
+        """
+        self.start()
+        try:
+            while True:
+                self.monitor()
+        except KeyboardInterrupt:
+            self.server_logger.log_debug("Supervisor interrupted, stopping worker processes")
+        finally:
+            self.stop()
+
+    def stop(self):
+        """
+        Terminates all worker processes.
+        """
+        for process, _ in self.__workers.values():
+            if process.is_alive():
+                process.terminate()
+        for process, _ in self.__workers.values():
+            process.join()
+        self.__workers.clear()
+
+    def stats(self):
+        """
+        Returns the runtime statistics of the supervisor.
+        Returns:
+            dict: Number of worker processes, their process IDs and the number of restarts.
+        """
+        return {
+            "processes": self.processes,
+            "pids": [process.pid for process, _ in self.__workers.values()],
+            "restarts": self.__restarts
+        }
+
+    def __start_worker(self, slot):
+        """
+        Starts the worker process of the given slot.
+        """
+        process = self.__context.Process(target=self.target, args=self.args, name=f"tms_server_{slot}", daemon=True)
+        process.start()
+        self.__workers[slot] = (process, time.monotonic())
@@ -4,6 +4,10 @@ import json
 import threading
 import socket
 import datetime
+import base64
+import functools
+import binascii
+import sqlite3
 
 
 # Function to get the correct path to resources
@@ -22,13 +26,29 @@ def resource_path(relative_path):
 sys.path.append(resource_path('Code'))
 
 from Code.utils import tms_logs
-from Code.database.database import DatabaseServices
+from Code.database.database import (DatabaseServices, read_db_config, DEFAULT_POOL_SIZE, DEFAULT_WRITE_POOL_SIZE,
+                                     DEFAULT_POOL_TIMEOUT, DEFAULT_HEALTH_CHECK_INTERVAL,
+                                     DEFAULT_WAL_CHECKPOINT_INTERVAL)
+from Code.database.storage_profile import StorageProfile
+from Code.database.taxpayer_import import TaxpayerImporter, IMPORT_FORMATS, DEFAULT_IMPORT_BATCH_SIZE
+from Code.utils.rw_lock import ReadWriteLock
+from Code.utils.name_matching import name_keys
+from Code.utils.ttl_cache import TTLCache
+from Code.utils.session_tokens import SessionTokenStore, DEFAULT_SESSION_TTL
+from Code.utils.password_verifier import PasswordVerifier, VerifierBusyError
+from Code.utils.rate_limiter import RateLimiter
+from Code.utils.records import Taxpayer
+from Code.utils.taxpayer_columns import PERSONAL_INFO_COLUMNS, TAXPAYER_COLUMNS
+from Code.tcp_ip.commands import CommandRegistry, READ_ACCESS, WRITE_ACCESS, NO_ACCESS
+from Code.tcp_ip.protocol import (ConnectionState, FrameReader, FrameTooLargeError, StreamingResponse, EncodedResponse,
+                                  encode_frame, DELIMITER, DELIMITED_FRAMING, LENGTH_PREFIXED_FRAMING, DEFAULT_MAX_FRAME_SIZE)
 
 
 TCP_ERROR_CODES = {
     "No error": 0,
     "TCP Client is busy": 1,
     "TCP Connection error": 2,
+    "Batch request error": 3,
 }
 
 # Determine the base path based on the execution context
@@ -42,10 +62,143 @@ else:
 # Construct the path to the SQLite database file
 db_path = os.path.join(base_path, 'database', 'taxpayers.db')
 
+# Directory holding the files which can be imported with the import_taxpayers command
+import_path = os.path.join(base_path, 'imports')
+
+# Read the database configuration, the defaults are used for missing keys
+db_config = read_db_config(os.path.join(base_path, 'configs', 'db_config.json'))
+
 # Initialize the DatabaseServices object
-database = DatabaseServices(db_path)
+database = DatabaseServices(db_path, pool_size=db_config.get("pool_size", DEFAULT_POOL_SIZE),
+                            pool_timeout=db_config.get("pool_timeout", DEFAULT_POOL_TIMEOUT),
+                            health_check_interval=db_config.get("health_check_interval",
+                                                                DEFAULT_HEALTH_CHECK_INTERVAL),
+                            write_pool_size=db_config.get("write_pool_size", DEFAULT_WRITE_POOL_SIZE),
+                            storage_profile=StorageProfile.from_config(db_config),
+                            wal_checkpoint_interval=db_config.get("wal_checkpoint_interval",
+                                                                  DEFAULT_WAL_CHECKPOINT_INTERVAL),
+                            wal_checkpoint_mode=db_config.get("wal_checkpoint_mode", "PASSIVE"),
+                            search_cache=TTLCache(max_size=db_config.get("search_cache_size", 1024),
+                                                  ttl=db_config.get("search_cache_ttl", 30.0)))
+
+# Reads run in parallel, only commands modifying the database are serialized
+db_lock = ReadWriteLock()
+
+# Encoded retrieve_user_details responses by national ID. Saving a user invalidates its entry; the time to live bounds
+# how long other server processes, which do not see the invalidation, may serve an outdated copy.
+user_details_cache = TTLCache(max_size=db_config.get("user_details_cache_size", 4096),
+                              ttl=db_config.get("user_details_cache_ttl", 60.0))
+
+
+def user_details_cache_key(national_id):
+    """
+    Normalizes a national ID to the key of the user details cache, national IDs are sent as numbers or strings.
+    Args:
+        national_id (int | str): The national ID.
+    Returns:
+        int | str: The national ID as a number if it is one.
+    """
+    try:
+        return int(national_id)
+    except (TypeError, ValueError):
+        return national_id
+
+
+database.add_write_listener(
+    lambda national_ids: user_details_cache.invalidate(map(user_details_cache_key, national_ids)))
+
+# Maximum number of sub-requests accepted in one batch request
+MAX_BATCH_REQUESTS = 10000
+
+# Maximum number of users returned in one page of find_user results
+MAX_SEARCH_PAGE_SIZE = 1000
+
+# Number of users sent in one message of a streamed find_user response
+SEARCH_STREAM_CHUNK_SIZE = 50
+
+# Search modes of find_user: exact matching of any of the criteria, ranked matching of the beginnings of the names,
+# or ranked matching of names which sound alike
+EXACT_SEARCH = "exact"
+PREFIX_SEARCH = "prefix"
+FUZZY_SEARCH = "fuzzy"
+SEARCH_MODES = (EXACT_SEARCH, PREFIX_SEARCH, FUZZY_SEARCH)
+RANKED_SEARCH_MODES = (PREFIX_SEARCH, FUZZY_SEARCH)
+
+# Fields of the users returned by find_user unless the request asks for other "fields"
+SEARCH_RESULT_FIELDS = ("national_id", "first_name", "last_name", "date_of_birth")
+
+
+def requested_fields(fields, allowed, default):
+    """
+    Validates the "fields" list of a request, which selects the fields of the returned users.
+    Args:
+        fields (list | None): The requested field names, None for the default fields.
+        allowed (tuple): The names of the fields which may be requested.
+        default (tuple): The fields returned if none are requested.
+    Returns:
+        tuple: The fields in the requested order, the national ID always comes first.
+    Raises:
+        ValueError: If the fields are not a list of allowed field names.
+    """
+    if fields is None:
+        return default
+    if not isinstance(fields, list) or not all(isinstance(field, str) and field in allowed for field in fields):
+        raise ValueError(f"Fields must be a list of {', '.join(allowed)}")
+    return ("national_id",) + tuple(dict.fromkeys(field for field in fields if field != "national_id"))
 
-db_lock = threading.Lock()
+
+class BatchAbortedError(Exception):
+    """
+    Raised inside the transaction of a batch request when a sub-request fails, so the whole batch is rolled back.
+    """
+
+    def __init__(self, index, result):
+        super().__init__(f"Request {index} of the batch failed: {result.get('message', result.get('command'))}")
+        self.index = index
+        self.result = result
+
+
+# Header carrying the session token returned by login_request
+SESSION_TOKEN_HEADER = "Session-Token"
+
+# Commands served without a session token
+PUBLIC_COMMANDS = ("login_request",)
+
+
+def encode_search_cursor(national_id, rank=None):
+    """
+    Encodes the position after which the next page of search results starts into an opaque cursor.
+    Args:
+        national_id (int): The national ID of the last user of the current page.
+        rank (float, optional): The rank of the last user of the current page of a ranked search.
+    Returns:
+        str: The cursor sent to the client.
+    """
+    position = {"after": national_id}
+    if rank is not None:
+        position["rank"] = rank
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_search_cursor(cursor):
+    """
+    Decodes a cursor created by encode_search_cursor.
+    Args:
+        cursor (str): The cursor received from the client.
+    Returns:
+        tuple: The national ID and the rank (None if the search is not ranked) after which the next page starts.
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        national_id = position["after"]
+        rank = position.get("rank")
+    except (AttributeError, binascii.Error, UnicodeDecodeError, json.JSONDecodeError, KeyError, TypeError):
+        raise ValueError(f"Invalid search cursor: {cursor!r}")
+    if not isinstance(national_id, int) or not (rank is None or isinstance(rank, (int, float))):
+        raise ValueError(f"Invalid search cursor: {cursor!r}")
+    return national_id, rank
 
 
 class TCPClient:
@@ -58,20 +211,56 @@ class TCPClient:
 
     def __init__(self, tms_logger, host, port):
         self.tms_logger = tms_logger
+        if getattr(self, "_TCPClient__initialized", False):
+            # The client is a singleton, keep the open connection unless it points to another server
+            if (self.host, self.port) != (host, port):
+                self.close()
+                self.host = host
+                self.port = port
+            return
+
         self.host = host
         self.port = port
-        self.__busy = False
+        self.keep_alive = True
+        self.framing = LENGTH_PREFIXED_FRAMING
+        self.max_frame_size = DEFAULT_MAX_FRAME_SIZE
+        self.timeout = None
+        self.session_token = None
         self.__busy = False
         self.__lock = threading.Lock()
+        self.__socket = None
+        self.__reader = None
+        self.__framed = False
+        self.__initialized = True
 
     def send_request(self, request):
         """
-        Sends a request to the TCP server and returns the response.
+        Sends a request to the TCP server and returns the response. With keep-alive enabled the connection is kept
+        open and reused by the following requests; if the server has closed it in the meantime, the request is sent
+        once more on a new connection.
         Args:
             request (bytes): The request data to be sent.
         Returns:
             dict: A dictionary containing the error code and response data.
         """
+        return self.__send(request)
+
+    def send_stream_request(self, request, message_callback):
+        """
+        Sends a request whose response is streamed by the server, e.g. a find_user request with "stream": true.
+        The partial messages are passed to the callback as soon as they arrive.
+        Args:
+            request (bytes): The request data to be sent.
+            message_callback (callable): Function called with every partial message as a dict.
+        Returns:
+            dict: A dictionary containing the error code and the final message of the response.
+        """
+        return self.__send(request, message_callback)
+
+    def __send(self, request, message_callback=None):
+        """
+        Sends a request and receives its response, see send_request and send_stream_request.
+        """
         if self.__busy:
             self.tms_logger.log_critical("Could not establish TCP connection. Client is busy")
             return {"error": TCP_ERROR_CODES["TCP Client is busy"], "response": None}
@@ -79,23 +268,199 @@ class TCPClient:
         with self.__lock:
             self.__busy = True
             try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
-                    client_socket.connect((self.host, self.port))
+                # Ensure the request is a bytes-like object
+                if isinstance(request, str):
+                    request = request.encode()
+                request, framing = self.__add_protocol_headers(request)
 
-                    # Ensure the request is a bytes-like object
-                    if isinstance(request, str):
-                        request = request.encode()
+                reused_connection = self.__socket is not None
+                response = self.__exchange(request, framing)
+                if response is None and reused_connection:
+                    self.tms_logger.log_debug("Kept alive connection has been closed by server, reconnecting")
+                    response = self.__exchange(request, framing)
+                if response is None:
+                    raise ConnectionError("Connection closed by server without response")
+                if message_callback is not None:
+                    response = self.__receive_stream(response, message_callback)
 
-                    client_socket.sendall(request)
-                    response = client_socket.recv(1024).decode().strip()
-                    self.__busy = False
-                    return {"error": TCP_ERROR_CODES["No error"], "response": response}
+                if not self.keep_alive:
+                    self.close()
+                return {"error": TCP_ERROR_CODES["No error"], "response": response.decode().strip()}
             except socket.timeout as error:
+                self.close()
                 self.tms_logger.log_critical(f"Timeout occurred during TCP socket connection: {error}")
                 return {"error": TCP_ERROR_CODES["TCP Connection error"], "response": None}
             except socket.error as error:
+                self.close()
                 self.tms_logger.log_critical(f"Socket error occurred: {error}")
                 return {"error": TCP_ERROR_CODES["TCP Connection error"], "response": None}
+            except FrameTooLargeError as error:
+                self.close()
+                self.tms_logger.log_critical(f"Response rejected: {error}")
+                return {"error": TCP_ERROR_CODES["TCP Connection error"], "response": None}
+            finally:
+                self.__busy = False
+
+    def send_batch(self, requests):
+        """
+        Sends several requests to the TCP server in one round trip. The server executes them in order, in a single
+        database transaction.
+        Args:
+            requests (list): The request blocks, each a dict with a "command" key and the command parameters.
+        Returns:
+            dict: A dictionary containing the error code and the ordered list of responses.
+        """
+        message = {
+            "header": {
+                "Content-Type": "application/json",
+                "Encoding": "utf-8"
+            },
+            "request": {
+                "command": "batch",
+                "requests": list(requests)
+            }
+        }
+        response = self.send_request(json.dumps(message).encode() + DELIMITER)
+        if response["error"] != TCP_ERROR_CODES["No error"]:
+            return response
+
+        try:
+            response_data = json.loads(response["response"])
+        except json.JSONDecodeError as json_error:
+            self.tms_logger.log_error(f"Invalid batch response: {json_error}")
+            return {"error": TCP_ERROR_CODES["Batch request error"], "response": None}
+
+        if response_data.get("command") != "batch_successful":
+            self.tms_logger.log_error(f"Batch request failed: {response_data.get('message')}")
+            return {"error": TCP_ERROR_CODES["Batch request error"], "response": None}
+        return {"error": TCP_ERROR_CODES["No error"], "response": response_data["results"]}
+
+    def close(self):
+        """
+        Closes the kept alive connection to the server, if any.
+        """
+        if self.__socket is not None:
+            try:
+                self.__socket.close()
+            finally:
+                self.__socket = None
+                self.__reader = None
+                self.__framed = False
+
+    def set_framing(self, framing, max_frame_size=DEFAULT_MAX_FRAME_SIZE):
+        """
+        Sets the framing mode used for the following connections.
+        Args:
+            framing (str): Either "length-prefixed" or "delimiter".
+            max_frame_size (int, optional): Maximum size of a single response in bytes.
+        Returns:
+            bool: True if the framing mode is valid and set, False otherwise.
+        """
+        if framing not in (LENGTH_PREFIXED_FRAMING, DELIMITED_FRAMING) or not isinstance(max_frame_size, int):
+            return False
+        with self.__lock:
+            self.close()
+            self.framing = framing
+            self.max_frame_size = max_frame_size
+        return True
+
+    def __exchange(self, request, framing):
+        """
+        Sends the request over the current connection, opening a new one if needed, and reads the response.
+        Length-prefixed framing is negotiated by the first request on a connection, whose response already arrives
+        as a frame; all following requests on that connection are sent as frames as well.
+        Args:
+            request (bytes): The request message terminated by the delimiter.
+            framing (str): The framing mode requested in the header block of the request.
+        Returns:
+            bytes: The response, or None if the server closed the connection without responding.
+        """
+        if self.__socket is None:
+            self.__socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            self.__reader = FrameReader(self.__socket, self.max_frame_size)
+            self.__framed = False
+
+        framed_response = self.__framed or framing == LENGTH_PREFIXED_FRAMING
+        try:
+            if self.__framed:
+                self.__socket.sendall(encode_frame(request.rstrip(DELIMITER)))
+            else:
+                self.__socket.sendall(request)
+
+            if framed_response:
+                response = self.__reader.read_frame()
+                complete = response is not None
+                self.__framed = complete
+            else:
+                response = self.__reader.read_until(DELIMITER)
+                complete = response.endswith(DELIMITER)
+        except (ConnectionResetError, BrokenPipeError):
+            response, complete = None, False
+
+        if not complete:
+            # The server closed the connection, the response (if any) is complete
+            self.close()
+        return response or None
+
+    def __receive_stream(self, response, message_callback):
+        """
+        Passes the partial messages of a streamed response to the callback, until the final message arrives.
+        Args:
+            response (bytes): The first message of the response.
+            message_callback (callable): Function called with every partial message as a dict.
+        Returns:
+            bytes: The final message of the response.
+        """
+        try:
+            while True:
+                try:
+                    message = json.loads(response)
+                except ValueError:
+                    return response
+                if not isinstance(message, dict) or not message.get("partial"):
+                    return response
+                message_callback(message)
+
+                if self.__framed:
+                    response = self.__reader.read_frame()
+                    if response is None:
+                        raise ConnectionError("Connection closed by server in the middle of a streamed response")
+                else:
+                    response = self.__reader.read_until(DELIMITER)
+                    if not response.endswith(DELIMITER):
+                        raise ConnectionError("Connection closed by server in the middle of a streamed response")
+        except BaseException:
+            # The rest of the stream is still on its way, the connection cannot be reused
+            self.close()
+            raise
+
+    def __add_protocol_headers(self, request):
+        """
+        Adds the keep-alive and framing preferences and the session token of the client to the header block of the
+        request.
+        Args:
+            request (bytes): The request data.
+        Returns:
+            tuple: The request data with the protocol headers, or the unchanged request if it is not a JSON message,
+            and the framing mode requested by it.
+        """
+        if not self.keep_alive and self.framing == DELIMITED_FRAMING and self.session_token is None:
+            return request, DELIMITED_FRAMING
+        try:
+            message = json.loads(request)
+        except ValueError:
+            return request, DELIMITED_FRAMING
+        if not isinstance(message, dict):
+            return request, DELIMITED_FRAMING
+
+        header = message.setdefault("header", {})
+        if self.keep_alive:
+            header["Connection"] = "keep-alive"
+        if self.framing == LENGTH_PREFIXED_FRAMING:
+            header["Framing"] = LENGTH_PREFIXED_FRAMING
+        if self.session_token is not None:
+            header[SESSION_TOKEN_HEADER] = self.session_token
+        return json.dumps(message).encode() + DELIMITER, self.framing
 
     def is_busy(self):
         """
@@ -114,6 +479,7 @@ class TCPClient:
             bool: True if the port number is valid and set, False otherwise.
         """
         if isinstance(number, int):
+            self.close()
             self.port = number
             return True
         return False
@@ -127,32 +493,86 @@ class TCPClient:
             bool: True if the host address is valid and set, False otherwise.
         """
         if isinstance(address, str):
+            self.close()
             self.host = address
             return True
         return False
 
 
 class TCPServer:
-    def __init__(self, host, port, new_user_window_instance):
+    def __init__(self, host, port, new_user_window_instance, keep_alive=True, idle_timeout=30,
+                 max_frame_size=DEFAULT_MAX_FRAME_SIZE, server_socket=None, reuse_port=False, require_session=False,
+                 session_ttl=DEFAULT_SESSION_TTL, password_workers=2, password_queue_size=64,
+                 login_attempts_per_minute=10, login_burst=5, login_rate_limit_buckets=10000):
         """
         Initializes the TCP server with the specified host and port.
         Args:
             host (str): The host address.
             port (int): The port number.
             new_user_window_instance: An instance of the new user window.
+            keep_alive (bool, optional): Whether clients may send several requests over one connection.
+            idle_timeout (float, optional): Seconds a kept alive connection may stay idle before it is closed.
+            max_frame_size (int, optional): Maximum size of a single request message in bytes.
+            server_socket (socket.socket, optional): An already bound listening socket, e.g. one inherited from
+                the supervisor process, which is used instead of binding a new one.
+            reuse_port (bool, optional): Whether the new listening socket may share its port with the sockets of
+                other server processes (SO_REUSEPORT).
+            require_session (bool, optional): Whether all commands except login_request must carry a valid session
+                token in their header block.
+            session_ttl (float, optional): Seconds a session token returned by login_request stays valid.
+            password_workers (int, optional): Number of threads verifying login passwords.
+            password_queue_size (int, optional): Maximum number of logins waiting for a password thread, further
+                logins are rejected until the queue drains.
+            login_attempts_per_minute (float, optional): Sustained number of login attempts allowed per client
+                address and per username.
+            login_burst (int, optional): Number of login attempts a client address or username may make at once.
+            login_rate_limit_buckets (int, optional): Maximum number of client addresses and of usernames whose
+                login attempts are tracked.
         """
         self.host = host
         self.port = port
+        self.keep_alive = keep_alive
+        self.idle_timeout = idle_timeout
+        # Poller watching kept alive connections between their requests, see handle_request_match
+        self.idle_poller = None
+        self.max_frame_size = max_frame_size
         self.new_user_window_instance = new_user_window_instance
-        self.__username = None
-        self.__password = None
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.bind((self.host, self.port))
-        self.server_socket.listen(5)
+        self.require_session = require_session
+        self.sessions = SessionTokenStore(ttl=session_ttl)
+        self.password_verifier = PasswordVerifier(max_workers=password_workers, max_pending=password_queue_size)
+        self.address_login_limiter = RateLimiter(login_attempts_per_minute / 60, login_burst,
+                                                 max_buckets=login_rate_limit_buckets)
+        self.username_login_limiter = RateLimiter(login_attempts_per_minute / 60, login_burst,
+                                                  max_buckets=login_rate_limit_buckets)
+        if server_socket is None:
+            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            if reuse_port:
+                self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            self.server_socket.bind((self.host, self.port))
+            self.server_socket.listen(5)
+        else:
+            self.server_socket = server_socket
         self.server_logger = tms_logs.TMSLogger("server")
         if not self.server_logger.setup():
             raise Exception("Failed to set up server logger")
         self.server_logger.log_debug(f"Server is listening on: {self.host, self.port}")
+        self.commands = CommandRegistry()
+        # Reads the password hash under the read lock and verifies it outside of any lock
+        self.register_command("login_request", self.__login_request, NO_ACCESS)
+        self.register_command("save_new_user", self.__save_new_user, WRITE_ACCESS)
+        # Takes the write lock per batch, so searches keep running during a long import
+        self.register_command("import_taxpayers", self.__import_taxpayers, NO_ACCESS)
+        self.register_command("find_user", self.__find_user, READ_ACCESS)
+        self.register_command("retrieve_user_details", self.__retrieve_user_details, READ_ACCESS)
+        self.register_command("server_stats", self.__server_stats, NO_ACCESS)
+        self.register_command("batch", self.execute_batch, NO_ACCESS)
+        self.__stats_providers = {"db_lock": db_lock.stats, "db_pool": database.pool_stats,
+                                  "storage": database.storage_stats, "commands": self.commands.stats,
+                                  "user_details_cache": user_details_cache.stats,
+                                  "search_cache": database.search_cache_stats, "sessions": self.sessions.stats,
+                                  "password_verifier": self.password_verifier.stats,
+                                  "login_rate_limit": lambda: {"address": self.address_login_limiter.stats(),
+                                                               "username": self.username_login_limiter.stats()}}
 
     def __del__(self):
         """
@@ -161,6 +581,43 @@ class TCPServer:
         if hasattr(self, 'server_socket'):
             self.server_socket.close()
 
+    def register_stats_provider(self, name, provider):
+        """
+        Registers a source of runtime statistics reported by the server_stats command.
+        Args:
+            name (str): The name under which the statistics are reported.
+            provider (callable): Function without arguments returning a JSON serializable dict.
+        """
+        self.__stats_providers[name] = provider
+
+    def get_stats(self):
+        """
+        Collects the runtime statistics from all registered providers.
+        Returns:
+            dict: The statistics keyed by provider name.
+        """
+        return {name: provider() for name, provider in self.__stats_providers.items()}
+
+    def reject_busy(self, client_socket_):
+        """
+        Answers a client which cannot be served right now with a "server busy" response and closes the socket,
+        so the client fails fast instead of waiting for a free worker.
+        Args:
+            client_socket_ (socket.socket): The client socket.
+        """
+        response_data = {
+            "command": "server_busy",
+            "status": "error",
+            "message": "Server busy, please try again later"
+        }
+        try:
+            client_socket_.settimeout(1)
+            client_socket_.sendall(self.encode_response(response_data))
+        except socket.error as socket_error:
+            self.server_logger.log_error(f"Socket error occurred while rejecting client: {socket_error}")
+        finally:
+            client_socket_.close()
+
     @staticmethod
     def parse_header(header_data):
         """
@@ -175,23 +632,20 @@ class TCPServer:
         except json.JSONDecodeError as json_error:
             raise ValueError(f"Invalid JSON format: {json_error}")
 
-    def recv_until(self, client_socket_, delimiter):
+    def read_message(self, reader, connection):
         """
-        Receives data from the client socket until the specified delimiter is encountered.
+        Receives the next request message in the framing mode negotiated for the connection.
         Args:
-            client_socket_ (socket.socket): The client socket.
-            delimiter (bytes): The delimiter to stop receiving data.
+            reader (FrameReader): The frame reader of the client socket.
+            connection (ConnectionState): The state of the connection.
         Returns:
-            bytes: The received data.
+            bytes: The received message, empty if the client closed the connection.
         """
         try:
-            data = b''
-            while not data.endswith(delimiter):
-                chunk = client_socket_.recv(1024)
-                if not chunk:
-                    break
-                data += chunk
-                self.server_logger.log_debug(f"Received chunk: {chunk}")
+            if connection.framing == LENGTH_PREFIXED_FRAMING:
+                data = reader.read_frame() or b''
+            else:
+                data = reader.read_until(DELIMITER)
         except socket.error as error:
             self.server_logger.log_error(f"Error receiving data: {error}")
             raise  # Re-raise the exception for caller to handle it
@@ -199,157 +653,57 @@ class TCPServer:
         self.server_logger.log_debug(f"Complete data received: {data}")
         return data
 
-    def handle_request_match(self, client_socket_):
+    def handle_request_match(self, client_socket_, connection=None, reader=None):
         """
-        Handles incoming requests from the client socket.
+        Handles incoming requests from the client socket. The socket is closed after the first response unless the
+        client asked for a kept alive connection, in which case requests are served until the client disconnects or
+        the connection stays idle for longer than the idle timeout. The idle timeout applies from the moment the
+        connection is accepted, so a client which connects but never sends a request does not pin a worker.
+
+        With an idle poller, a kept alive connection is parked on the poller after each response instead of waiting
+        for the next request on the worker thread, and is handed back with its state once it is readable again.
         Args:
             client_socket_ (socket.socket): The client socket.
+            connection (ConnectionState, optional): The state of a resumed connection, None for a new one.
+            reader (FrameReader, optional): The frame reader of a resumed connection, None for a new one.
         """
         # time.sleep(3)  # Debug line
 
-        user_info_list = []
+        client_socket_.settimeout(self.idle_timeout)
+        if connection is None:
+            try:
+                connection = ConnectionState(client_socket_.getpeername())
+            except socket.error:
+                connection = ConnectionState()
+        if reader is None:
+            reader = FrameReader(client_socket_, self.max_frame_size)
+
+        parked = False
         try:
-            message_data = self.recv_until(client_socket_, b'\r\n').decode().strip()
-            self.server_logger.log_debug(f"Received message: {message_data}")
+            while True:
+                message_data = self.read_message(reader, connection).decode().strip()
+                if not message_data and connection.requests:
+                    self.server_logger.log_debug("Client closed kept alive connection")
+                    break
 
-            try:
-                request_data = json.loads(message_data)
-            except json.JSONDecodeError as json_error:
-                self.server_logger.log_error(f"JSON parsing error: {json_error}")
-                response = "Invalid JSON format"
-                client_socket_.sendall(response.encode())
-                return
-
-            self.server_logger.log_debug(f"Parsed request data: {request_data}")
-            command = request_data["request"].get("command")
-            self.server_logger.log_debug(f"Command received: {command}")
-
-            with db_lock:
-                match command:
-
-                    case "login_request":
-                        username = request_data["request"].get("username")
-                        password = request_data["request"].get("password")
-                        if not username or not password:
-                            response = "Username and password must be provided"
-                            client_socket_.sendall(response.encode())
-                            self.server_logger.log_debug("Sent response: 'Username and password must be provided'")
-                            return
-
-                        try:
-                            result = database.check_credentials(username, password)
-                        except Exception as db_error:
-                            self.server_logger.log_error(f"Database error during login: {db_error}")
-                            response = "Server error during login"
-                            client_socket_.sendall(response.encode())
-                            return
-
-                        if result:
-                            response = "User logged in successfully"
-                            client_socket_.sendall(response.encode())
-                            self.server_logger.log_debug("Sent response: 'User logged in successfully'")
-                        else:
-                            response = "Invalid username or password"
-                            client_socket_.sendall(response.encode())
-                            self.server_logger.log_debug("Sent response: 'Invalid username or password'")
-
-                    case "save_new_user":
-                        national_id = request_data["request"].get("national_id")
-                        first_name = request_data["request"].get("first_name")
-                        last_name = request_data["request"].get("last_name")
-                        date_of_birth = request_data["request"].get("date_of_birth")
-                        gender = request_data["request"].get("gender")
-                        address_country = request_data["request"].get("address_country")
-                        address_zip_code = request_data["request"].get("address_zip_code")
-                        address_city = request_data["request"].get("address_city")
-                        address_street = request_data["request"].get("address_street")
-                        address_house_number = request_data["request"].get("address_house_number")
-                        phone_country_code = request_data["request"].get("phone_country_code")
-                        phone_number = request_data["request"].get("phone_number")
-                        marital_status = request_data["request"].get("marital_status")
-
-                        database.save_to_sql(national_id, first_name, last_name, date_of_birth, gender, address_country,
-                                             address_zip_code, address_city, address_street, address_house_number,
-                                             phone_country_code, phone_number, marital_status)
-
-                        response = {
-                            "status": "success",
-                            "message": "New user saved successfully"
-                        }
-                        client_socket_.sendall(json.dumps(response).encode())
-
-                        self.server_logger.log_debug("Sent response: 'New user saved successfully'")
-
-                    case "find_user":
-                        national_id = request_data["request"].get("national_id")
-                        first_name = request_data["request"].get("first_name")
-                        last_name = request_data["request"].get("last_name")
-                        date_of_birth = request_data["request"].get("date_of_birth")
-                        formatted_date_of_birth = None
-                        if date_of_birth:
-                            formatted_date_of_birth = datetime.datetime.strptime(date_of_birth,
-                                                                                 "%d.%m.%Y").strftime("%Y-%m-%d")
-                        search_results = database.search_personal_info(national_id, first_name, last_name,
-                                                                       formatted_date_of_birth)
-                        self.server_logger.log_debug(f"Search results: {search_results}")
-                        if not search_results:
-                            response_data = {"command": "search_unsuccessful"}
-                            response_message = json.dumps(response_data) + "\r\n"
-                            client_socket_.sendall(response_message.encode())
-                        else:
-                            for user in search_results:
-                                limited_user_info = {
-                                    "national_id": user[0],
-                                    "first_name": user[1],
-                                    "last_name": user[2],
-                                    "date_of_birth": user[3]
-                                }
-                                user_info_list.append(limited_user_info)
-                                self.server_logger.log_debug(f"Result: {user_info_list}")
-                            response_data = {"command": "search_successful", "user_info": user_info_list}
-                            self.server_logger.log_debug(f"Response message sent to client: {response_data}")
-                            response_message = json.dumps(response_data) + "\r\n"
-                            client_socket_.sendall(response_message.encode())
-
-                    case "retrieve_user_details":
-                        national_id = request_data["request"].get("national_id")
-                        search_results = database.retrieve_user_details(national_id)
-                        if not search_results:
-                            response_data = {"command": "retrieving_unsuccessful"}
-                        else:
-                            complete_user_info_list = []
-                            for user_info in search_results:
-                                complete_user_info = {
-                                    "national_id": user_info[0],
-                                    "first_name": user_info[1],
-                                    "last_name": user_info[2],
-                                    "date_of_birth": user_info[3],
-                                    "gender": user_info[4],
-                                    "address_country": user_info[6],
-                                    "address_zip_code": user_info[7],
-                                    "address_city": user_info[8],
-                                    "address_street": user_info[9],
-                                    "address_house_number": user_info[10],
-                                    "phone_country_code": user_info[11],
-                                    "phone_number": user_info[12],
-                                    "marital_status": user_info[14],
-                                    "tax_rate": user_info[15],
-                                    "yearly_income": user_info[16],
-                                    "advance_tax": user_info[17],
-                                    "tax_paid_this_year": user_info[18],
-                                    "property_value": user_info[19],
-                                    "loans": user_info[20],
-                                    "property_tax": user_info[21]
-                                }
-                                complete_user_info_list.append(complete_user_info)
-                                self.server_logger.log_debug(f"Complete_user_info_list: {complete_user_info_list}")
-                            response_data = {"command": "retrieving_successful", "user_info": complete_user_info_list}
-                        self.server_logger.log_debug(f"Response message sent to client: {response_data}")
-                        response_message = json.dumps(response_data) + "\r\n"
-                        client_socket_.sendall(response_message.encode())
-
-                    case _:
-                        self.server_logger.log_error(f"Command '{command}' unknown")
+                response = self.process_request(message_data, connection)
+                self.send_response(client_socket_, response, self.idle_timeout)
+
+                if not connection.keep_alive:
+                    break
+                # A request which has been received already is served straight away
+                if self.idle_poller is not None and not reader.buffered():
+                    self.idle_poller.park(client_socket_, connection, reader)
+                    parked = True
+                    break
+
+        except socket.timeout:
+
+            self.server_logger.log_debug("Connection idle timeout")
+
+        except FrameTooLargeError as frame_error:
+
+            self.server_logger.log_error(f"Request rejected: {frame_error}")
 
         except socket.error as socket_error:
 
@@ -361,6 +715,581 @@ class TCPServer:
 
         finally:
 
-            self.server_logger.log_debug("Closing client socket")
+            if not parked:
+                self.server_logger.log_debug("Closing client socket")
+                client_socket_.close()
 
-            client_socket_.close()
+    def process_request(self, message_data, connection=None):
+        """
+        Executes a single request message and builds the response for it. The method does not touch any socket,
+        so it is shared by the threaded and the asyncio server engines.
+        Args:
+            message_data (str): The received request message without the delimiter.
+            connection (ConnectionState, optional): The state of the connection the message was received on.
+        Returns:
+            bytes | generator: The encoded response terminated by the delimiter, a generator of encoded messages for
+            streamed responses, or None if no response should be sent.
+        """
+        if connection is None:
+            connection = ConnectionState()
+        connection.requests += 1
+        self.server_logger.log_debug(f"Received message: {message_data}")
+
+        try:
+            request_data = json.loads(message_data)
+        except json.JSONDecodeError as json_error:
+            self.server_logger.log_error(f"JSON parsing error: {json_error}")
+            connection.keep_alive = False
+            return self.encode_response("Invalid JSON format", connection.framing)
+
+        self.server_logger.log_debug(f"Parsed request data: {request_data}")
+        header = request_data.get("header") or {}
+        connection.keep_alive = self.keep_alive and str(header.get("Connection", "")).lower() == "keep-alive"
+        if str(header.get("Framing", "")).lower() == LENGTH_PREFIXED_FRAMING:
+            # The response to this request and all following messages on the connection are length-prefixed
+            connection.framing = LENGTH_PREFIXED_FRAMING
+
+        command = request_data["request"].get("command")
+        self.server_logger.log_debug(f"Command received: {command}")
+
+        if self.require_session and command not in PUBLIC_COMMANDS and command in self.commands:
+            if self.sessions.validate(header.get(SESSION_TOKEN_HEADER)) is None:
+                self.server_logger.log_debug(f"Command '{command}' rejected, session token is invalid or expired")
+                return self.encode_response({"command": "session_invalid", "status": "error",
+                                             "message": "Session is invalid or expired, please log in again"},
+                                            connection.framing)
+
+        if command == "login_request":
+            limited_response = self.limit_login(connection.client_address, request_data)
+            if limited_response is not None:
+                return self.encode_response(limited_response, connection.framing)
+
+        return self.encode_response(self.execute_command(command, request_data), connection.framing)
+
+    def limit_login(self, client_address, request_data):
+        """
+        Applies the login rate limits of the client address and of the username, before any database or password
+        work is done for the attempt.
+        Args:
+            client_address (tuple): The address of the client, None if unknown.
+            request_data (dict): The parsed login request message.
+        Returns:
+            dict: The rejection response if the attempt exceeds a limit, None if it is allowed.
+        """
+        # The port changes with every connection, the attempts are counted per host
+        host = client_address[0] if client_address else None
+        retry_after = self.address_login_limiter.acquire(host)
+        if not retry_after:
+            retry_after = self.username_login_limiter.acquire(str(request_data["request"].get("username")))
+        if not retry_after:
+            return None
+
+        self.server_logger.log_error(f"Login attempt from {host} rejected, too many attempts")
+        return {"command": "login_rate_limited", "status": "error",
+                "message": "Too many login attempts, please try again later", "retry_after": round(retry_after, 1)}
+
+    @staticmethod
+    def send_response(client_socket_, response, send_timeout=None):
+        """
+        Sends an encoded response. The messages of a streamed response are sent one by one as they are produced.
+        Args:
+            client_socket_ (socket.socket): The client socket.
+            response (bytes | generator | None): The response returned by process_request.
+            send_timeout (float, optional): Seconds a streamed message may take to be sent, so a client which stops
+                receiving does not keep the stream open.
+        """
+        if not response:
+            return
+        if isinstance(response, bytes):
+            client_socket_.sendall(response)
+            return
+        if send_timeout is not None:
+            client_socket_.settimeout(send_timeout)
+        try:
+            for message in response:
+                client_socket_.sendall(message)
+        finally:
+            response.close()
+
+    @staticmethod
+    def encode_response(response, framing=DELIMITED_FRAMING):
+        """
+        Encodes a response in the given framing mode. Plain text responses are sent as they are, any other
+        response is serialized to JSON.
+        Args:
+            response (str | dict | EncodedResponse | StreamingResponse | None): The response to be encoded.
+            framing (str, optional): The framing mode of the connection.
+        Returns:
+            bytes | generator: The encoded response, a generator of encoded messages for a streamed response, or
+            None if there is no response.
+        """
+        if response is None:
+            return None
+        if isinstance(response, StreamingResponse):
+            return TCPServer.encode_stream(response, framing)
+        if isinstance(response, EncodedResponse):
+            if framing == LENGTH_PREFIXED_FRAMING:
+                return encode_frame(response.payload)
+            return response.payload + DELIMITER
+        if not isinstance(response, str):
+            response = json.dumps(response)
+        if framing == LENGTH_PREFIXED_FRAMING:
+            return encode_frame(response.encode())
+        return (response + "\r\n").encode()
+
+    @staticmethod
+    def encode_stream(response, framing=DELIMITED_FRAMING):
+        """
+        Encodes the messages of a streamed response one by one, as they are produced.
+        Args:
+            response (StreamingResponse): The streamed response.
+            framing (str, optional): The framing mode of the connection.
+        Returns:
+            generator: The encoded messages.
+        """
+        try:
+            for message in response:
+                yield TCPServer.encode_response(message, framing)
+        finally:
+            response.close()
+
+    def register_command(self, name, handler, access=READ_ACCESS):
+        """
+        Registers a command served by the server.
+        Args:
+            name (str): The command name as sent by clients.
+            handler (callable): Function called with the parsed request message, returning the response.
+            access (str, optional): The database access of the command. "read" commands run in parallel, "write"
+                commands are serialized and "none" commands do not take the database lock.
+        """
+        self.commands.register(name, handler, access)
+
+    def execute_command(self, command, request_data):
+        """
+        Executes a command under the database lock declared by the command.
+        Args:
+            command (str): The command name.
+            request_data (dict): The parsed request message.
+        Returns:
+            str | dict | None: The response of the command, or None for unknown commands.
+        """
+        access = self.commands.access(command)
+        if access is None:
+            self.server_logger.log_error(f"Command '{command}' unknown")
+            return None
+        if access == NO_ACCESS:
+            return self.commands.dispatch(command, request_data)
+
+        lock_context = db_lock.write_locked() if access == WRITE_ACCESS else db_lock.read_locked()
+        with lock_context:
+            return self.commands.dispatch(command, request_data)
+
+    def execute_batch(self, request_data):
+        """
+        Executes the sub-requests of a batch request in order, under a single acquisition of the database lock and
+        in a single database transaction. If any sub-request fails, the whole batch is rolled back and the failed
+        sub-request and its response are reported.
+        Args:
+            request_data (dict): The parsed batch request message.
+        Returns:
+            dict: The ordered list of the sub-request responses, or the reason why the batch failed.
+        """
+        sub_requests = request_data["request"].get("requests")
+        if not isinstance(sub_requests, list) or not sub_requests:
+            return {"command": "batch_unsuccessful", "message": "Batch must contain a list of requests"}
+        if len(sub_requests) > MAX_BATCH_REQUESTS:
+            return {"command": "batch_unsuccessful",
+                    "message": f"Batch must not contain more than {MAX_BATCH_REQUESTS} requests"}
+
+        commands = [sub_request.get("command") if isinstance(sub_request, dict) else None
+                    for sub_request in sub_requests]
+        if None in commands or "batch" in commands:
+            return {"command": "batch_unsuccessful", "message": "Every batch entry must be a single command"}
+        if "login_request" in commands:
+            # Logins are rate limited per request message, they must not be multiplied inside a batch
+            return {"command": "batch_unsuccessful", "message": "Logins cannot be sent in a batch"}
+        if "import_taxpayers" in commands:
+            # The import takes the write lock for every chunk of rows, the lock is already held by the batch and is
+            # not reentrant
+            return {"command": "batch_unsuccessful", "message": "Imports cannot be sent in a batch"}
+
+        self.server_logger.log_debug(f"Executing batch of {len(commands)} requests")
+        header = request_data.get("header") or {}
+        is_write = any(self.commands.access(command) == WRITE_ACCESS for command in commands)
+        lock_context = db_lock.write_locked() if is_write else db_lock.read_locked()
+        results = []
+        try:
+            with lock_context, database.transaction():
+                for command, sub_request in zip(commands, sub_requests):
+                    if command in self.commands:
+                        result = self.commands.dispatch(command, {"header": header, "request": sub_request})
+                    else:
+                        self.server_logger.log_error(f"Command '{command}' unknown")
+                        result = None
+                    if result is None:
+                        result = {"status": "error", "message": f"Command '{command}' unknown"}
+                    elif isinstance(result, StreamingResponse):
+                        result.close()
+                        result = {"status": "error", "message": "Streamed responses are not supported in batches"}
+                    elif isinstance(result, EncodedResponse):
+                        result = result.message
+                    if self.__failed_batch_result(command, result):
+                        raise BatchAbortedError(len(results), result)
+                    results.append(result)
+        except BatchAbortedError as aborted:
+            self.server_logger.log_error(f"Batch request has been rolled back: {aborted}")
+            return {"command": "batch_unsuccessful", "message": str(aborted), "failed_request": aborted.index,
+                    "result": aborted.result}
+        except Exception as exception:
+            self.server_logger.log_error(f"Batch request failed and has been rolled back: {exception}")
+            return {"command": "batch_unsuccessful", "message": str(exception)}
+
+        return {"command": "batch_successful", "results": results}
+
+    def __failed_batch_result(self, command, result):
+        """
+        Tells whether the result of a sub-request aborts its batch. Errors abort any batch; a write command also
+        aborts it when it reports "..._unsuccessful", while a read command which found nothing does not.
+        Args:
+            command (str): The command of the sub-request.
+            result (dict | str): The response of the sub-request.
+        Returns:
+            bool: True if the batch must be rolled back.
+        """
+        if not isinstance(result, dict):
+            return False
+        if result.get("status") == "error":
+            return True
+        return self.commands.access(command) == WRITE_ACCESS and str(result.get("command", "")).endswith(
+            "_unsuccessful")
+
+    def __server_stats(self, request_data):
+        """
+        Reports the runtime statistics of the server.
+        """
+        return {"command": "server_stats", "stats": self.get_stats()}
+
+    def __login_request(self, request_data):
+        """
+        Checks the credentials of a user and opens a session for them. The following commands carry the returned
+        session token instead of the credentials, so the password hash is checked once per login only.
+        Args:
+            request_data (dict): The parsed request message.
+        Returns:
+            str | dict: The session token and its lifetime in seconds, or the reason the login failed.
+        """
+        username = request_data["request"].get("username")
+        password = request_data["request"].get("password")
+        if not username or not password:
+            self.server_logger.log_debug("Sent response: 'Username and password must be provided'")
+            return "Username and password must be provided"
+
+        try:
+            with db_lock.read_locked():
+                hashed_password = database.get_password_hash(username)
+        except Exception as db_error:
+            self.server_logger.log_error(f"Database error during login: {db_error}")
+            return "Server error during login"
+
+        try:
+            result = hashed_password is not None and self.password_verifier.verify(password, hashed_password)
+        except VerifierBusyError:
+            self.server_logger.log_error("Login rejected, all password workers are busy")
+            return {"command": "server_busy", "status": "error", "message": "Server busy, please try again later"}
+        except ValueError as hash_error:
+            self.server_logger.log_error(f"Invalid password hash of user {username}: {hash_error}")
+            return "Server error during login"
+
+        if not result:
+            self.server_logger.log_debug("Sent response: 'Invalid username or password'")
+            return "Invalid username or password"
+
+        self.server_logger.log_debug("Sent response: 'User logged in successfully'")
+        return {"command": "login_successful", "message": "User logged in successfully",
+                "token": self.sessions.issue(username), "expires_in": self.sessions.ttl}
+
+    def __save_new_user(self, request_data):
+        """
+        Saves a new taxpayer.
+        Args:
+            request_data (dict): The parsed request message.
+        Returns:
+            dict: The status of the operation.
+        """
+        national_id = request_data["request"].get("national_id")
+        first_name = request_data["request"].get("first_name")
+        last_name = request_data["request"].get("last_name")
+        date_of_birth = request_data["request"].get("date_of_birth")
+        gender = request_data["request"].get("gender")
+        address_country = request_data["request"].get("address_country")
+        address_zip_code = request_data["request"].get("address_zip_code")
+        address_city = request_data["request"].get("address_city")
+        address_street = request_data["request"].get("address_street")
+        address_house_number = request_data["request"].get("address_house_number")
+        phone_country_code = request_data["request"].get("phone_country_code")
+        phone_number = request_data["request"].get("phone_number")
+        marital_status = request_data["request"].get("marital_status")
+
+        saved = database.save_to_sql(national_id, first_name, last_name, date_of_birth, gender, address_country,
+                                     address_zip_code, address_city, address_street, address_house_number,
+                                     phone_country_code, phone_number, marital_status)
+        if not saved:
+            self.server_logger.log_debug("Sent response: 'New user could not be saved'")
+            return {"status": "error", "message": "New user could not be saved"}
+
+        response = {
+            "status": "success",
+            "message": "New user saved successfully"
+        }
+        self.server_logger.log_debug("Sent response: 'New user saved successfully'")
+        return response
+
+    def __import_taxpayers(self, request_data):
+        """
+        Imports taxpayers from a CSV or JSONL file in the import directory, resuming an interrupted import of the
+        same file.
+        Args:
+            request_data (dict): The parsed request message with the file name and optionally the format and the
+                batch size.
+        Returns:
+            dict: The import report, or the reason the import failed.
+        """
+        file_name = request_data["request"].get("file_name")
+        file_format = request_data["request"].get("format")
+        batch_size = request_data["request"].get("batch_size", DEFAULT_IMPORT_BATCH_SIZE)
+
+        # Only files inside the import directory may be read
+        path = os.path.realpath(os.path.join(import_path, str(file_name)))
+        if not file_name or os.path.dirname(path) != os.path.realpath(import_path) or not os.path.isfile(path):
+            return {"command": "import_unsuccessful", "message": "Import file not found"}
+        if file_format is not None and file_format not in IMPORT_FORMATS:
+            return {"command": "import_unsuccessful", "message": f"Format must be one of {', '.join(IMPORT_FORMATS)}"}
+        if not isinstance(batch_size, int) or isinstance(batch_size, bool) or batch_size < 1:
+            return {"command": "import_unsuccessful", "message": "Batch size must be a positive integer"}
+
+        importer = TaxpayerImporter(database, self.server_logger, batch_size=batch_size,
+                                    batch_lock=db_lock.write_locked)
+        try:
+            report = importer.run(path, file_format)
+        except (OSError, ValueError, sqlite3.Error) as error:
+            self.server_logger.log_error(f"Import of {file_name} failed: {error}")
+            return {"command": "import_unsuccessful", "message": f"Import failed: {error}"}
+        report["path"] = file_name
+        return {"command": "import_successful", "report": report}
+
+    def __find_user(self, request_data):
+        """
+        Searches taxpayers by their personal information.
+
+        With a "limit" in the request the results are returned page by page. A response with more results to come
+        carries a "next_cursor", which is sent back as "cursor" to fetch the next page. With "stream": true the
+        results are streamed in chunks while they are read from the database. With "search_mode": "prefix" the
+        first and last names are matched by the beginnings of their words, with "search_mode": "fuzzy" by their
+        sound and spelling; the best matches come first. Fuzzy search responses carry "truncated": true when the
+        names are too common for all people sharing their sound to be ranked, so a more specific name should be
+        searched for. A "fields" list selects the returned fields of the users, by default their national ID,
+        names and date of birth.
+        Args:
+            request_data (dict): The parsed request message.
+        Returns:
+            dict | StreamingResponse: The basic personal information of the matching taxpayers.
+        """
+        national_id = request_data["request"].get("national_id")
+        first_name = request_data["request"].get("first_name")
+        last_name = request_data["request"].get("last_name")
+        date_of_birth = request_data["request"].get("date_of_birth")
+        limit = request_data["request"].get("limit")
+        cursor = request_data["request"].get("cursor")
+        search_mode = request_data["request"].get("search_mode", EXACT_SEARCH)
+        try:
+            columns = requested_fields(request_data["request"].get("fields"), PERSONAL_INFO_COLUMNS,
+                                       SEARCH_RESULT_FIELDS)
+        except ValueError as fields_error:
+            return {"command": "search_unsuccessful", "message": str(fields_error)}
+        formatted_date_of_birth = None
+        if date_of_birth:
+            formatted_date_of_birth = datetime.datetime.strptime(date_of_birth, "%d.%m.%Y").strftime("%Y-%m-%d")
+
+        if search_mode not in SEARCH_MODES:
+            return {"command": "search_unsuccessful", "message": f"Search mode must be one of {', '.join(SEARCH_MODES)}"}
+        if limit is not None and (not isinstance(limit, int) or limit < 1):
+            return {"command": "search_unsuccessful", "message": "Limit must be a positive integer"}
+        position = {}
+        if cursor is not None:
+            try:
+                after_national_id, after_rank = decode_search_cursor(cursor)
+            except ValueError as cursor_error:
+                self.server_logger.log_error(str(cursor_error))
+                return {"command": "search_unsuccessful", "message": "Invalid cursor"}
+            if (after_rank is not None) != (search_mode in RANKED_SEARCH_MODES):
+                return {"command": "search_unsuccessful", "message": "Invalid cursor"}
+            position["after_national_id"] = after_national_id
+            if after_rank is not None:
+                position["after_rank"] = after_rank
+
+        truncated = None
+        if search_mode == PREFIX_SEARCH:
+            if database.prefix_match_expression(first_name, last_name) is None:
+                return {"command": "search_unsuccessful", "message": "Prefix search needs a first or last name"}
+            search = functools.partial(database.search_personal_info_by_prefix, first_name, last_name,
+                                       columns=columns)
+            iterate = functools.partial(database.iter_personal_info_by_prefix, first_name, last_name,
+                                        columns=columns)
+        elif search_mode == FUZZY_SEARCH:
+            if not name_keys(first_name, last_name):
+                return {"command": "search_unsuccessful", "message": "Fuzzy search needs a first or last name"}
+            search = functools.partial(database.search_personal_info_fuzzy, first_name, last_name, columns=columns)
+            iterate = functools.partial(database.iter_personal_info_fuzzy, first_name, last_name, columns=columns)
+            truncated = database.fuzzy_search_truncated(first_name, last_name)
+        else:
+            search_arguments = (national_id, first_name, last_name, formatted_date_of_birth)
+            search = functools.partial(database.search_personal_info, *search_arguments, columns=columns)
+            iterate = functools.partial(database.iter_personal_info, *search_arguments, columns=columns)
+
+        if request_data["request"].get("stream"):
+            if limit is not None:
+                limit = min(limit, MAX_SEARCH_PAGE_SIZE)
+            return StreamingResponse(self.__stream_search_results(iterate, limit, position, search_mode, columns,
+                                                                  truncated))
+
+        if limit is None:
+            search_results = search()
+            next_cursor = None
+        else:
+            limit = min(limit, MAX_SEARCH_PAGE_SIZE)
+            position.setdefault("after_national_id", None)
+            # One extra row tells whether another page follows
+            search_results = search(limit=limit + 1, **position)
+            next_cursor = self.__search_cursor(search_results[limit - 1], search_mode) \
+                if len(search_results) > limit else None
+            search_results = search_results[:limit]
+        self.server_logger.log_debug(f"Search results: {search_results}")
+        if not search_results:
+            response_data = {"command": "search_unsuccessful"}
+        else:
+            user_info_list = self.__user_info(columns, search_results)
+            self.server_logger.log_debug(f"Result: {user_info_list}")
+            response_data = {"command": "search_successful", "user_info": user_info_list}
+            if limit is not None:
+                response_data["next_cursor"] = next_cursor
+            self.server_logger.log_debug(f"Response message sent to client: {response_data}")
+        if truncated is not None:
+            response_data["truncated"] = truncated
+        return response_data
+
+    def __stream_search_results(self, iterate, limit, position, search_mode, columns, truncated=None):
+        """
+        Produces the messages of a streamed find_user response. Every chunk of users read from the database is sent
+        as a partial "search_results" message; the final message reports the outcome of the search.
+        Args:
+            iterate (callable): The database search yielding chunks of users, with the search criteria bound.
+            limit (int | None): Maximum number of returned users.
+            position (dict): The position after which the page starts, empty for the first page.
+            search_mode (str): The search mode, which determines the cursor of the next page.
+            columns (tuple): The fields of the returned users, the columns of the rows.
+            truncated (bool | None, optional): Whether the candidates of a fuzzy search have been truncated, None
+                for the other search modes.
+        Returns:
+            generator: The response messages.
+        """
+        sent = 0
+        last_user = None
+        has_more = False
+        position.setdefault("after_national_id", None)
+        chunks = iterate(limit=limit + 1 if limit else None, **position, chunk_size=SEARCH_STREAM_CHUNK_SIZE)
+        try:
+            while True:
+                # The read lock is only held while a chunk is read; it is released before the chunk is sent, so a
+                # slow client does not hold back writers
+                with db_lock.read_locked():
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                if limit is not None and sent + len(chunk) > limit:
+                    # The extra row only tells that another page follows
+                    chunk = chunk[:limit - sent]
+                    has_more = True
+                if chunk:
+                    sent += len(chunk)
+                    last_user = chunk[-1]
+                    yield {"command": "search_results", "partial": True,
+                           "user_info": self.__user_info(columns, chunk)}
+        finally:
+            chunks.close()
+
+        self.server_logger.log_debug(f"Streamed {sent} search results")
+        if not sent:
+            final_message = {"command": "search_unsuccessful"}
+        else:
+            final_message = {"command": "search_successful", "user_info": [], "count": sent}
+            if limit is not None:
+                final_message["next_cursor"] = self.__search_cursor(last_user, search_mode) if has_more else None
+        if truncated is not None:
+            final_message["truncated"] = truncated
+        yield final_message
+
+    @staticmethod
+    def __search_cursor(user, search_mode):
+        """
+        Creates the cursor of the page starting after the given search result.
+        Args:
+            user (tuple): The last search result of the current page.
+            search_mode (str): The search mode; ranked results carry their rank as the last column.
+        Returns:
+            str: The cursor.
+        """
+        if search_mode in RANKED_SEARCH_MODES:
+            return encode_search_cursor(user[0], user[-1])
+        return encode_search_cursor(user[0])
+
+    @staticmethod
+    def __user_info(columns, rows):
+        """
+        Converts rows read with the given columns to the user information sent to the client. The rank of ranked
+        search results, which follows the columns, is left out.
+        """
+        return [dict(zip(columns, row)) for row in rows]
+
+    def __retrieve_user_details(self, request_data):
+        """
+        Retrieves all stored information of a taxpayer, or the fields given in a "fields" list. Found taxpayers are
+        cached together with the encoded response, so repeated requests neither query the database nor serialize the
+        response again; requests for some fields only are answered from a cached taxpayer as well.
+        Args:
+            request_data (dict): The parsed request message.
+        Returns:
+            EncodedResponse | dict: The complete information of the taxpayer.
+        """
+        national_id = request_data["request"].get("national_id")
+        try:
+            columns = requested_fields(request_data["request"].get("fields"), TAXPAYER_COLUMNS, TAXPAYER_COLUMNS)
+        except ValueError as fields_error:
+            return {"command": "retrieving_unsuccessful", "message": str(fields_error)}
+        complete = columns == TAXPAYER_COLUMNS
+        cache_key = user_details_cache_key(national_id)
+        cached_response = user_details_cache.get(cache_key)
+        if cached_response is not None:
+            self.server_logger.log_debug(f"User details of {national_id} served from cache")
+            if complete:
+                return cached_response
+            return {"command": "retrieving_successful",
+                    "user_info": [{column: user_info[column] for column in columns}
+                                  for user_info in cached_response.message["user_info"]]}
+
+        search_results = database.retrieve_user_details(national_id, columns)
+        if not search_results:
+            response_data = {"command": "retrieving_unsuccessful"}
+        else:
+            if complete:
+                complete_user_info_list = [Taxpayer.from_row(row).to_wire() for row in search_results]
+            else:
+                complete_user_info_list = self.__user_info(columns, search_results)
+            self.server_logger.log_debug(f"Complete_user_info_list: {complete_user_info_list}")
+            response_data = {"command": "retrieving_successful", "user_info": complete_user_info_list}
+        self.server_logger.log_debug(f"Response message sent to client: {response_data}")
+        if search_results and complete:
+            response_data = EncodedResponse(response_data)
+            # Inside a batch the data may not be committed yet
+            if not database.in_transaction():
+                user_details_cache.put(cache_key, response_data)
+        return response_data
@@ -0,0 +1,124 @@
+import queue
+import threading
+
+
+class WorkerPool:
+    """
+    Fixed-size pool of worker threads fed by a bounded queue of accepted client connections.
+
+    The pool caps the number of concurrently handled connections. When the pending-connection queue is full,
+    new connections are not queued but handed to the reject handler straight away, so a burst of clients is
+    answered with an explicit error instead of exhausting threads, memory and file descriptors.
+    """
+
+    def __init__(self, handler, reject_handler, pool_size, queue_size, server_logger):
+        """
+        Initializes the worker pool. Worker threads are not started until start() is called.
+
+        Args:
+            handler (callable): Function called by a worker with an accepted client socket and the state it was
+                submitted with.
+            reject_handler (callable): Function called with a client socket which could not be queued.
+            pool_size (int): Number of worker threads.
+            queue_size (int): Maximum number of accepted connections waiting for a free worker.
+            server_logger (TMSLogger): Logger instance for logging events.
+        """
+        if pool_size < 1:
+            raise ValueError(f"Worker pool size must be positive, got {pool_size}")
+        if queue_size < 1:
+            raise ValueError(f"Pending queue size must be positive, got {queue_size}")
+
+        self.handler = handler
+        self.reject_handler = reject_handler
+        self.pool_size = pool_size
+        self.queue_size = queue_size
+        self.server_logger = server_logger
+        self.__queue = queue.Queue(maxsize=queue_size)
+        self.__workers = []
+        self.__stats_lock = threading.Lock()
+        self.__active = 0
+        self.__accepted = 0
+        self.__rejected = 0
+        self.__completed = 0
+
+    def start(self):
+        """
+        Starts the worker threads.
+        """
+        for index in range(self.pool_size):
+            worker = threading.Thread(target=self.__work, name=f"tms_worker_{index}", daemon=True)
+            worker.start()
+            self.__workers.append(worker)
+        self.server_logger.log_debug(f"Worker pool started with {self.pool_size} workers and a pending queue of "
+                                     f"{self.queue_size} connections")
+
+    def stop(self):
+        """
+        Stops the worker threads once the connections already queued have been handled.
+        """
+        for _ in self.__workers:
+            self.__queue.put((None, ()))
+        for worker in self.__workers:
+            worker.join()
+        self.__workers.clear()
+
+    def submit(self, client_socket_, *state):
+        """
+        Queues an accepted client connection for the workers, or rejects it if the queue is full.
+
+        Args:
+            client_socket_ (socket.socket): The accepted client socket.
+            *state: Passed to the handler together with the socket, e.g. the state of a resumed connection.
+        Returns:
+            bool: True if the connection has been queued, False if it has been rejected.
+        """
+        try:
+            self.__queue.put_nowait((client_socket_, state))
+        except queue.Full:
+            with self.__stats_lock:
+                self.__rejected += 1
+            self.server_logger.log_error("Pending connection queue is full, rejecting client")
+            self.reject_handler(client_socket_)
+            return False
+
+        with self.__stats_lock:
+            self.__accepted += 1
+        return True
+
+    def stats(self):
+        """
+        Returns the runtime statistics of the pool.
+
+        Returns:
+            dict: Pool size, queue depth and capacity, active workers, accepted, rejected and completed connections.
+        """
+        with self.__stats_lock:
+            return {
+                "pool_size": self.pool_size,
+                "queue_depth": self.__queue.qsize(),
+                "queue_size": self.queue_size,
+                "active_workers": self.__active,
+                "accepted": self.__accepted,
+                "rejected": self.__rejected,
+                "completed": self.__completed
+            }
+
+    def __work(self):
+        """
+        Worker thread loop: takes connections from the queue and handles them until a stop sentinel arrives.
+        """
+        while True:
+            client_socket_, state = self.__queue.get()
+            if client_socket_ is None:
+                break
+
+            with self.__stats_lock:
+                self.__active += 1
+            try:
+                self.handler(client_socket_, *state)
+            except Exception as exception:
+                self.server_logger.log_error(f"Unexpected exception in worker: {exception}")
+            finally:
+                with self.__stats_lock:
+                    self.__active -= 1
+                    self.__completed += 1
@@ -9,6 +9,7 @@ from PyQt6.QtWidgets import QApplication
 from Code.ui.ui_login_window import LoginWindow
 from Code.ui.ui_tms_main_window import TMSMainWindow
 from Code.utils.tms_logs import TMSLogger
+from Code.tcp_ip.tcp_driver import TCPClient
 
 
 def get_base_path():
@@ -81,25 +82,30 @@ class TMSClient:
         else:
             self.client_logger.log_debug("TCP configs have been parsed successfully")
 
+        # Apply the framing preferences shared by all windows through the TCPClient singleton
+        tcp_client = TCPClient(self.client_logger, self.host, self.port)
+        if not tcp_client.set_framing(tcp_configs.get("framing", tcp_client.framing),
+                                      tcp_configs.get("max_frame_size", tcp_client.max_frame_size)):
+            self.client_logger.log_error("Invalid framing configuration, using default framing")
+
         self.app = QApplication(sys.argv)
         self.login_window = LoginWindow(self.client_logger, self.host, self.port)
         self.login_window.login_successful.connect(self.on_login_success)
         self.login_window.show()
 
-    def on_login_success(self, username, password, host, port):
+    def on_login_success(self, username, host, port):
         """
         Handles the successful login event by closing the login window and launching the main TMS window.
 
         Args:
             username (str): The username entered by the user.
-            password (str): The password entered by the user.
             host (str): The host address for the TCP connection.
             port (int): The port number for the TCP connection.
         """
         self.client_logger.log_debug("Login was successful, launching main TMS window")
         self.login_window.close()
 
-        self.main_window = TMSMainWindow(self.client_logger, username, password, host, port)
+        self.main_window = TMSMainWindow(self.client_logger, username, host, port)
         self.main_window.show()
 
     def run(self):
@@ -1,9 +1,11 @@
 import os
 import sys
-import threading
 import json
+import multiprocessing
 from typing import Union
 
+SERVER_ENGINES = ("threaded", "asyncio")
+
 
 # Function to get the correct path to resources
 def resource_path(relative_path):
@@ -38,14 +40,96 @@ def get_config_path(config_file: Union[str, os.PathLike]) -> str:
     return os.path.join(base_path, 'configs', config_file)
 
 
+def serve(tcp_configs, server_logger, server_socket=None, reuse_port=False):
+    """
+    Creates the TCP server described by the TCP configuration and serves clients with the configured engine.
+    Blocks until the server is stopped.
+
+    :param tcp_configs: The parsed TCP configuration.
+    :type tcp_configs: dict
+    :param server_logger: The server logger.
+    :type server_logger: TMSLogger
+    :param server_socket: An already bound listening socket to serve instead of binding a new one.
+    :type server_socket: socket.socket, optional
+    :param reuse_port: Whether the new listening socket may share its port with other processes.
+    :type reuse_port: bool
+    """
+    from tcp_ip.tcp_driver import TCPServer
+    from utils.session_tokens import DEFAULT_SESSION_TTL
+
+    # Initialize the server instance with the host and port from config
+    server = TCPServer(tcp_configs["host"], tcp_configs["port"], new_user_window_instance=None,
+                       keep_alive=tcp_configs.get("keep_alive", True),
+                       idle_timeout=tcp_configs.get("idle_timeout", 30),
+                       max_frame_size=tcp_configs.get("max_frame_size", 16 * 1024 * 1024),
+                       server_socket=server_socket, reuse_port=reuse_port,
+                       require_session=tcp_configs.get("require_session", False),
+                       session_ttl=tcp_configs.get("session_ttl", DEFAULT_SESSION_TTL),
+                       password_workers=tcp_configs.get("password_workers", 2),
+                       password_queue_size=tcp_configs.get("password_queue_size", 64),
+                       login_attempts_per_minute=tcp_configs.get("login_attempts_per_minute", 10),
+                       login_burst=tcp_configs.get("login_burst", 5))
+    server.register_stats_provider("process", lambda: {"pid": os.getpid()})
+
+    if tcp_configs.get("engine", "threaded") == "asyncio":
+        from tcp_ip.async_server import AsyncTCPServer
+
+        async_server = AsyncTCPServer(server, executor_workers=tcp_configs.get("executor_workers"))
+        async_server.run()
+    else:
+        from tcp_ip.worker_pool import WorkerPool
+        from tcp_ip.idle_poller import IdleConnectionPoller
+
+        worker_pool = WorkerPool(server.handle_request_match, server.reject_busy,
+                                 pool_size=tcp_configs.get("worker_pool_size", 32),
+                                 queue_size=tcp_configs.get("pending_queue_size", 64),
+                                 server_logger=server_logger)
+        server.register_stats_provider("worker_pool", worker_pool.stats)
+        worker_pool.start()
+
+        # Kept alive connections wait for their next request on the poller, not on a worker
+        server.idle_poller = IdleConnectionPoller(worker_pool.submit, server.idle_timeout, server_logger)
+        server.register_stats_provider("idle_poller", server.idle_poller.stats)
+        server.idle_poller.start()
+
+        while True:
+            client_socket, client_address = server.server_socket.accept()
+            server_logger.log_debug(f"Connected client: {client_address}")
+            worker_pool.submit(client_socket)
+
+
+def run_worker(tcp_configs, server_socket=None):
+    """
+    Entry point of a server worker process started by the supervisor in multi-process mode. Every worker imports
+    the server modules itself, so it works with its own database connections.
+
+    :param tcp_configs: The parsed TCP configuration.
+    :type tcp_configs: dict
+    :param server_socket: The listening socket inherited from the supervisor, or None to bind a new socket
+        sharing the port through SO_REUSEPORT.
+    :type server_socket: socket.socket, optional
+    """
+    sys.path.append(resource_path('Code'))
+    from utils import tms_logs
+
+    os.environ['APP_MODE'] = 'SERVER'
+    worker_logger = tms_logs.TMSLogger("server")
+    if not worker_logger.setup():
+        sys.exit(1)
+
+    serve(tcp_configs, worker_logger, server_socket=server_socket, reuse_port=server_socket is None)
+
+
 if __name__ == '__main__':
+    # Required by multi-process mode when running as a frozen executable
+    multiprocessing.freeze_support()
+
     # Update the sys.path to include the correct module paths
     sys.path.append(resource_path('Code'))
 
     # Import after adjusting sys.path
-    from tcp_ip.tcp_driver import TCPServer
     from utils import tms_logs
-    from database.database import DatabaseServices
+    from database.migrations import MigrationRunner
 
     # Create a TMSLogger instance for the server
     server_logger = tms_logs.TMSLogger("server")
@@ -56,8 +140,18 @@ if __name__ == '__main__':
     os.environ['APP_MODE'] = 'SERVER'
     app_mode = os.getenv('APP_MODE')
 
-    # Pass the server logger to DatabaseServices
-    db_service = DatabaseServices(db_file='taxpayers.db', tms_logger=server_logger)
+    # The migrated database is the one the server works with, next to the executable in a frozen build
+    from tcp_ip import tcp_driver
+
+    # Bring the database schema up to date before any worker serves requests
+    migration_runner = MigrationRunner(tcp_driver.db_path, server_logger)
+    try:
+        applied_migrations = migration_runner.run()
+    except Exception as exception:
+        server_logger.log_critical(f"Could not migrate the database schema: {exception}")
+        sys.exit(1)
+    server_logger.log_debug(f"Database schema is at version {migration_runner.latest_version}, "
+                            f"applied migrations: {applied_migrations}")
 
     # Read the TCP configuration
     tcp_config_path = get_config_path('tcp_config.json')
@@ -85,13 +179,34 @@ if __name__ == '__main__':
     else:
         server_logger.log_debug(f"Starting server on {host}:{port}")
 
-    # Initialize the server instance with the host and port from config
-    server = TCPServer(host, port, new_user_window_instance=None)
-
-    while True:
-        client_socket, client_address = server.server_socket.accept()
-        server_logger.log_debug(f"Connected client: {client_address}")
-        multiple_client_connection_thread = threading.Thread(target=server.handle_request_match, args=(client_socket,))
-        multiple_client_connection_thread.start()
+    # Select the server engine, threaded is kept as default for backward compatibility
+    engine = tcp_configs.get("engine", "threaded")
+    if engine not in SERVER_ENGINES:
+        server_logger.log_error(f"Unknown server engine '{engine}'. Available engines: {SERVER_ENGINES}")
+        sys.exit(1)
+    server_logger.log_debug(f"Server engine: {engine}")
+
+    processes = tcp_configs.get("processes") or os.cpu_count() or 1
+    if tcp_configs.get("multiprocess", False) and processes > 1:
+        import socket
+        from tcp_ip.supervisor import ProcessSupervisor
+        from utils.session_tokens import session_secret
+
+        # The workers inherit the signing key of the session tokens, so every worker accepts the tokens of the others
+        session_secret()
+
+        if hasattr(socket, "SO_REUSEPORT"):
+            # Every worker binds its own socket to the same port and the kernel balances the connections
+            listening_socket = None
+            server_logger.log_debug(f"Starting {processes} worker processes sharing the port via SO_REUSEPORT")
+        else:
+            # The workers inherit the listening socket bound by the supervisor
+            listening_socket = socket.create_server((host, port))
+            server_logger.log_debug(f"Starting {processes} worker processes sharing the listening socket")
+
+        supervisor = ProcessSupervisor(run_worker, (tcp_configs, listening_socket), processes, server_logger)
+        supervisor.run()
+    else:
+        serve(tcp_configs, server_logger)
 
     sys.exit(0)
@@ -5,6 +5,21 @@ from PyQt6.QtWidgets import (QWidget, QApplication, QPushButton, QLineEdit, QLab
 from PyQt6.QtCore import QDate, pyqtSignal, QTimer, QThread, QObject
 from Code.tcp_ip.tcp_driver import TCPClient
 from Code.utils.tms_logs import TMSLogger
+from Code.utils.records import Taxpayer
+
+# Number of search results requested from the server at once
+SEARCH_PAGE_SIZE = 50
+
+# Search modes of the find_user request
+EXACT_SEARCH = "exact"
+PREFIX_SEARCH = "prefix"
+FUZZY_SEARCH = "fuzzy"
+SEARCH_MODE_LABELS = {EXACT_SEARCH: "Exact match", PREFIX_SEARCH: "Beginnings of names",
+                      FUZZY_SEARCH: "Similar names"}
+
+# Shown when the names of a fuzzy search are too common for all similar names to be compared
+TRUNCATED_SEARCH_HINT = ("the names are too common for all similar ones to be compared. Please enter a more "
+                         "specific name, e.g. both the first and the last name.")
 
 
 class UserRequestThread(QObject):
@@ -12,15 +27,19 @@ class UserRequestThread(QObject):
     A thread class to handle search requests for user information.
 
     It sends a search request to the server based on provided user details and processes
-    the server's response. Signals are emitted to indicate success or failure of the search.
+    the server's response. The results are streamed by the server, every chunk is emitted as soon as it arrives.
+    Signals are emitted to indicate success or failure of the search, together with whether the names were too
+    common for a fuzzy search to compare all similar ones.
     """
-    search_successful_signal = pyqtSignal(list)
-    search_unsuccessful_signal = pyqtSignal()
+    search_partial_signal = pyqtSignal(list)
+    search_successful_signal = pyqtSignal(list, object, bool)
+    search_unsuccessful_signal = pyqtSignal(bool)
     stop_timer_signal = pyqtSignal()
     finished = pyqtSignal()
 
     def __init__(self, client_logger: TMSLogger, tcp_client, national_id: int, first_name: str, last_name: str,
-                 date_of_birth: str):
+                 date_of_birth: str, limit: int = SEARCH_PAGE_SIZE, cursor: str = None,
+                 search_mode: str = EXACT_SEARCH):
         """
         Initializes the UserRequestThread with necessary details for the user search request.
 
@@ -31,6 +50,10 @@ class UserRequestThread(QObject):
             first_name (str): First name of the user to search.
             last_name (str): Last name of the user to search.
             date_of_birth (str): Date of birth of the user to search (optional).
+            limit (int, optional): Maximum number of results in the requested page.
+            cursor (str, optional): The cursor returned with the previous page, None for the first page.
+            search_mode (str, optional): "exact" to match whole values, "prefix" to match the beginnings of names,
+                "fuzzy" to match similar names.
         """
         super().__init__()
         self.client_logger = client_logger
@@ -39,6 +62,9 @@ class UserRequestThread(QObject):
         self.first_name = first_name
         self.last_name = last_name
         self.date_of_birth = date_of_birth
+        self.limit = limit
+        self.cursor = cursor
+        self.search_mode = search_mode
 
     def run(self):
         """
@@ -61,8 +87,14 @@ class UserRequestThread(QObject):
                 "national_id": self.national_id,
                 "first_name": self.first_name,
                 "last_name": self.last_name,
+                "limit": self.limit,
+                "stream": True,
+                "search_mode": self.search_mode,
             }
 
+            if self.cursor is not None:
+                request_data["cursor"] = self.cursor
+
             if self.date_of_birth is not None:
                 request_data["date_of_birth"] = self.date_of_birth
 
@@ -75,17 +107,18 @@ class UserRequestThread(QObject):
             delimiter = b'\r\n'
             request = message_json.encode() + delimiter
 
-            response = self.tcp_client.send_request(request)
+            response = self.tcp_client.send_stream_request(request, self.__emit_partial_results)
             self.client_logger.log_debug(f"TMS server response is {response}")
 
             response_data = json.loads(response['response'])
+            truncated = bool(response_data.get("truncated"))
 
             if response_data["command"] == "search_successful":
                 results = response_data.get("user_info", [])
-                self.search_successful_signal.emit(results)
+                self.search_successful_signal.emit(results, response_data.get("next_cursor"), truncated)
                 self.client_logger.log_debug(f"The search was successful with results: {results}")
             elif response_data["command"] == "search_unsuccessful":
-                self.search_unsuccessful_signal.emit()
+                self.search_unsuccessful_signal.emit(truncated)
                 self.client_logger.log_debug(f"The search was unsuccessful!")
             else:
                 self.client_logger.log_debug(f"Server response error: {response_data}")
@@ -95,6 +128,17 @@ class UserRequestThread(QObject):
             self.stop_timer_signal.emit()
             self.finished.emit()
 
+    def __emit_partial_results(self, message):
+        """
+        Emits the search results of a partial message of the streamed response.
+
+        Args:
+            message (dict): The partial message.
+        """
+        results = message.get("user_info", [])
+        self.client_logger.log_debug(f"Received {len(results)} streamed search results")
+        self.search_partial_signal.emit(results)
+
 
 class UserDetailsThread(QThread):
     """
@@ -103,7 +147,7 @@ class UserDetailsThread(QThread):
     It sends a request to retrieve detailed information about a specific user and emits
     a signal with the retrieved details upon completion.
     """
-    request_complete = pyqtSignal(dict)
+    request_complete = pyqtSignal(object)
 
     def __init__(self, client_logger, tcp_client, national_id: int):
         """
@@ -151,29 +195,7 @@ class UserDetailsThread(QThread):
             response_data = json.loads(response['response'])
 
             if response_data["command"] == "retrieving_successful":
-                user_info = response_data["user_info"][0]
-                user_details = {
-                    "national_id": user_info.get("national_id"),
-                    "first_name": user_info.get("first_name"),
-                    "last_name": user_info.get("last_name"),
-                    "date_of_birth": user_info.get("date_of_birth"),
-                    "gender": user_info.get("gender"),
-                    "address_country": user_info.get("address_country"),
-                    "address_zip_code": user_info.get("address_zip_code"),
-                    "address_city": user_info.get("address_city"),
-                    "address_street": user_info.get("address_street"),
-                    "address_house_number": user_info.get("address_house_number"),
-                    "phone_country_code": user_info.get("phone_country_code"),
-                    "phone_number": user_info.get("phone_number"),
-                    "marital_status": user_info.get("marital_status"),
-                    "tax_rate": user_info.get("tax_rate"),
-                    "yearly_income": user_info.get("yearly_income"),
-                    "advance_tax": user_info.get("advance_tax"),
-                    "tax_paid_this_year": user_info.get("tax_paid_this_year"),
-                    "property_value": user_info.get("property_value"),
-                    "loans": user_info.get("loans"),
-                    "property_tax": user_info.get("property_tax")
-                }
+                user_details = Taxpayer.from_wire(response_data["user_info"][0])
                 self.request_complete.emit(user_details)
 
             elif response_data["command"] == "retrieving_unsuccessful":
@@ -217,6 +239,8 @@ class FindUserWindow(QWidget):
         self.tcp_client = TCPClient(client_logger, host, port)
         self.__main_window = main_window
         self.__date_of_birth_changed = False
+        self.__search_parameters = None
+        self.__next_cursor = None
         self.setMinimumWidth(500)
         self.__main_layout = QVBoxLayout()
         self.setLayout(self.__main_layout)
@@ -265,6 +289,11 @@ class FindUserWindow(QWidget):
         self.__date_of_birth_edit.setCalendarPopup(True)
         self.__date_of_birth_edit.editingFinished.connect(self.__handle_widget_edit)
 
+        label_search_mode = QLabel("Search mode")
+        self.__search_mode_edit = QComboBox()
+        for search_mode, label in SEARCH_MODE_LABELS.items():
+            self.__search_mode_edit.addItem(label, search_mode)
+
         self.__ok_button = QPushButton("OK")
         self.__ok_button.clicked.connect(self.__click_ok_button)
 
@@ -276,6 +305,10 @@ class FindUserWindow(QWidget):
         self.__set_widget_color(self.__search_results_edit, "gray")
         self.__search_results_edit.currentIndexChanged.connect(self.__handle_search_result_selected)
 
+        self.__more_results_button = QPushButton("More results")
+        self.__more_results_button.setEnabled(False)
+        self.__more_results_button.clicked.connect(self.__click_more_results_button)
+
         self.__main_layout.addWidget(self.__label1)
 
         layout_national_id = QHBoxLayout()
@@ -294,8 +327,13 @@ class FindUserWindow(QWidget):
         layout_date_of_birth.addWidget(label_date_of_birth)
         layout_date_of_birth.addWidget(self.__date_of_birth_edit)
 
+        layout_search_mode = QHBoxLayout()
+        layout_search_mode.addWidget(label_search_mode)
+        layout_search_mode.addWidget(self.__search_mode_edit)
+
         layout_search_results = QHBoxLayout()
         layout_search_results.addWidget(self.__search_results_edit)
+        layout_search_results.addWidget(self.__more_results_button)
 
         button_layout = QHBoxLayout()
         button_layout.addWidget(self.__ok_button)
@@ -305,6 +343,7 @@ class FindUserWindow(QWidget):
         self.__main_layout.addLayout(layout_first_name)
         self.__main_layout.addLayout(layout_last_name)
         self.__main_layout.addLayout(layout_date_of_birth)
+        self.__main_layout.addLayout(layout_search_mode)
         self.__main_layout.addLayout(layout_search_results)
         self.__main_layout.addLayout(button_layout)
 
@@ -394,14 +433,43 @@ class FindUserWindow(QWidget):
             QMessageBox.warning(self, "Missing data", "Please enter at least one search parameter.")
             return
 
+        search_mode = self.__search_mode_edit.currentData()
+        if search_mode != EXACT_SEARCH and not (first_name.strip() or last_name.strip()):
+            QMessageBox.warning(self, "Missing data", "Please enter a first or last name.")
+            return
+
+        self.__search_parameters = (national_id, first_name, last_name, date_of_birth, search_mode)
+        self.__next_cursor = None
+        self.__more_results_button.setEnabled(False)
+        self.__start_search_request(None)
+
+    def __click_more_results_button(self):
+        """
+        Handles the event when the More results button is clicked.
+        Requests the next page of results of the current search.
+        """
+        if self.__search_parameters is None or self.__next_cursor is None:
+            return
+        self.__more_results_button.setEnabled(False)
+        self.__start_search_request(self.__next_cursor)
+
+    def __start_search_request(self, cursor):
+        """
+        Starts the thread requesting one page of search results.
+
+        Args:
+            cursor (str or None): The cursor of the requested page, None for the first page.
+        """
         self.client_logger.log_debug("Starting search request thread")
         self.start_timer_signal.emit(5)
 
+        national_id, first_name, last_name, date_of_birth, search_mode = self.__search_parameters
         self.thread = QThread()
         self.user_request_thread = UserRequestThread(self.client_logger, self.tcp_client, national_id, first_name,
-                                                     last_name, date_of_birth)
+                                                     last_name, date_of_birth, SEARCH_PAGE_SIZE, cursor, search_mode)
         self.user_request_thread.moveToThread(self.thread)
 
+        self.user_request_thread.search_partial_signal.connect(self.__append_search_results)
         self.user_request_thread.search_successful_signal.connect(self.__populate_search_results)
         self.user_request_thread.search_unsuccessful_signal.connect(self.__search_unsuccessful_message)
         self.user_request_thread.stop_timer_signal.connect(self.__stop_timer)
@@ -412,27 +480,51 @@ class FindUserWindow(QWidget):
 
         self.thread.start()
 
-    def __populate_search_results(self, results):
+    def __populate_search_results(self, results, next_cursor, truncated):
         """
-        Populates the search results combo box with the results of the search request.
+        Completes the search results combo box when the search request has finished. The results of further pages
+        are appended to the ones already shown.
 
         Args:
-            results (list): List of search results to be displayed.
-        """
-        self.__search_results_edit.clear()
-        self.__search_results_edit.setStyleSheet("color: black;")
-        self.client_logger.log_debug(f"Populating search results: {results}")
-        if not results:
+            results (list): List of search results not shown yet.
+            next_cursor (str or None): The cursor of the next page, None if there are no more results.
+            truncated (bool): True if the names were too common for all similar ones to be compared.
+        """
+        first_page = self.__next_cursor is None
+        self.__next_cursor = next_cursor
+        self.__more_results_button.setEnabled(next_cursor is not None)
+        self.__append_search_results(results)
+        if not first_page:
+            return
+        if self.__search_results_edit.count() == 0:
             self.__search_results_edit.setPlaceholderText("No matching results")
             self.client_logger.log_debug("No matching results")
         else:
-            for result in results:
-                display_text = (f"{result['national_id']} {result['first_name']} {result['last_name']} "
-                                f"{result['date_of_birth']}")
-                self.__search_results_edit.addItem(display_text)
-                self.client_logger.log_debug(f"Adding result to combo box: {display_text}")
             self.__search_results_edit.setCurrentIndex(-1)
-            QMessageBox.information(self, "Search Status", "The user was found successfully!")
+            if truncated:
+                QMessageBox.information(self, "Search Status", f"Users were found, but {TRUNCATED_SEARCH_HINT}")
+            else:
+                QMessageBox.information(self, "Search Status", "The user was found successfully!")
+
+    def __append_search_results(self, results):
+        """
+        Appends search results to the search results combo box while they are streamed by the server.
+
+        Args:
+            results (list): List of search results to be displayed.
+        """
+        self.__search_results_edit.setStyleSheet("color: black;")
+        self.client_logger.log_debug(f"Populating search results: {results}")
+        # Adding items must not select a result, that would request its details
+        current_index = self.__search_results_edit.currentIndex()
+        self.__search_results_edit.blockSignals(True)
+        for result in results:
+            display_text = (f"{result['national_id']} {result['first_name']} {result['last_name']} "
+                            f"{result['date_of_birth']}")
+            self.__search_results_edit.addItem(display_text)
+            self.client_logger.log_debug(f"Adding result to combo box: {display_text}")
+        self.__search_results_edit.setCurrentIndex(current_index)
+        self.__search_results_edit.blockSignals(False)
 
     def __handle_search_result_selected(self, index):
         """
@@ -473,7 +565,7 @@ class FindUserWindow(QWidget):
         Handles the response containing user details.
 
         Args:
-            user_details (dict or None): User details if successful, otherwise None.
+            user_details (Taxpayer or None): User details if successful, otherwise None.
         """
         if user_details:
             self.client_logger.log_debug("User details retrieved successfully")
@@ -484,8 +576,12 @@ class FindUserWindow(QWidget):
             QMessageBox.warning(self, "Retrieving Unsuccessful", "Could not retrieve information.")
             self.client_logger.log_debug("Retrieving of user details was unsuccessful!")
 
-    def __search_unsuccessful_message(self):
-        QMessageBox.information(self, "Search Status", "No matching results")
+    def __search_unsuccessful_message(self, truncated):
+        if truncated:
+            QMessageBox.information(self, "Search Status", f"No matching results were found, but "
+                                                           f"{TRUNCATED_SEARCH_HINT}")
+        else:
+            QMessageBox.information(self, "Search Status", "No matching results")
 
     def __handle_timeout(self):
         """
@@ -7,7 +7,8 @@ from Code.tcp_ip.tcp_driver import TCPClient
 class LoginWorker(QObject):
     """
     LoginWorker handles the process of sending a sign-in request to the server
-    and emitting a signal based on the server's response.
+    and emitting a signal based on the server's response. On success the session token returned by the server is
+    handed to the TCPClient, which sends it with all following requests instead of the credentials.
 
     Attributes:
         finished (pyqtSignal): Signal emitted when the sign-in process is complete.
@@ -60,6 +61,7 @@ class LoginWorker(QObject):
         }
 
         message_json = json.dumps(message)
+        self.password = None
         delimiter = b'\r\n'
         request = message_json.encode() + delimiter
 
@@ -69,15 +71,20 @@ class LoginWorker(QObject):
 
             self.client_logger.log_debug(f"TMS server response is {response}")
 
-            if response["error"] != 0 or response["response"] not in [
-                "User logged in successfully",
-                "Username and password must be provided",
-                "Invalid username or password"
-            ]:
+            if response["error"] != 0:
                 self.client_logger.log_debug("Server response error")
                 self.finished.emit(False)
+            elif response["response"] in ["Username and password must be provided", "Invalid username or password"]:
+                self.finished.emit(False)
             else:
-                self.finished.emit(response["response"] == "User logged in successfully")
+                response_data = json.loads(response["response"])
+                if response_data.get("command") != "login_successful" or not response_data.get("token"):
+                    self.client_logger.log_debug("Server response error")
+                    self.finished.emit(False)
+                    return
+                tcp_client.session_token = response_data["token"]
+                self.client_logger.log_debug(f"Session opened for {response_data.get('expires_in')} seconds")
+                self.finished.emit(True)
 
         except Exception as exception:
             self.client_logger.log_error(f"Unexpected exception: {exception}")
@@ -95,13 +102,12 @@ class LoginWindow(QWidget):
         host (str): Host address for the TCP connection.
         port (int): Port number for the TCP connection.
         username (str): Entered username by the user.
-        password (str): Entered password by the user.
         __main_layout (QVBoxLayout): Main layout of the window.
         __ATTEMPTS_LIMIT (int): Maximum number of sign-in attempts allowed.
         __attempt_count (int): Counter for the number of sign-in attempts.
         __timer (QTimer): Timer for session timeout.
     """
-    login_successful = pyqtSignal(str, str, str, int)
+    login_successful = pyqtSignal(str, str, int)
 
     def __init__(self, client_logger, host, port):
         """
@@ -117,7 +123,6 @@ class LoginWindow(QWidget):
         self.host = host
         self.port = port
         self.username = None
-        self.password = None
 
         self.setWindowTitle("Login")
         self.__main_layout = QVBoxLayout()
@@ -218,11 +223,11 @@ class LoginWindow(QWidget):
             return
 
         self.username = self.__username_edit.text()
-        self.password = self.__password_edit.text()
 
         self.__button_clicked = True
 
-        self.worker = LoginWorker(self.__client_logger, self.host, self.port, self.username, self.password)
+        self.worker = LoginWorker(self.__client_logger, self.host, self.port, self.username,
+                                  self.__password_edit.text())
         self.thread = QThread()
         self.worker.moveToThread(self.thread)
 
@@ -244,7 +249,7 @@ class LoginWindow(QWidget):
             self.__client_logger.log_debug("Login procedure has been completed successfully")
             self.__login_success_message()
             self.__timer.stop()
-            self.login_successful.emit(self.username, self.password, self.host, self.port)
+            self.login_successful.emit(self.username, self.host, self.port)
             self.close()
         else:
             self.__client_logger.log_debug("Login procedure has been completed unsuccessfully")
@@ -6,6 +6,7 @@ from PyQt6.QtGui import QRegularExpressionValidator
 from PyQt6.QtCore import QRegularExpression, pyqtSignal, QDate, QThread, QObject
 from Code.tcp_ip.tcp_driver import TCPClient
 from Code.utils.tms_logs import TMSLogger
+from Code.utils.taxpayer_validation import validate_taxpayer
 from PyQt6.QtWidgets import QMessageBox
 
 
@@ -330,13 +331,6 @@ class NewUserWindow(QWidget):
         phone_number = self.__phone_number_edit.text().strip()
         marital_status = "single" if self.__radio_single.isChecked() else "married"
 
-        # Validate the input fields
-        if not all([national_id, first_name, last_name, date_of_birth != "1900-01-01",
-                    address_country, address_zip_code, address_city, address_street,
-                    address_house_number != "0", phone_country_code, phone_number]):
-            QMessageBox.warning(self, "Validation Error", "Please fill in all required fields.")
-            return
-
         data = {
             "national_id": national_id,
             "first_name": first_name,
@@ -353,6 +347,12 @@ class NewUserWindow(QWidget):
             "marital_status": marital_status,
         }
 
+        # Validate the input fields
+        validation_errors = validate_taxpayer(data)
+        if validation_errors:
+            QMessageBox.warning(self, "Validation Error", "\n".join(validation_errors))
+            return
+
         self.__client_logger.log_debug(f"User input collected: {data}")
 
         self.save_new_user_request(data)
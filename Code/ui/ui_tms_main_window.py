@@ -15,16 +15,16 @@ class TMSMainWindow(QWidget):
     Represents the main window of the Tax Management System (TMS) application, created using PyQt6 for user interaction
     with the GUI.
     """
-    user_details_retrieved_signal = pyqtSignal(dict)
+    user_details_retrieved_signal = pyqtSignal(object)
 
-    def __init__(self, client_logger: TMSLogger, username: str, password: str, host: str, port: int):
+    def __init__(self, client_logger: TMSLogger, username: str, host: str, port: int):
         """
         Initializes a new instance of the TMSMainWindow class.
 
         Args:
             client_logger (TMSLogger): TMS Logger instance.
-            username (str): The username of the TMS user.
-            password (str): The password of the TMS user.
+            username (str): The username of the TMS user. The session token returned at login is kept by the
+                TCPClient, the password is not stored.
             host (str): The server's hostname or IP address to connect to.
             port (int): The port used by the server to connect to.
         """
@@ -32,7 +32,6 @@ class TMSMainWindow(QWidget):
 
         self.__client_logger = client_logger
         self.__username = username
-        self.__password = password
         self.host = host
         self.port = port
 
@@ -183,43 +182,35 @@ class TMSMainWindow(QWidget):
     def populate_user_information(self, user_details):
         """
         Populates the main window with the retrieved user information.
+
+        Args:
+            user_details (Taxpayer): The taxpayer record retrieved from the server, or None.
         """
         self.__client_logger.log_debug(f"Received user details: {user_details}")
         try:
             if user_details is not None:
                 # Update labels with user information
-                self.label_national_id.setText(f"National ID: {user_details['national_id']}")
-                self.label_name.setText(f"User name: {user_details['first_name']} {user_details['last_name']}")
-                self.label_date_of_birth.setText(f"Date of birth: {user_details['date_of_birth']}")
-                self.label_gender.setText(f"Gender: {user_details['gender']}")
-                address_country = user_details.get('address_country', '')
-                address_zip_code = user_details.get('address_zip_code', '')
-                # address_zip_code = address_zip_code.lstrip('*')
-                address_city = user_details.get('address_city', '')
-                address_street = user_details.get('address_street', '')
-                address_house_number = user_details.get('address_house_number', '')
-                address_text = (f"{address_street} {address_house_number}, {address_zip_code} {address_city}, "
-                                f"{address_country}")
+                self.label_national_id.setText(f"National ID: {user_details.national_id}")
+                self.label_name.setText(f"User name: {user_details.first_name} {user_details.last_name}")
+                self.label_date_of_birth.setText(f"Date of birth: {user_details.date_of_birth}")
+                self.label_gender.setText(f"Gender: {user_details.gender}")
+                address_text = (f"{user_details.address_street} {user_details.address_house_number}, "
+                                f"{user_details.address_zip_code} {user_details.address_city}, "
+                                f"{user_details.address_country}")
                 self.label_address.setText(f"Address: {address_text}")
-                phone_country_code = user_details.get('phone_country_code', '')
-                phone_number = user_details.get('phone_number', '')
-                phone_text = f"{phone_country_code} {phone_number}"
+                phone_text = f"{user_details.phone_country_code} {user_details.phone_number}"
                 self.label_phone_number.setText(f"Phone number: {phone_text}")
-                self.label_marital_status.setText(f"Marital status: {user_details['marital_status']}")
+                self.label_marital_status.setText(f"Marital status: {user_details.marital_status}")
 
                 # Format numerical fields with commas, defaulting to empty string if None
-                yearly_income = f"{user_details['yearly_income']:,}" if user_details['yearly_income'] is not None \
-                    else ''
-                advance_tax = f"{user_details['advance_tax']:,}" if user_details['advance_tax'] is not None else ''
-                tax_paid_this_year = f"{user_details['tax_paid_this_year']:,}" if (user_details[
-                                                                                      'tax_paid_this_year'] is not
-                                                                                   None) else ''
-                property_value = f"{user_details['property_value']:,}" if user_details[
-                                                                              'property_value'] is not None else ''
-                loans = f"{user_details['loans']:,}" if user_details['loans'] is not None else ''
-                property_tax = f"{user_details['property_tax']:,}" if user_details['property_tax'] is not None else ''
-
-                self.label_tax_rate.setText(f"Tax rate: {user_details['tax_rate']}")
+                yearly_income = self.__format_amount(user_details.yearly_income)
+                advance_tax = self.__format_amount(user_details.advance_tax)
+                tax_paid_this_year = self.__format_amount(user_details.tax_paid_this_year)
+                property_value = self.__format_amount(user_details.property_value)
+                loans = self.__format_amount(user_details.loans)
+                property_tax = self.__format_amount(user_details.property_tax)
+
+                self.label_tax_rate.setText(f"Tax rate: {user_details.tax_rate}")
                 self.label_yearly_income.setText(f"Yearly income: {yearly_income}")
                 self.label_advance_tax.setText(f"Advance tax: {advance_tax}")
                 self.label_tax_paid_this_year.setText(f"Tax paid this year: {tax_paid_this_year}")
@@ -233,6 +224,13 @@ class TMSMainWindow(QWidget):
         except Exception as exception:
             self.__client_logger.log_debug(f"Unexpected exception: {exception}")
 
+    @staticmethod
+    def __format_amount(amount):
+        """
+        Formats an amount with thousands separators, an unknown amount as an empty string.
+        """
+        return f"{amount:,}" if amount is not None else ''
+
 
 if __name__ == "__main__":
 
@@ -261,9 +259,8 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
 
     username = None
-    password = None
 
-    main_window = TMSMainWindow(client_logger, username, password, host, port)
+    main_window = TMSMainWindow(client_logger, username, host, port)
 
     main_window.show()
     sys.exit(app.exec())
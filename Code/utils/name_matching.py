@@ -0,0 +1,142 @@
+import re
+import unicodedata
+
+# Letters which Unicode does not decompose into a base letter and a diacritic
+SPECIAL_LETTERS = str.maketrans({"ø": "o", "æ": "ae", "œ": "oe", "ß": "ss", "þ": "th", "ð": "d", "đ": "d", "ł": "l",
+                                 "Ø": "O", "Æ": "AE", "Œ": "OE", "Þ": "TH", "Ð": "D", "Đ": "D", "Ł": "L"})
+
+VOWELS = "AEIOUY"
+
+# Length of a phonetic key; longer names share the key of their beginning
+PHONETIC_KEY_LENGTH = 4
+
+# Prefixes of the keys of the name columns in the name key index
+NAME_KEY_PREFIXES = {"first_name": "f:", "last_name": "l:"}
+
+
+def fold_name(name):
+    """
+    Folds a name for comparison: diacritics are removed, e.g. "Åse Sørensen" becomes "ase sorensen".
+
+    Args:
+        name (str): The name.
+
+    Returns:
+        str: The folded name in lower case, words separated by single spaces.
+    """
+    decomposed = unicodedata.normalize("NFKD", (name or "").translate(SPECIAL_LETTERS))
+    letters = "".join(character for character in decomposed if not unicodedata.combining(character))
+    return " ".join(re.findall(r"[^\W\d_]+", letters.lower()))
+
+
+def phonetic_key(word):
+    """
+    Encodes a single word by its sound, so common misspellings get the same key, e.g. "Kowalsky", "Kowalski" and
+    "Kovalski" all become "KFLS". The rules are a compact variant of Metaphone: vowels after the first letter and
+    silent letters are dropped, letters with similar sounds share a code and the key is cut to PHONETIC_KEY_LENGTH.
+
+    Args:
+        word (str): The word, folded with fold_name.
+
+    Returns:
+        str: The phonetic key, empty if the word has no letters.
+    """
+    word = re.sub(r"[^A-Z]", "", word.upper())
+    if word[:2] in ("KN", "GN", "PN", "WR", "PS"):
+        word = word[1:]
+    if not word:
+        return ""
+
+    codes = []
+    position = 0
+    while position < len(word) and len(codes) < PHONETIC_KEY_LENGTH + 1:
+        letter = word[position]
+        following = word[position + 1] if position + 1 < len(word) else ""
+        code = ""
+        step = 1
+        if letter in VOWELS:
+            code = "A" if position == 0 else ""
+        elif letter == "C":
+            if following == "H":
+                # "Chr" and "chl" sound like "kr" and "kl"
+                code, step = ("K", 2) if word[position + 2:position + 3] in ("R", "L") else ("X", 2)
+            elif following and following in "EIY":
+                code = "S"
+            else:
+                code = "K"
+        elif letter == "S":
+            if following == "H" or word[position:position + 3] == "SCH":
+                code, step = "X", 3 if following == "C" else 2
+            elif following == "J":
+                code, step = "X", 2
+            else:
+                code = "S"
+        elif letter == "P":
+            code, step = ("F", 2) if following == "H" else ("P", 1)
+        elif letter == "T":
+            # "Th" is pronounced "t" in Nordic names, e.g. "Thor"
+            code, step = ("T", 2) if following == "H" else ("T", 1)
+        elif letter == "G":
+            # The G of "ng" is not pronounced on its own
+            code = "" if position > 0 and word[position - 1] == "N" else "K"
+        elif letter == "H":
+            code = "H" if position == 0 else ""
+        else:
+            code = {"B": "P", "D": "T", "Q": "K", "V": "F", "W": "F", "X": "KS", "Z": "S"}.get(letter, letter)
+        for character in code:
+            if not codes or codes[-1] != character:
+                codes.append(character)
+        position += step
+    return "".join(codes)[:PHONETIC_KEY_LENGTH]
+
+
+def name_keys(first_name, last_name):
+    """
+    Creates the keys under which a person is stored in the name key index: the keys of the first and the last name.
+
+    Args:
+        first_name (str): The first name.
+        last_name (str): The last name.
+
+    Returns:
+        set: The keys.
+    """
+    return column_keys("first_name", first_name) | column_keys("last_name", last_name)
+
+
+def column_keys(column, name):
+    """
+    Creates the keys of a name: the phonetic key of every word of the name, prefixed with the column.
+
+    Args:
+        column (str): The name column, one of NAME_KEY_PREFIXES.
+        name (str): The name.
+
+    Returns:
+        set: The keys.
+    """
+    return {NAME_KEY_PREFIXES[column] + key for key in map(phonetic_key, fold_name(name).split()) if key}
+
+
+def edit_distance(first, second):
+    """
+    Calculates the Levenshtein distance of two strings, the number of inserted, deleted or replaced characters
+    needed to turn one into the other.
+
+    Args:
+        first (str): The first string.
+        second (str): The second string.
+
+    Returns:
+        int: The edit distance.
+    """
+    if len(first) < len(second):
+        first, second = second, first
+    previous_row = list(range(len(second) + 1))
+    for row, first_character in enumerate(first, start=1):
+        current_row = [row]
+        for column, second_character in enumerate(second, start=1):
+            current_row.append(min(previous_row[column] + 1, current_row[column - 1] + 1,
+                                   previous_row[column - 1] + (first_character != second_character)))
+        previous_row = current_row
+    return previous_row[-1]
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+# Number of most recent samples used for the latency percentiles
+LATENCY_WINDOW = 1024
+
+
+class VerifierBusyError(Exception):
+    """
+    Raised when a password cannot be verified because all workers are busy and the queue of waiting checks is full.
+    """
+
+
+class PasswordVerifier:
+    """
+    Verifies passwords against their bcrypt hashes on a dedicated pool of worker threads.
+
+    A bcrypt check costs a few hundred milliseconds of CPU. Running it on its own small pool, outside any database
+    lock, keeps a burst of logins from delaying searches and saves; bcrypt releases the GIL while hashing, so the
+    checks run in parallel with the rest of the server. The pool is bounded: at most max_workers checks run at once
+    and at most max_pending wait for a worker, further checks are rejected straight away. The number of waiting
+    checks and the waiting and hashing times are reported, so a saturated pool is visible.
+    """
+
+    def __init__(self, max_workers=2, max_pending=64):
+        """
+        Args:
+            max_workers (int, optional): Number of worker threads, i.e. checks running at the same time.
+            max_pending (int, optional): Maximum number of checks waiting for a free worker.
+        """
+        if max_workers < 1:
+            raise ValueError(f"Number of password workers must be positive, got {max_workers}")
+        if max_pending < 0:
+            raise ValueError(f"Password queue size must not be negative, got {max_pending}")
+
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tms_password")
+        self.__slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self.__stats_lock = threading.Lock()
+        self.__pending = 0
+        self.__active = 0
+        self.__max_pending_seen = 0
+        self.__completed = 0
+        self.__rejected = 0
+        self.__wait_times = deque(maxlen=LATENCY_WINDOW)
+        self.__verify_times = deque(maxlen=LATENCY_WINDOW)
+
+    def verify(self, password, hashed_password):
+        """
+        Checks a password against its bcrypt hash on the worker pool and waits for the result.
+        Args:
+            password (str): The password entered by the user.
+            hashed_password (str): The stored bcrypt hash.
+        Returns:
+            bool: True if the password matches the hash.
+        Raises:
+            VerifierBusyError: If all workers are busy and the queue is full.
+        """
+        if not self.__slots.acquire(blocking=False):
+            with self.__stats_lock:
+                self.__rejected += 1
+            raise VerifierBusyError("Too many password checks in progress")
+
+        with self.__stats_lock:
+            self.__pending += 1
+            self.__max_pending_seen = max(self.__max_pending_seen, self.__pending)
+        try:
+            future = self.__executor.submit(self.__check, password, hashed_password, time.perf_counter())
+        except BaseException:
+            with self.__stats_lock:
+                self.__pending -= 1
+            self.__slots.release()
+            raise
+        return future.result()
+
+    def stats(self):
+        """
+        Returns the runtime statistics of the pool.
+        Returns:
+            dict: Pool and queue size, current and highest queue depth, running, completed and rejected checks and
+            the times spent waiting for a worker and hashing in milliseconds.
+        """
+        with self.__stats_lock:
+            wait_times = sorted(self.__wait_times)
+            verify_times = sorted(self.__verify_times)
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "queue_depth": self.__pending,
+                "max_queue_depth": self.__max_pending_seen,
+                "active": self.__active,
+                "completed": self.__completed,
+                "rejected": self.__rejected,
+                "wait_p50_ms": self.__percentile(wait_times, 0.50),
+                "wait_p95_ms": self.__percentile(wait_times, 0.95),
+                "verify_p50_ms": self.__percentile(verify_times, 0.50),
+                "verify_p95_ms": self.__percentile(verify_times, 0.95)
+            }
+
+    def shutdown(self):
+        """
+        Stops the worker threads once the submitted checks have finished.
+        """
+        self.__executor.shutdown(wait=True)
+
+    def __check(self, password, hashed_password, submitted):
+        """
+        Runs a single bcrypt check on a worker thread and accounts it.
+        """
+        started = time.perf_counter()
+        with self.__stats_lock:
+            self.__pending -= 1
+            self.__active += 1
+            self.__wait_times.append(started - submitted)
+        try:
+            return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+        finally:
+            with self.__stats_lock:
+                self.__active -= 1
+                self.__completed += 1
+                self.__verify_times.append(time.perf_counter() - started)
+            self.__slots.release()
+
+    @staticmethod
+    def __percentile(sorted_times, fraction):
+        """
+        Returns the given percentile of sorted times in milliseconds.
+        """
+        if not sorted_times:
+            return 0.0
+        index = min(int(len(sorted_times) * fraction), len(sorted_times) - 1)
+        return round(sorted_times[index] * 1000, 3)
@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket rate limiter with one bucket per key.
+
+    Every bucket holds up to burst tokens and is refilled at rate tokens per second; an attempt takes one token and
+    is refused when the bucket is empty. A bucket which has been refilled completely behaves like a new one, so it is
+    dropped, which keeps only the buckets of recently limited keys in memory. At most max_buckets buckets are kept;
+    when the table is full, the bucket used least recently is dropped.
+    """
+
+    def __init__(self, rate, burst, max_buckets=10000, clock=time.monotonic):
+        """
+        Args:
+            rate (float): Tokens added to a bucket per second.
+            burst (int): Capacity of a bucket, i.e. the number of attempts allowed at once.
+            max_buckets (int, optional): Maximum number of buckets kept in memory.
+            clock (callable, optional): Function returning the current time in seconds.
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"Rate and burst must be positive, got {rate} and {burst}")
+        if max_buckets < 1:
+            raise ValueError(f"Number of buckets must be positive, got {max_buckets}")
+        self.rate = rate
+        self.burst = burst
+        self.max_buckets = max_buckets
+        self.__clock = clock
+        self.__buckets = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__stats = {"allowed": 0, "limited": 0, "expired": 0, "evicted": 0}
+
+    def acquire(self, key):
+        """
+        Takes a token from the bucket of a key.
+        Args:
+            key: The key, e.g. a client address or a username.
+        Returns:
+            float: 0 if the attempt is allowed, otherwise the number of seconds until the next token is available.
+        """
+        now = self.__clock()
+        with self.__lock:
+            self.__expire(now)
+            tokens, updated = self.__buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0.0
+                self.__stats["allowed"] += 1
+            else:
+                retry_after = (1 - tokens) / self.rate
+                self.__stats["limited"] += 1
+            self.__buckets[key] = (tokens, now)
+            if len(self.__buckets) > self.max_buckets:
+                self.__buckets.popitem(last=False)
+                self.__stats["evicted"] += 1
+        return retry_after
+
+    def stats(self):
+        """
+        Returns the runtime statistics of the limiter.
+        Returns:
+            dict: Rate, burst, number of buckets and counts of allowed and limited attempts and of expired and
+                evicted buckets.
+        """
+        with self.__lock:
+            return {"rate": self.rate, "burst": self.burst, "buckets": len(self.__buckets), **self.__stats}
+
+    def __expire(self, now):
+        """
+        Drops the buckets which have been refilled completely. The buckets are ordered by their last use, so only
+        the oldest ones are checked.
+        """
+        refill_time = self.burst / self.rate
+        while self.__buckets:
+            key, (tokens, updated) = next(iter(self.__buckets.items()))
+            if now - updated < refill_time:
+                break
+            del self.__buckets[key]
+            self.__stats["expired"] += 1
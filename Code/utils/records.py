@@ -0,0 +1,109 @@
+from collections import namedtuple
+from operator import itemgetter
+from Code.utils.taxpayer_columns import PERSONAL_INFO_COLUMNS, CONTACT_INFO_COLUMNS, TAX_INFO_COLUMNS, TAXPAYER_COLUMNS
+
+
+class Record:
+    """
+    Conversions shared by the taxpayer records.
+
+    The records are tuples with named fields and empty __slots__, so a record takes no more memory than a tuple of
+    its values and has no per-instance dict. Database rows and wire dicts are converted without going through
+    intermediate dicts: a row becomes a record in a single tuple creation.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Creates a record from a database row read with the columns of the record. Additional trailing columns,
+        e.g. the rank of a ranked search, are ignored.
+        Args:
+            row (tuple): The database row.
+        Returns:
+            Record: The record.
+        """
+        return cls._make(row[:len(cls._fields)] if len(row) > len(cls._fields) else row)
+
+    def to_row(self):
+        """
+        Returns the values of the record in the order of its database columns.
+        Returns:
+            tuple: The values.
+        """
+        return tuple(self)
+
+    @classmethod
+    def from_wire(cls, data):
+        """
+        Creates a record from the dict sent over the wire, missing fields are None.
+        Args:
+            data (dict): The decoded JSON object.
+        Returns:
+            Record: The record.
+        """
+        return cls._make(map(data.get, cls._fields))
+
+    def to_wire(self):
+        """
+        Returns the record as a dict, ready to be serialized to JSON.
+        Returns:
+            dict: The fields of the record by name.
+        """
+        return dict(zip(self._fields, self))
+
+
+class PersonalInfo(Record, namedtuple("PersonalInfo", PERSONAL_INFO_COLUMNS)):
+    """
+    A row of personal_info.
+    """
+    __slots__ = ()
+
+
+class ContactInfo(Record, namedtuple("ContactInfo", CONTACT_INFO_COLUMNS)):
+    """
+    A row of contact_info.
+    """
+    __slots__ = ()
+
+
+class TaxInfo(Record, namedtuple("TaxInfo", TAX_INFO_COLUMNS)):
+    """
+    A row of tax_info.
+    """
+    __slots__ = ()
+
+
+# Positions of the fields of the table records within a taxpayer record
+PERSONAL_INFO_ITEMS = itemgetter(*(TAXPAYER_COLUMNS.index(column) for column in PERSONAL_INFO_COLUMNS))
+CONTACT_INFO_ITEMS = itemgetter(*(TAXPAYER_COLUMNS.index(column) for column in CONTACT_INFO_COLUMNS))
+TAX_INFO_ITEMS = itemgetter(*(TAXPAYER_COLUMNS.index(column) for column in TAX_INFO_COLUMNS))
+
+
+class Taxpayer(Record, namedtuple("Taxpayer", TAXPAYER_COLUMNS)):
+    """
+    All stored information of a taxpayer, as read by DatabaseServices.retrieve_user_details. The fields are kept in
+    one flat tuple; the records of the single tables are created on demand.
+    """
+    __slots__ = ()
+
+    @property
+    def personal_info(self):
+        """
+        PersonalInfo: The personal information of the taxpayer.
+        """
+        return PersonalInfo._make(PERSONAL_INFO_ITEMS(self))
+
+    @property
+    def contact_info(self):
+        """
+        ContactInfo: The contact information of the taxpayer.
+        """
+        return ContactInfo._make(CONTACT_INFO_ITEMS(self))
+
+    @property
+    def tax_info(self):
+        """
+        TaxInfo: The tax information of the taxpayer.
+        """
+        return TaxInfo._make(TAX_INFO_ITEMS(self))
@@ -0,0 +1,127 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """
+    This class implements a writer-preferring reader/writer lock.
+
+    Any number of readers may hold the lock at the same time, while a writer holds it exclusively. As soon as a
+    writer is waiting, new readers are queued behind it, so a steady stream of reads cannot starve writes.
+    The lock counts acquisitions and the time spent waiting for it, so contention can be measured.
+    """
+
+    def __init__(self):
+        self.__condition = threading.Condition(threading.Lock())
+        self.__active_readers = 0
+        self.__active_writer = False
+        self.__waiting_writers = 0
+        self.__stats = {
+            "read": {"acquisitions": 0, "contended": 0, "wait_time": 0.0, "max_wait_time": 0.0},
+            "write": {"acquisitions": 0, "contended": 0, "wait_time": 0.0, "max_wait_time": 0.0}
+        }
+
+    def acquire_read(self):
+        """
+        Acquires the lock for reading. Blocks while a writer holds the lock or is waiting for it.
+        """
+        with self.__condition:
+            started = time.perf_counter()
+            contended = self.__active_writer or self.__waiting_writers > 0
+            while self.__active_writer or self.__waiting_writers > 0:
+                self.__condition.wait()
+            self.__active_readers += 1
+            self.__account("read", contended, time.perf_counter() - started)
+
+    def release_read(self):
+        """
+        Releases the lock acquired for reading.
+        """
+        with self.__condition:
+            if self.__active_readers <= 0:
+                raise RuntimeError("Cannot release a read lock which is not held")
+            self.__active_readers -= 1
+            if self.__active_readers == 0:
+                self.__condition.notify_all()
+
+    def acquire_write(self):
+        """
+        Acquires the lock for writing. Blocks until all readers and the current writer have released it.
+        """
+        with self.__condition:
+            started = time.perf_counter()
+            contended = self.__active_writer or self.__active_readers > 0
+            self.__waiting_writers += 1
+            try:
+                while self.__active_writer or self.__active_readers > 0:
+                    self.__condition.wait()
+            finally:
+                self.__waiting_writers -= 1
+            self.__active_writer = True
+            self.__account("write", contended, time.perf_counter() - started)
+
+    def release_write(self):
+        """
+        Releases the lock acquired for writing.
+        """
+        with self.__condition:
+            if not self.__active_writer:
+                raise RuntimeError("Cannot release a write lock which is not held")
+            self.__active_writer = False
+            self.__condition.notify_all()
+
+    @contextmanager
+    def read_locked(self):
+        """
+        Context manager holding the lock for reading.
+        """
+        self.acquire_read()
+        try:
+            yield self
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        """
+        Context manager holding the lock for writing.
+        """
+        self.acquire_write()
+        try:
+            yield self
+        finally:
+            self.release_write()
+
+    def stats(self):
+        """
+        Returns the contention statistics of the lock.
+        Returns:
+            dict: Per mode acquisitions, contended acquisitions and wait times in milliseconds, plus the current
+            number of active readers and waiting writers.
+        """
+        with self.__condition:
+            stats = {
+                "active_readers": self.__active_readers,
+                "active_writer": self.__active_writer,
+                "waiting_writers": self.__waiting_writers
+            }
+            for mode, mode_stats in self.__stats.items():
+                stats[mode] = {
+                    "acquisitions": mode_stats["acquisitions"],
+                    "contended": mode_stats["contended"],
+                    "wait_time_ms": round(mode_stats["wait_time"] * 1000, 3),
+                    "max_wait_time_ms": round(mode_stats["max_wait_time"] * 1000, 3)
+                }
+            return stats
+
+    def __account(self, mode, contended, wait_time):
+        """
+        Updates the statistics of the given mode. Must be called with the condition held.
+        """
+        mode_stats = self.__stats[mode]
+        mode_stats["acquisitions"] += 1
+        if contended:
+            mode_stats["contended"] += 1
+        mode_stats["wait_time"] += wait_time
+        mode_stats["max_wait_time"] = max(mode_stats["max_wait_time"], wait_time)
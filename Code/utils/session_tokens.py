@@ -0,0 +1,156 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+
+# Environment variable holding the key the session tokens are signed with. Server worker processes inherit it from
+# the supervisor, so a token issued by one worker is accepted by all of them.
+SESSION_SECRET_ENV = "TMS_SESSION_SECRET"
+
+# Seconds a session token stays valid after the login
+DEFAULT_SESSION_TTL = 8 * 60 * 60
+
+# Seconds between two sweeps of the expired tokens out of the token table
+DEFAULT_SWEEP_INTERVAL = 60.0
+
+
+def session_secret():
+    """
+    Returns the key the session tokens are signed with, creating a random one for the current process and its
+    child processes if none is set in the environment.
+    Returns:
+        bytes: The signing key.
+    """
+    return os.environ.setdefault(SESSION_SECRET_ENV, secrets.token_hex(32)).encode()
+
+
+class SessionTokenStore:
+    """
+    Issues and validates the session tokens handed out by login_request.
+
+    A token has the form "<id>.<expiry>.<username>.<signature>": a random ID, the expiry as a Unix timestamp, the
+    base64 encoded username and an HMAC-SHA256 signature of the three. Issued tokens are kept in a table keyed by
+    the token, so validating a known token is a single dictionary lookup. A token with a valid signature which is not
+    in the table, e.g. one issued by another server process, is checked once and then added to the table. Expired
+    tokens are swept out of the table every sweep interval.
+    """
+
+    def __init__(self, secret=None, ttl=DEFAULT_SESSION_TTL, sweep_interval=DEFAULT_SWEEP_INTERVAL, clock=time.time):
+        """
+        Args:
+            secret (bytes, optional): The signing key, defaults to session_secret().
+            ttl (float, optional): Seconds a token stays valid.
+            sweep_interval (float, optional): Seconds between two sweeps of the expired tokens.
+            clock (callable, optional): Function returning the current Unix time in seconds.
+        """
+        if ttl <= 0:
+            raise ValueError(f"Session time to live must be positive, got {ttl}")
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.__secret = session_secret() if secret is None else secret
+        self.__clock = clock
+        self.__tokens = {}
+        self.__lock = threading.Lock()
+        self.__next_sweep = clock() + sweep_interval
+        self.__stats = {"issued": 0, "validated": 0, "rejected": 0, "swept": 0}
+
+    def issue(self, username):
+        """
+        Creates a session token for a user whose credentials have been checked.
+        Args:
+            username (str): The username.
+        Returns:
+            str: The session token.
+        """
+        expires = int(self.__clock() + self.ttl)
+        encoded_username = base64.urlsafe_b64encode(username.encode()).decode().rstrip("=")
+        payload = f"{secrets.token_urlsafe(16)}.{expires}.{encoded_username}"
+        token = f"{payload}.{self.__sign(payload)}"
+        with self.__lock:
+            self.__tokens[token] = (username, expires)
+            self.__stats["issued"] += 1
+        self.__sweep_if_due()
+        return token
+
+    def validate(self, token):
+        """
+        Checks a session token.
+        Args:
+            token (str): The token sent by the client.
+        Returns:
+            str: The username of the session, or None if the token is invalid or expired.
+        """
+        now = self.__clock()
+        with self.__lock:
+            session = self.__tokens.get(token) if isinstance(token, str) else None
+        if session is None:
+            session = self.__verify(token)
+            if session is not None:
+                with self.__lock:
+                    self.__tokens[token] = session
+        self.__sweep_if_due()
+
+        with self.__lock:
+            if session is None or session[1] <= now:
+                self.__stats["rejected"] += 1
+                return None
+            self.__stats["validated"] += 1
+        return session[0]
+
+    def sweep(self):
+        """
+        Removes the expired tokens from the token table.
+        Returns:
+            int: The number of removed tokens.
+        """
+        now = self.__clock()
+        with self.__lock:
+            expired = [token for token, (_, expires) in self.__tokens.items() if expires <= now]
+            for token in expired:
+                del self.__tokens[token]
+            self.__stats["swept"] += len(expired)
+            self.__next_sweep = now + self.sweep_interval
+        return len(expired)
+
+    def stats(self):
+        """
+        Returns the runtime statistics of the token table.
+        Returns:
+            dict: Time to live, number of live sessions and counts of issued, validated, rejected and swept
+                tokens.
+        """
+        with self.__lock:
+            return {"ttl": self.ttl, "sessions": len(self.__tokens), **self.__stats}
+
+    def __sweep_if_due(self):
+        """
+        Sweeps the token table if the sweep interval has passed.
+        """
+        if self.__clock() >= self.__next_sweep:
+            self.sweep()
+
+    def __sign(self, payload):
+        """
+        Signs a token payload.
+        """
+        digest = hmac.new(self.__secret, payload.encode(), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+    def __verify(self, token):
+        """
+        Checks the signature of a token which is not in the token table.
+        Returns:
+            tuple: The username and the expiry of the token, or None if the token is malformed or forged.
+        """
+        try:
+            payload, signature = token.rsplit(".", 1)
+            _, expires, encoded_username = payload.split(".")
+            if not hmac.compare_digest(signature, self.__sign(payload)):
+                return None
+            padding = "=" * (-len(encoded_username) % 4)
+            return base64.urlsafe_b64decode(encoded_username + padding).decode(), int(expires)
+        except (AttributeError, TypeError, ValueError, UnicodeError):
+            return None
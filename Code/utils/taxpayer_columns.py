@@ -0,0 +1,11 @@
+# Columns of the taxpayer tables, shared by the database layer and the taxpayer records
+
+# Columns of a taxpayer record accepted by save_many_to_sql, per table
+PERSONAL_INFO_COLUMNS = ("national_id", "first_name", "last_name", "date_of_birth", "gender")
+CONTACT_INFO_COLUMNS = ("national_id", "address_country", "address_zip_code", "address_city", "address_street",
+                        "address_house_number", "phone_country_code", "phone_number")
+TAX_INFO_COLUMNS = ("national_id", "marital_status", "tax_rate", "yearly_income", "advance_tax", "tax_paid_this_year",
+                    "property_value", "loans", "property_tax")
+
+# All columns of a taxpayer, in the order of the tables
+TAXPAYER_COLUMNS = tuple(dict.fromkeys(PERSONAL_INFO_COLUMNS + CONTACT_INFO_COLUMNS + TAX_INFO_COLUMNS))
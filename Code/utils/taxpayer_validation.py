@@ -0,0 +1,29 @@
+# Validation rules of new taxpayers, shared by the New User window and the bulk import
+
+# Date shown by the New User window before a date of birth has been picked
+UNSET_DATE_OF_BIRTH = "1900-01-01"
+
+REQUIRED_FIELDS = ("national_id", "first_name", "last_name", "date_of_birth", "address_country", "address_zip_code",
+                   "address_city", "address_street", "address_house_number", "phone_country_code", "phone_number")
+
+
+def validate_taxpayer(data):
+    """
+    Validates the data of a new taxpayer with the rules of the New User window: every required field has to be
+    filled in.
+
+    Args:
+        data (dict): The taxpayer fields as strings, date of birth in "YYYY-MM-DD" format.
+
+    Returns:
+        list: The validation errors, empty if the data is valid.
+    """
+    def text(field):
+        value = data.get(field)
+        return "" if value is None else str(value).strip()
+
+    # The New User window shows placeholder values instead of an empty date of birth and house number
+    unset = text("date_of_birth") == UNSET_DATE_OF_BIRTH or text("address_house_number") == "0"
+    if unset or not all(text(field) for field in REQUIRED_FIELDS):
+        return ["Please fill in all required fields."]
+    return []
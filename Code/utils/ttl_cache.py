@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Thread-safe least recently used cache whose entries expire after a time to live.
+
+    The cache holds at most max_size entries; when it is full, the entry used least recently is evicted. An entry
+    older than the time to live is treated as missing and removed when it is looked up.
+    """
+
+    def __init__(self, max_size=1024, ttl=60.0, clock=time.monotonic):
+        """
+        Args:
+            max_size (int, optional): Maximum number of entries, 0 disables the cache.
+            ttl (float, optional): Seconds an entry stays valid, None keeps entries until they are evicted.
+            clock (callable, optional): Function returning the current time in seconds.
+        """
+        if max_size < 0:
+            raise ValueError(f"Cache size must not be negative, got {max_size}")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.__clock = clock
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key):
+        """
+        Looks an entry up and marks it as recently used.
+        Args:
+            key: The key of the entry.
+        Returns:
+            The cached value, or None if there is no valid entry.
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.__stats["misses"] += 1
+                return None
+            value, expires = entry
+            if expires is not None and expires <= self.__clock():
+                del self.__entries[key]
+                self.__stats["expirations"] += 1
+                self.__stats["misses"] += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.__stats["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Stores an entry, evicting the least recently used entry if the cache is full.
+        Args:
+            key: The key of the entry.
+            value: The value, must not be None.
+        """
+        if self.max_size == 0:
+            return
+        expires = None if self.ttl is None else self.__clock() + self.ttl
+        with self.__lock:
+            self.__entries[key] = (value, expires)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+                self.__stats["evictions"] += 1
+
+    def invalidate(self, keys):
+        """
+        Removes the entries of the given keys.
+        Args:
+            keys (iterable): The keys of the entries.
+        """
+        with self.__lock:
+            for key in keys:
+                if self.__entries.pop(key, None) is not None:
+                    self.__stats["invalidations"] += 1
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        with self.__lock:
+            self.__stats["invalidations"] += len(self.__entries)
+            self.__entries.clear()
+
+    def stats(self):
+        """
+        Returns the runtime statistics of the cache.
+        Returns:
+            dict: Size limit, time to live, number of entries, hits, misses, evicted, expired and invalidated
+                entries and the hit ratio.
+        """
+        with self.__lock:
+            lookups = self.__stats["hits"] + self.__stats["misses"]
+            return {"max_size": self.max_size, "ttl": self.ttl, "size": len(self.__entries), **self.__stats,
+                    "hit_ratio": round(self.__stats["hits"] / lookups, 3) if lookups else 0.0}
@@ -0,0 +1,45 @@
+import unittest
+from Code.tcp_ip.commands import CommandRegistry, READ_ACCESS, WRITE_ACCESS
+
+
+class TestCommandRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = CommandRegistry()
+
+    def test_dispatch(self):
+        self.registry.register("echo", lambda request_data: request_data["request"], READ_ACCESS)
+        self.assertIn("echo", self.registry)
+        self.assertEqual(self.registry.dispatch("echo", {"request": "hello"}), "hello")
+        self.assertEqual(self.registry.access("echo"), READ_ACCESS)
+
+    def test_unknown_command(self):
+        self.assertIsNone(self.registry.access("unknown"))
+        with self.assertRaises(KeyError):
+            self.registry.dispatch("unknown", {})
+
+    def test_invalid_access(self):
+        with self.assertRaises(ValueError):
+            self.registry.register("echo", print, "exclusive")
+
+    def test_stats(self):
+        def failing(request_data):
+            raise RuntimeError("failed")
+
+        self.registry.register("save", lambda request_data: None, WRITE_ACCESS)
+        self.registry.register("failing", failing)
+        for _ in range(3):
+            self.registry.dispatch("save", {})
+        with self.assertRaises(RuntimeError):
+            self.registry.dispatch("failing", {})
+
+        stats = self.registry.stats()
+        self.assertEqual(stats["save"]["calls"], 3)
+        self.assertEqual(stats["save"]["errors"], 0)
+        self.assertEqual(stats["save"]["access"], WRITE_ACCESS)
+        self.assertEqual(stats["failing"]["errors"], 1)
+        self.assertGreaterEqual(stats["save"]["max_ms"], stats["save"]["p50_ms"])
+
+
+if __name__ == '__main__':
+    unittest.main()
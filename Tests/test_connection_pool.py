@@ -0,0 +1,76 @@
+import sqlite3
+import threading
+import unittest
+from Code.database.connection_pool import ConnectionPool, PoolTimeoutError
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.opened = []
+
+        def connect():
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+            self.opened.append(conn)
+            return conn
+
+        self.pool = ConnectionPool(connect, size=2, timeout=0.1)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_connections_are_reused(self):
+        for _ in range(3):
+            with self.pool.connection() as conn:
+                conn.execute("SELECT 1")
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(self.pool.stats()["checkouts"], 3)
+
+    def test_nested_checkout_returns_same_connection(self):
+        with self.pool.connection() as outer:
+            with self.pool.connection() as inner:
+                self.assertIs(outer, inner)
+            self.assertEqual(self.pool.stats()["in_use"], 1)
+        self.assertEqual(self.pool.stats()["idle"], 1)
+
+    def test_threads_get_own_connections(self):
+        connections = []
+        barrier = threading.Barrier(2)
+
+        def check_out():
+            with self.pool.connection() as conn:
+                connections.append(conn)
+                barrier.wait(5)
+
+        threads = [threading.Thread(target=check_out) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIsNot(connections[0], connections[1])
+
+    def test_timeout_when_exhausted(self):
+        first = self.pool.acquire()
+        second = self.pool.acquire()
+        with self.assertRaises(PoolTimeoutError):
+            self.pool.acquire()
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire(), first)
+        self.pool.release(first)
+        self.pool.release(second)
+
+    def test_broken_connection_is_replaced(self):
+        self.pool.health_check_interval = 0
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        conn.close()
+
+        replacement = self.pool.acquire()
+        self.assertIsNot(replacement, conn)
+        self.assertEqual(self.pool.stats()["replaced"], 1)
+        self.assertEqual(self.pool.stats()["open"], 1)
+        self.pool.release(replacement)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,10 @@
 import unittest
 import sqlite3
+import tempfile
 from unittest.mock import patch, MagicMock
-from Code.database.database import DatabaseServices
+from Code.database.database import DatabaseServices, TAXPAYER_COLUMNS, select_list
+from Code.database.migrations import MigrationRunner
+from Code.utils.ttl_cache import TTLCache
 import os
 
 
@@ -36,11 +39,13 @@ class TestDatabaseServices(unittest.TestCase):
 
         # Instance creation
         db_services = DatabaseServices(db_file=os.path.join('database', 'test.db'), tms_logger=None)
-        # Assertions
+        # Assertions, the pooled connections are opened on first use
         mock_logger.assert_called_once_with('server')
-        mock_connect.assert_called_once_with('database\\test.db')
-        self.assertIsNotNone(db_services.conn)
-        self.assertIsNotNone(db_services.cursor)
+        mock_connect.assert_not_called()
+        self.assertFalse(hasattr(db_services, 'conn'))
+
+        db_services.execute_query('DELETE FROM personal_info')
+        mock_connect.assert_called_once()
 
     @patch('Code.utils.tms_logs.TMSLogger')
     @patch('sqlite3.connect')
@@ -105,10 +110,23 @@ class TestDatabaseServices(unittest.TestCase):
         mock_cursor.fetchall.return_value = [('result',)]
         result = db_services.execute_query('SELECT * FROM personal_info')
 
-        # Check the query execution and result
+        # Check the query execution and result, read queries are not committed
         mock_cursor.execute.assert_called_once_with('SELECT * FROM personal_info')
         self.assertEqual(result, [('result',)])
+        mock_conn.commit.assert_not_called()
+        mock_conn.execute.assert_called_once_with("PRAGMA query_only = ON")
+        self.assertIn("mode=ro", mock_connect.call_args.args[0])
+
+    @patch('sqlite3.connect')
+    def test_execute_write_query_commits(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_connect.return_value = mock_conn
+
+        db_services = DatabaseServices(db_file=os.path.join('database', 'test.db'), tms_logger=None)
+        db_services.execute_query('DELETE FROM personal_info')
+
         mock_conn.commit.assert_called_once()
+        mock_conn.execute.assert_not_called()
 
     @patch('sqlite3.connect')
     def test_execute_query_failure(self, mock_connect):
@@ -122,7 +140,7 @@ class TestDatabaseServices(unittest.TestCase):
         mock_cursor.execute.side_effect = sqlite3.Error("Mocked SQL Error")
 
         db_services = DatabaseServices(db_file=os.path.join('database', 'test.db'), tms_logger=None)
-        result = db_services.execute_query('SELECT * FROM personal_info')
+        result = db_services.execute_query('DELETE FROM personal_info')
 
         # Assert rollback was called
         mock_conn.rollback.assert_called_once()
@@ -142,11 +160,26 @@ class TestDatabaseServices(unittest.TestCase):
 
         # Assert: Check if the query and parameters are correct and if the result is as expected
         mock_execute_query.assert_called_once_with(
-            "SELECT * FROM personal_info WHERE national_id = ? OR first_name = ? OR last_name = ? OR date_of_birth = ?",
+            "SELECT personal_info.national_id, personal_info.first_name, personal_info.last_name, "
+            "personal_info.date_of_birth, personal_info.gender FROM personal_info "
+            "WHERE national_id = ? OR first_name = ? OR last_name = ? OR date_of_birth = ?",
             (12345, 'John', 'Doe', '1990-01-01')
         )
         self.assertEqual(result, [('12345', 'John', 'Doe', '1990-01-01')])
 
+    @patch.object(DatabaseServices, 'execute_query')
+    def test_search_personal_info_page(self, mock_execute_query):
+        db_services = DatabaseServices(db_file='test.db', tms_logger=None)
+        db_services.search_personal_info(None, 'John', None, None, limit=51, after_national_id=12345,
+                                         columns=('national_id', 'first_name'))
+
+        mock_execute_query.assert_called_once_with(
+            "SELECT personal_info.national_id, personal_info.first_name FROM personal_info "
+            "WHERE (national_id = ? OR first_name = ? OR last_name = ? OR "
+            "date_of_birth = ?) AND national_id > ? ORDER BY national_id LIMIT ?",
+            (None, 'John', None, None, 12345, 51)
+        )
+
     @patch.object(DatabaseServices, 'execute_query')
     def test_retrieve_user_details(self, mock_execute_query):
         # Arrange: Prepare mock return data
@@ -160,8 +193,8 @@ class TestDatabaseServices(unittest.TestCase):
 
         # Assert: Check that the correct query is executed
         mock_execute_query.assert_called_once_with(
-            """
-            SELECT * 
+            f"""
+            SELECT {select_list(TAXPAYER_COLUMNS)}
             FROM personal_info 
             JOIN contact_info ON personal_info.national_id = contact_info.national_id 
             JOIN tax_info ON personal_info.national_id = tax_info.national_id 
@@ -186,7 +219,8 @@ class TestDatabaseServices(unittest.TestCase):
 
         # Assert: Check if the query was built correctly
         mock_execute_query.assert_called_once_with(
-            "SELECT * "
+            "SELECT personal_info.national_id, personal_info.first_name, personal_info.last_name, "
+            "personal_info.date_of_birth, personal_info.gender "
             "FROM personal_info "
             "WHERE 1=1 AND national_id = ? AND first_name = ? AND last_name = ?",
             [12345, 'John', 'Doe']
@@ -230,5 +264,229 @@ class TestDatabaseServices(unittest.TestCase):
             self.assertTrue(found, f"Expected call not found: {expected_query} with params {expected_params}")
 
 
+class TestDatabaseTransaction(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.temp_dir.name, 'transaction.db')
+        with sqlite3.connect(self.db_file) as conn:
+            conn.execute("CREATE TABLE personal_info (national_id INTEGER PRIMARY KEY, first_name TEXT)")
+        self.db_services = DatabaseServices(db_file=self.db_file, tms_logger=MagicMock())
+
+    def tearDown(self):
+        self.db_services.close()
+        self.temp_dir.cleanup()
+
+    def count_rows(self):
+        return self.db_services.execute_query("SELECT COUNT(*) FROM personal_info")[0][0]
+
+    def test_commit(self):
+        with self.db_services.transaction():
+            self.db_services.execute_query("INSERT INTO personal_info VALUES (?, ?)", (1, 'Ben'))
+            self.db_services.execute_query("INSERT INTO personal_info VALUES (?, ?)", (2, 'Andrea'))
+        self.assertEqual(self.count_rows(), 2)
+
+    def test_rollback_on_error(self):
+        with self.assertRaises(sqlite3.IntegrityError):
+            with self.db_services.transaction():
+                self.db_services.execute_query("INSERT INTO personal_info VALUES (?, ?)", (1, 'Ben'))
+                self.db_services.execute_query("INSERT INTO personal_info VALUES (?, ?)", (1, 'Ben'))
+        self.assertEqual(self.count_rows(), 0)
+
+    def test_iter_query_yields_chunks(self):
+        with self.db_services.transaction():
+            for national_id in range(5):
+                self.db_services.execute_query("INSERT INTO personal_info VALUES (?, ?)", (national_id, 'Ben'))
+        chunks = list(self.db_services.iter_query("SELECT national_id FROM personal_info ORDER BY national_id",
+                                                  chunk_size=2))
+        self.assertEqual(chunks, [[(0,), (1,)], [(2,), (3,)], [(4,)]])
+
+    def test_read_query_runs_on_read_only_connection(self):
+        self.db_services.execute_query("INSERT INTO personal_info VALUES (?, ?)", (1, 'Ben'))
+        self.assertEqual(self.db_services.execute_query("SELECT first_name FROM personal_info"), [('Ben',)])
+        self.assertEqual(self.db_services.pool_stats()["read"]["open"], 1)
+        self.assertEqual(self.db_services.pool_stats()["write"]["open"], 1)
+
+    def test_nested_transaction_rolls_back_to_savepoint(self):
+        with self.db_services.transaction():
+            self.db_services.execute_query("INSERT INTO personal_info VALUES (?, ?)", (1, 'Ben'))
+            with self.assertRaises(sqlite3.IntegrityError):
+                with self.db_services.transaction():
+                    self.db_services.execute_query("INSERT INTO personal_info VALUES (?, ?)", (2, 'Andrea'))
+                    self.db_services.execute_query("INSERT INTO personal_info VALUES (?, ?)", (1, 'Ben'))
+        self.assertEqual(self.db_services.execute_query("SELECT national_id FROM personal_info"), [(1,)])
+
+
+class TestSaveUsers(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.temp_dir.name, 'save.db')
+        sql_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Code', 'database')
+        with sqlite3.connect(self.db_file) as conn:
+            for seed_file in ('personal_info.sql', 'contact_info.sql', 'tax_info.sql'):
+                with open(os.path.join(sql_dir, seed_file), 'r') as sql_file:
+                    conn.executescript(sql_file.read())
+        conn.close()
+        MigrationRunner(self.db_file, MagicMock()).run()
+        self.db_services = DatabaseServices(db_file=self.db_file, tms_logger=MagicMock())
+
+    def tearDown(self):
+        self.db_services.close()
+        self.temp_dir.cleanup()
+
+    def count_rows(self, table):
+        return self.db_services.execute_query(f"SELECT COUNT(*) FROM {table}")[0][0]
+
+    @staticmethod
+    def build_record(national_id):
+        return {"national_id": national_id, "first_name": "Ben", "last_name": "Kowalsky",
+                "date_of_birth": "2001-11-21", "gender": "male", "address_country": "Poland", "phone_number": 123,
+                "marital_status": "single", "yearly_income": 50000}
+
+    def test_save_to_sql_is_atomic(self):
+        # The contact_info insert fails, so the personal_info row must not be saved either
+        self.db_services.execute_query("INSERT INTO contact_info (national_id) VALUES (?)", (1000,))
+        saved = self.db_services.save_to_sql(1000, 'Ben', 'Kowalsky', '2001-11-21', 'male', 'Poland', '00-001',
+                                             'Warsaw', 'Main', 1, '+48', 123, 'single')
+        self.assertFalse(saved)
+        self.assertEqual(self.db_services.execute_query("SELECT * FROM personal_info WHERE national_id = 1000"), [])
+
+        saved = self.db_services.save_to_sql(1001, 'Ben', 'Kowalsky', '2001-11-21', 'male', 'Poland', '00-001',
+                                             'Warsaw', 'Main', 1, '+48', 123, 'single')
+        self.assertTrue(saved)
+
+    def test_save_notifies_write_listeners(self):
+        saved_ids = []
+        self.db_services.add_write_listener(saved_ids.extend)
+        self.db_services.save_to_sql(1000, 'Ben', 'Kowalsky', '2001-11-21', 'male', 'Poland', '00-001', 'Warsaw', 'Main',
+                                     1, '+48', 123, 'single')
+        self.db_services.save_many_to_sql(self.build_record(national_id) for national_id in (1001, 1002))
+        self.assertEqual(saved_ids, [1000, 1001, 1002])
+
+    def test_save_many_to_sql(self):
+        personal_rows = self.count_rows("personal_info")
+        progress = []
+        records = (self.build_record(national_id) for national_id in range(1000, 3500))
+
+        saved = self.db_services.save_many_to_sql(records, chunk_size=1000, chunk_callback=progress.append)
+
+        self.assertEqual(saved, 2500)
+        self.assertEqual(progress, [1000, 2000, 2500])
+        for table in ("personal_info", "contact_info", "tax_info"):
+            self.assertEqual(self.count_rows(table), personal_rows + 2500)
+        self.assertEqual(self.db_services.execute_query(
+            "SELECT yearly_income, tax_rate FROM tax_info WHERE national_id = 3499"), [(50000, None)])
+
+    def test_save_many_to_sql_keeps_committed_chunks(self):
+        personal_rows = self.count_rows("personal_info")
+        records = [self.build_record(national_id) for national_id in (1000, 1001, 1002, 1000)]
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db_services.save_many_to_sql(records, chunk_size=2)
+
+        self.assertEqual(self.count_rows("personal_info"), personal_rows + 2)
+        self.assertEqual(self.count_rows("contact_info"), personal_rows + 2)
+
+    def test_named_column_projections(self):
+        self.db_services.save_to_sql(1000, 'Ben', 'Kowalsky', '2001-11-21', 'male', 'Poland', '00-001', 'Warsaw', 'Main',
+                                     1, '+48', 123, 'single')
+
+        self.assertEqual(self.db_services.retrieve_user_details(1000, ("national_id", "address_city", "marital_status")),
+                         [(1000, 'Warsaw', 'single')])
+        self.assertEqual(self.db_services.search_personal_info_fuzzy(None, "Kowalski", columns=("gender",))[0],
+                         ('male', 1))
+        with self.assertRaises(ValueError):
+            self.db_services.search_personal_info(1000, None, None, None, columns=("password",))
+
+    def test_fuzzy_candidates_are_truncated_closest_first(self):
+        # The exact match has the highest national ID
+        for national_id, last_name in ((1001, 'Kowalskie'), (1002, 'Kovalsky'), (1003, 'Kowalski')):
+            self.db_services.save_to_sql(national_id, 'Ben', last_name, '2001-11-21', 'male', 'Poland', '00-001',
+                                         'Warsaw', 'Main', 1, '+48', 123, 'single')
+
+        all_results = self.db_services.search_personal_info_fuzzy(None, "Kowalski", columns=("national_id",))
+        self.assertFalse(self.db_services.fuzzy_search_truncated(None, "Kowalski"))
+        with patch('Code.database.database.MAX_FUZZY_CANDIDATES', 2):
+            results = self.db_services.search_personal_info_fuzzy(None, "Kowalski", columns=("national_id",))
+            self.assertTrue(self.db_services.fuzzy_search_truncated(None, "Kowalski"))
+
+        self.assertGreater(len(all_results), 3)
+        # The exact match and the lowest national ID of the names as long as the searched one are kept
+        self.assertEqual(results, [(1003, 0), (2, 1)])
+        self.db_services.tms_logger.log_info.assert_called_once()
+
+
+class TestSearchCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.temp_dir.name, 'search_cache.db')
+        sql_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Code', 'database')
+        with sqlite3.connect(self.db_file) as conn:
+            with open(os.path.join(sql_dir, 'personal_info.sql'), 'r') as sql_file:
+                conn.executescript(sql_file.read())
+        conn.close()
+        self.db_services = DatabaseServices(db_file=self.db_file, tms_logger=MagicMock(),
+                                            search_cache=TTLCache(max_size=16, ttl=None))
+
+    def tearDown(self):
+        self.db_services.close()
+        self.temp_dir.cleanup()
+
+    def test_repeated_search_is_cached(self):
+        first = self.db_services.search_personal_info(None, 'Ben', None, None)
+        second = self.db_services.search_personal_info(None, 'Ben', None, None)
+
+        self.assertEqual(first, second)
+        self.assertEqual(sorted(user[0] for user in first), [2, 4])
+        self.assertEqual(self.db_services.search_cache_stats()["hits"], 1)
+        # A national ID sent as text is the same search
+        self.db_services.search_user(national_id='2')
+        self.db_services.search_user(national_id=2)
+        self.assertEqual(self.db_services.search_cache_stats()["hits"], 2)
+
+    def test_write_invalidates_cached_results(self):
+        self.db_services.search_personal_info(None, 'Ben', None, None)
+        data_version = self.db_services.search_cache_stats()["data_version"]
+
+        self.db_services.execute_query("INSERT INTO personal_info VALUES (?, ?, ?, ?, ?)",
+                                       (100, 'Ben', 'Hansen', '1980-01-01', 'male'))
+
+        self.assertNotEqual(self.db_services.search_cache_stats()["data_version"], data_version)
+        results = self.db_services.search_personal_info(None, 'Ben', None, None)
+        self.assertEqual(sorted(user[0] for user in results), [2, 4, 100])
+
+    def test_write_of_other_process_invalidates_cached_results(self):
+        self.db_services.search_personal_info(None, 'Ben', None, None)
+
+        # A connection of its own, as another server process would write
+        with sqlite3.connect(self.db_file) as conn:
+            conn.execute("INSERT INTO personal_info VALUES (?, ?, ?, ?, ?)", (101, 'Ben', 'Berg', '1980-01-01', 'male'))
+        conn.close()
+
+        results = self.db_services.search_personal_info(None, 'Ben', None, None)
+        self.assertEqual(sorted(user[0] for user in results), [2, 4, 101])
+        self.assertEqual(self.db_services.search_cache_stats()["hits"], 0)
+
+    def test_streamed_result_is_cached_when_complete(self):
+        chunks = self.db_services.iter_personal_info(None, 'Ben', None, None, chunk_size=1)
+        next(chunks)
+        chunks.close()
+        self.assertEqual(self.db_services.search_cache_stats()["size"], 0)
+
+        self.assertEqual(len(list(self.db_services.iter_personal_info(None, 'Ben', None, None, chunk_size=1))), 2)
+        cached_chunks = list(self.db_services.iter_personal_info(None, 'Ben', None, None, chunk_size=1))
+        self.assertEqual(len(cached_chunks), 2)
+        self.assertEqual(self.db_services.search_cache_stats()["hits"], 1)
+
+    def test_search_inside_transaction_is_not_cached(self):
+        with self.db_services.transaction():
+            self.db_services.execute_query("INSERT INTO personal_info VALUES (?, ?, ?, ?, ?)",
+                                           (100, 'Ben', 'Hansen', '1980-01-01', 'male'))
+            self.db_services.search_personal_info(None, 'Ben', None, None)
+        self.assertEqual(self.db_services.search_cache_stats()["size"], 0)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,46 @@
+import queue
+import socket
+import unittest
+from unittest.mock import MagicMock
+from Code.tcp_ip.idle_poller import IdleConnectionPoller
+
+
+class TestIdleConnectionPoller(unittest.TestCase):
+
+    def setUp(self):
+        self.ready = queue.Queue()
+        self.poller = IdleConnectionPoller(lambda *args: self.ready.put(args), idle_timeout=0.2,
+                                           server_logger=MagicMock())
+        self.poller.start()
+        self.server_side, self.client_side = socket.socketpair()
+
+    def tearDown(self):
+        self.poller.stop()
+        self.server_side.close()
+        self.client_side.close()
+
+    def test_readable_connection_is_resumed_with_its_state(self):
+        self.poller.park(self.server_side, "connection", "reader")
+        self.client_side.sendall(b"request")
+
+        self.assertEqual(self.ready.get(timeout=5), (self.server_side, "connection", "reader"))
+        stats = self.poller.stats()
+        self.assertEqual((stats["parked"], stats["resumed"], stats["expired"], stats["idle_connections"]),
+                         (1, 1, 0, 0))
+
+    def test_idle_connection_is_closed(self):
+        self.poller.park(self.server_side, "connection", "reader")
+
+        self.client_side.settimeout(5)
+        # The poller closes its end once the idle timeout has passed
+        self.assertEqual(self.client_side.recv(1024), b'')
+        self.assertTrue(self.ready.empty())
+        self.assertEqual(self.poller.stats()["expired"], 1)
+
+    def test_invalid_timeout(self):
+        with self.assertRaises(ValueError):
+            IdleConnectionPoller(print, idle_timeout=0, server_logger=MagicMock())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from Code.database.migrations import Migration, MigrationRunner, MIGRATIONS
+from Code.database.database import DatabaseServices
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Code', 'database')
+
+
+class TestMigrationRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.temp_dir.name, 'migrations.db')
+        conn = sqlite3.connect(self.db_file)
+        for seed_file in ('personal_info.sql', 'contact_info.sql', 'tax_info.sql'):
+            with open(os.path.join(SQL_DIR, seed_file), 'r') as sql_file:
+                conn.executescript(sql_file.read())
+        conn.close()
+        self.runner = MigrationRunner(self.db_file, MagicMock())
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def query(self, query):
+        conn = sqlite3.connect(self.db_file)
+        try:
+            return conn.execute(query).fetchall()
+        finally:
+            conn.close()
+
+    def test_applies_pending_migrations_once(self):
+        tax_rows = self.query("SELECT * FROM tax_info ORDER BY national_id")
+
+        self.assertEqual(self.runner.run(), [migration.version for migration in MIGRATIONS])
+        self.assertEqual(self.runner.current_version(), self.runner.latest_version)
+        self.assertEqual(self.runner.run(), [])
+
+        self.assertEqual(self.query("SELECT * FROM tax_info ORDER BY national_id"), tax_rows)
+        primary_key = [column[1] for column in self.query("PRAGMA table_info(tax_info)") if column[5]]
+        self.assertEqual(primary_key, ["national_id"])
+
+    def test_search_uses_indexes(self):
+        conn = sqlite3.connect(self.db_file)
+        with conn:
+            conn.executemany("INSERT INTO personal_info VALUES (?, ?, ?, ?, ?)",
+                             ((national_id, f"First{national_id}", f"Last{national_id}",
+                               f"19{national_id % 100:02}-01-01", "male") for national_id in range(100, 5100)))
+        conn.close()
+        self.runner.run()
+        plan = " ".join(row[3] for row in self.query(
+            "EXPLAIN QUERY PLAN SELECT * FROM personal_info WHERE national_id = 1 OR first_name = 'Ben' "
+            "OR last_name = 'Kowalsky' OR date_of_birth = '2001-11-21'"))
+        self.assertNotIn("SCAN personal_info", plan)
+        self.assertIn("idx_personal_info_date_of_birth", plan)
+
+    def test_prefix_search_follows_changes(self):
+        self.runner.run()
+        db_services = DatabaseServices(db_file=self.db_file, tms_logger=MagicMock())
+        try:
+            db_services.execute_query("INSERT INTO personal_info VALUES (?, ?, ?, ?, ?)",
+                                      (100, 'Bengt', 'Åkesson', '1970-01-01', 'male'))
+            db_services.execute_query("UPDATE personal_info SET last_name = ? WHERE national_id = ?", ('Myhre', 8))
+            db_services.execute_query("DELETE FROM personal_info WHERE national_id = ?", (4,))
+
+            results = db_services.search_personal_info_by_prefix("be", None)
+            self.assertEqual(sorted(user[0] for user in results), [2, 100])
+            results = db_services.search_personal_info_by_prefix(None, "ake")
+            self.assertEqual([user[0] for user in results], [100])
+            results = db_services.search_personal_info_by_prefix(None, 'MYH"*')
+            self.assertEqual(sorted(user[0] for user in results), [1, 8, 9])
+            self.assertEqual(db_services.search_personal_info_by_prefix("*", None), [])
+
+            first_page = db_services.search_personal_info_by_prefix(None, "myh", limit=2)
+            second_page = db_services.search_personal_info_by_prefix(None, "myh", limit=2,
+                                                                     after_national_id=first_page[-1][0],
+                                                                     after_rank=first_page[-1][-1])
+            self.assertEqual(sorted(user[0] for user in first_page + second_page), [1, 8, 9])
+        finally:
+            db_services.close()
+
+    def test_fuzzy_search_finds_similar_names(self):
+        self.runner.run()
+        db_services = DatabaseServices(db_file=self.db_file, tms_logger=MagicMock())
+        try:
+            db_services.save_to_sql(100, 'Søren', 'Kowalski', '1970-01-01', 'male', 'Denmark', '1000', 'Copenhagen',
+                                    'Main', 1, '+45', 123456789, 'single')
+
+            results = db_services.search_personal_info_fuzzy(None, "Kowalski")
+            self.assertEqual([(user[0], user[-1]) for user in results], [(100, 0), (2, 1)])
+            results = db_services.search_personal_info_fuzzy("Brunhild", "Myhr")
+            self.assertEqual([user[0] for user in results], [9])
+            results = db_services.search_personal_info_fuzzy("Soren", None)
+            self.assertEqual([user[0] for user in results], [100])
+            self.assertEqual(db_services.search_personal_info_fuzzy("Kristoffer", None), [])
+
+            second_page = db_services.search_personal_info_fuzzy(None, "Kowalski", limit=1, after_national_id=100,
+                                                                 after_rank=0)
+            self.assertEqual([user[0] for user in second_page], [2])
+
+            db_services.execute_query("UPDATE personal_info SET last_name = ? WHERE national_id = ?", ('Kovacs', 2))
+            self.assertEqual([user[0] for user in db_services.search_personal_info_fuzzy(None, "Kovacz")], [])
+            db_services.index_names([(2, 'Ben', 'Kovacs')])
+            self.assertEqual([user[0] for user in db_services.search_personal_info_fuzzy(None, "Kovacz")], [2])
+        finally:
+            db_services.close()
+
+    def test_failed_migration_is_rolled_back(self):
+        runner = MigrationRunner(self.db_file, MagicMock(), [
+            Migration(1, "Create table", ["CREATE TABLE audit_log (entry TEXT)"]),
+            Migration(2, "Broken", ["CREATE TABLE broken (entry TEXT)", "INSERT INTO missing_table VALUES (1)"]),
+        ])
+        with self.assertRaises(sqlite3.OperationalError):
+            runner.run()
+        self.assertEqual(runner.current_version(), 1)
+        self.assertEqual(self.query("SELECT name FROM sqlite_master WHERE name = 'broken'"), [])
+
+    def test_versions_must_be_consecutive(self):
+        with self.assertRaises(ValueError):
+            MigrationRunner(self.db_file, MagicMock(), [Migration(2, "Gap", [])])
+
+
+if __name__ == '__main__':
+    unittest.main()
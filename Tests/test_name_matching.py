@@ -0,0 +1,29 @@
+import unittest
+from Code.utils.name_matching import fold_name, phonetic_key, name_keys, edit_distance
+
+
+class TestNameMatching(unittest.TestCase):
+
+    def test_fold_name(self):
+        self.assertEqual(fold_name("Åse  Sørensen-Løvaas"), "ase sorensen lovaas")
+        self.assertEqual(fold_name(None), "")
+
+    def test_similar_names_share_phonetic_key(self):
+        for names in (("Kowalsky", "Kowalski", "Kovalski"), ("Brunghild", "Brunhild"), ("Christina", "Kristina"),
+                      ("Thor", "Tor"), ("Myhr", "Mir"), ("Sørensen", "Sorensen")):
+            self.assertEqual(len({phonetic_key(fold_name(name)) for name in names}), 1, names)
+        self.assertNotEqual(phonetic_key("romanov"), phonetic_key("novikova"))
+        self.assertEqual(phonetic_key("123"), "")
+
+    def test_name_keys(self):
+        self.assertEqual(name_keys("Ben", "Kowalsky"), {"f:PN", "l:KFLS"})
+        self.assertEqual(name_keys("Anna Maria", None), {"f:AN", "f:MR"})
+
+    def test_edit_distance(self):
+        self.assertEqual(edit_distance("kitten", "sitting"), 3)
+        self.assertEqual(edit_distance("", "ben"), 3)
+        self.assertEqual(edit_distance("kowalsky", "kowalski"), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
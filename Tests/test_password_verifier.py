@@ -0,0 +1,52 @@
+import threading
+import unittest
+from unittest.mock import patch
+import bcrypt
+from Code.utils import password_verifier
+from Code.utils.password_verifier import PasswordVerifier, VerifierBusyError
+
+PASSWORD_HASH = bcrypt.hashpw(b"pw", bcrypt.gensalt(4)).decode()
+
+
+class TestPasswordVerifier(unittest.TestCase):
+
+    def setUp(self):
+        self.verifier = PasswordVerifier(max_workers=1, max_pending=0)
+
+    def tearDown(self):
+        self.verifier.shutdown()
+
+    def test_verify(self):
+        self.assertTrue(self.verifier.verify("pw", PASSWORD_HASH))
+        self.assertFalse(self.verifier.verify("wrong", PASSWORD_HASH))
+
+        stats = self.verifier.stats()
+        self.assertEqual((stats["completed"], stats["queue_depth"], stats["active"]), (2, 0, 0))
+        self.assertGreater(stats["verify_p95_ms"], 0)
+
+    def test_rejects_when_full(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_checkpw(password, hashed_password):
+            started.set()
+            release.wait(5)
+            return True
+
+        with patch.object(password_verifier.bcrypt, 'checkpw', side_effect=slow_checkpw):
+            running = threading.Thread(target=self.verifier.verify, args=("pw", PASSWORD_HASH))
+            running.start()
+            started.wait(5)
+
+            with self.assertRaises(VerifierBusyError):
+                self.verifier.verify("pw", PASSWORD_HASH)
+            release.set()
+            running.join()
+
+        self.assertTrue(self.verifier.verify("pw", PASSWORD_HASH))
+        stats = self.verifier.stats()
+        self.assertEqual((stats["rejected"], stats["completed"], stats["max_queue_depth"]), (1, 2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
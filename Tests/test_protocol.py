@@ -0,0 +1,61 @@
+import socket
+import threading
+import unittest
+from Code.tcp_ip.protocol import FrameReader, FrameTooLargeError, encode_frame
+
+
+class TestFrameReader(unittest.TestCase):
+
+    def setUp(self):
+        self.server_side, self.client_side = socket.socketpair()
+
+    def tearDown(self):
+        self.server_side.close()
+        self.client_side.close()
+
+    def send_in_chunks(self, data, chunk_size):
+        def sender():
+            for index in range(0, len(data), chunk_size):
+                self.client_side.sendall(data[index:index + chunk_size])
+            self.client_side.shutdown(socket.SHUT_WR)
+
+        sender_thread = threading.Thread(target=sender)
+        sender_thread.start()
+        return sender_thread
+
+    def test_frames_larger_than_buffer(self):
+        payloads = [b'a' * 10, b'b' * 5000, b'', b'c' * 300]
+        sender_thread = self.send_in_chunks(b''.join(encode_frame(payload) for payload in payloads), 7)
+        reader = FrameReader(self.server_side, buffer_size=16)
+
+        received = [reader.read_frame() for _ in payloads]
+        sender_thread.join()
+
+        self.assertEqual(received, payloads)
+        self.assertIsNone(reader.read_frame())
+
+    def test_delimiter_split_between_chunks(self):
+        sender_thread = self.send_in_chunks(b'{"first": 1}\r\n{"second": 2}\r\npartial', 3)
+        reader = FrameReader(self.server_side, buffer_size=8)
+
+        messages = [reader.read_until(b'\r\n') for _ in range(4)]
+        sender_thread.join()
+
+        self.assertEqual(messages, [b'{"first": 1}\r\n', b'{"second": 2}\r\n', b'partial', b''])
+
+    def test_frame_too_large(self):
+        self.client_side.sendall(encode_frame(b'x' * 100))
+        reader = FrameReader(self.server_side, max_frame_size=50)
+        with self.assertRaises(FrameTooLargeError):
+            reader.read_frame()
+
+    def test_connection_closed_in_frame(self):
+        self.client_side.sendall(encode_frame(b'x' * 100)[:20])
+        self.client_side.shutdown(socket.SHUT_WR)
+        reader = FrameReader(self.server_side)
+        with self.assertRaises(ConnectionError):
+            reader.read_frame()
+
+
+if __name__ == '__main__':
+    unittest.main()
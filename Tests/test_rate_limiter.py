@@ -0,0 +1,47 @@
+import unittest
+from Code.utils.rate_limiter import RateLimiter
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = RateLimiter(rate=0.5, burst=2, max_buckets=2, clock=self.clock)
+
+    def test_limits_after_burst(self):
+        self.assertEqual(self.limiter.acquire("10.0.0.1"), 0)
+        self.assertEqual(self.limiter.acquire("10.0.0.1"), 0)
+        self.assertAlmostEqual(self.limiter.acquire("10.0.0.1"), 2.0)
+        self.assertEqual(self.limiter.acquire("10.0.0.2"), 0)
+
+        self.clock.now += 2
+        self.assertEqual(self.limiter.acquire("10.0.0.1"), 0)
+        self.assertEqual(self.limiter.stats()["limited"], 1)
+
+    def test_refilled_buckets_expire(self):
+        self.limiter.acquire("10.0.0.1")
+        self.clock.now += 4
+        self.limiter.acquire("10.0.0.2")
+
+        stats = self.limiter.stats()
+        self.assertEqual((stats["buckets"], stats["expired"]), (1, 1))
+
+    def test_bucket_count_is_bounded(self):
+        for key in ("10.0.0.1", "10.0.0.2", "10.0.0.3"):
+            self.limiter.acquire(key)
+
+        stats = self.limiter.stats()
+        self.assertEqual((stats["buckets"], stats["evicted"]), (2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from Code.utils.taxpayer_columns import TAXPAYER_COLUMNS
+from Code.utils.records import PersonalInfo, ContactInfo, TaxInfo, Taxpayer
+
+TAXPAYER_ROW = (2, 'Ben', 'Kowalsky', '2001-11-21', 'male', 'Sweden', '11122', 'Stockholm', 'Main', 12, '+46',
+                123456789, 'single', 30, 50000, None, 0, 0, 0, 0)
+
+
+class TestRecords(unittest.TestCase):
+
+    def test_row_conversion(self):
+        taxpayer = Taxpayer.from_row(TAXPAYER_ROW)
+
+        self.assertEqual(taxpayer.address_city, 'Stockholm')
+        self.assertEqual(taxpayer.to_row(), TAXPAYER_ROW)
+        self.assertEqual(Taxpayer._fields, TAXPAYER_COLUMNS)
+        self.assertFalse(hasattr(taxpayer, '__dict__'))
+
+    def test_ranked_row_ignores_rank(self):
+        self.assertEqual(PersonalInfo.from_row((2, 'Ben', 'Kowalsky', '2001-11-21', 'male', -1.5)).to_row(),
+                         (2, 'Ben', 'Kowalsky', '2001-11-21', 'male'))
+
+    def test_wire_conversion(self):
+        taxpayer = Taxpayer.from_row(TAXPAYER_ROW)
+        wire = taxpayer.to_wire()
+
+        self.assertEqual(wire["yearly_income"], 50000)
+        self.assertEqual(Taxpayer.from_wire(wire), taxpayer)
+        self.assertIsNone(Taxpayer.from_wire({"national_id": 2}).phone_number)
+
+    def test_table_records(self):
+        taxpayer = Taxpayer.from_row(TAXPAYER_ROW)
+
+        self.assertEqual(taxpayer.personal_info, PersonalInfo(2, 'Ben', 'Kowalsky', '2001-11-21', 'male'))
+        self.assertEqual(taxpayer.contact_info,
+                         ContactInfo(2, 'Sweden', '11122', 'Stockholm', 'Main', 12, '+46', 123456789))
+        self.assertEqual(taxpayer.tax_info, TaxInfo(2, 'single', 30, 50000, None, 0, 0, 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
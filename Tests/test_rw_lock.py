@@ -0,0 +1,80 @@
+import threading
+import time
+import unittest
+from Code.utils.rw_lock import ReadWriteLock
+
+
+class TestReadWriteLock(unittest.TestCase):
+
+    def setUp(self):
+        self.lock = ReadWriteLock()
+
+    def test_readers_share_the_lock(self):
+        both_inside = threading.Barrier(2, timeout=5)
+
+        def reader():
+            with self.lock.read_locked():
+                both_inside.wait()
+
+        readers = [threading.Thread(target=reader) for _ in range(2)]
+        for thread in readers:
+            thread.start()
+        for thread in readers:
+            thread.join()
+
+        self.assertEqual(self.lock.stats()["read"]["acquisitions"], 2)
+
+    def test_writer_is_exclusive(self):
+        events = []
+        self.lock.acquire_read()
+
+        def writer():
+            with self.lock.write_locked():
+                events.append("write")
+
+        writer_thread = threading.Thread(target=writer)
+        writer_thread.start()
+        time.sleep(0.05)
+        events.append("read released")
+        self.lock.release_read()
+        writer_thread.join(5)
+
+        self.assertEqual(events, ["read released", "write"])
+        stats = self.lock.stats()
+        self.assertEqual(stats["write"]["contended"], 1)
+        self.assertGreater(stats["write"]["wait_time_ms"], 0)
+
+    def test_waiting_writer_blocks_new_readers(self):
+        events = []
+        self.lock.acquire_read()
+
+        def writer():
+            with self.lock.write_locked():
+                events.append("write")
+
+        def reader():
+            with self.lock.read_locked():
+                events.append("read")
+
+        writer_thread = threading.Thread(target=writer)
+        writer_thread.start()
+        while self.lock.stats()["waiting_writers"] == 0:
+            time.sleep(0.001)
+        reader_thread = threading.Thread(target=reader)
+        reader_thread.start()
+        time.sleep(0.05)
+        self.lock.release_read()
+        writer_thread.join(5)
+        reader_thread.join(5)
+
+        self.assertEqual(events, ["write", "read"])
+
+    def test_release_without_acquire(self):
+        with self.assertRaises(RuntimeError):
+            self.lock.release_read()
+        with self.assertRaises(RuntimeError):
+            self.lock.release_write()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from Code.utils.session_tokens import SessionTokenStore
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSessionTokenStore(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.store = SessionTokenStore(secret=b"secret", ttl=60, sweep_interval=30, clock=self.clock)
+
+    def test_validate_issued_token(self):
+        token = self.store.issue("Guest")
+        self.assertEqual(self.store.validate(token), "Guest")
+        self.assertEqual(self.store.stats()["validated"], 1)
+
+    def test_expired_token_is_rejected_and_swept(self):
+        token = self.store.issue("Guest")
+        self.clock.now += 61
+
+        self.assertIsNone(self.store.validate(token))
+        self.assertEqual(self.store.stats()["sessions"], 0)
+        self.assertEqual(self.store.stats()["swept"], 1)
+
+    def test_forged_token_is_rejected(self):
+        token = self.store.issue("Guest")
+        payload, _ = token.rsplit(".", 1)
+
+        self.assertIsNone(self.store.validate(payload + ".forged"))
+        self.assertIsNone(self.store.validate("not a token"))
+        self.assertIsNone(self.store.validate(None))
+        self.assertEqual(self.store.stats()["rejected"], 3)
+
+    def test_token_of_other_process_is_accepted(self):
+        other_store = SessionTokenStore(secret=b"secret", ttl=60, clock=self.clock)
+        token = other_store.issue("Admin")
+
+        self.assertEqual(self.store.validate(token), "Admin")
+        self.assertEqual(self.store.stats()["sessions"], 1)
+        self.assertIsNone(SessionTokenStore(secret=b"other", clock=self.clock).validate(token))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from Code.database.database import DatabaseServices
+from Code.database.connection_pool import ConnectionPool
+from Code.database.storage_profile import StorageProfile, WalCheckpointer
+
+BALANCED_PROFILE = {"journal_mode": "wal", "synchronous": "normal", "mmap_size": 1048576, "cache_size": -2048,
+                    "temp_store": "memory"}
+
+
+class TestStorageProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.temp_dir.name, 'storage.db')
+        with sqlite3.connect(self.db_file) as conn:
+            conn.execute("CREATE TABLE personal_info (national_id INTEGER PRIMARY KEY, first_name TEXT)")
+        conn.close()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_from_config(self):
+        db_config = {"storage_profile": "balanced", "storage_profiles": {"balanced": BALANCED_PROFILE}}
+        profile = StorageProfile.from_config(db_config)
+        self.assertEqual(profile.name, "balanced")
+        self.assertTrue(profile.wal)
+        self.assertIsNone(StorageProfile.from_config({}))
+        with self.assertRaises(ValueError):
+            StorageProfile.from_config({"storage_profile": "missing"})
+
+    def test_rejects_invalid_settings(self):
+        with self.assertRaises(ValueError):
+            StorageProfile("unsafe", {"journal_mode": "wal; DROP TABLE personal_info"})
+        with self.assertRaises(ValueError):
+            StorageProfile("unknown", {"locking_mode": "exclusive"})
+
+    def test_applied_to_database(self):
+        profile = StorageProfile("balanced", BALANCED_PROFILE)
+        db_services = DatabaseServices(db_file=self.db_file, tms_logger=MagicMock(), storage_profile=profile,
+                                       wal_checkpoint_interval=3600)
+        try:
+            db_services.execute_query("INSERT INTO personal_info VALUES (?, ?)", (1, 'Ben'))
+            self.assertEqual(db_services.execute_query("SELECT first_name FROM personal_info"), [('Ben',)])
+
+            stats = db_services.storage_stats()
+            self.assertEqual(stats["profile"], "balanced")
+            self.assertEqual(stats["applied"], {"journal_mode": "wal", "synchronous": "normal", "mmap_size": 1048576,
+                                                "cache_size": -2048, "temp_store": "memory"})
+            self.assertEqual(stats["wal_checkpoints"]["checkpoints"], 0)
+        finally:
+            db_services.close()
+
+        with sqlite3.connect(self.db_file) as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        conn.close()
+
+    def test_wal_checkpoint(self):
+        profile = StorageProfile("balanced", BALANCED_PROFILE)
+
+        def connect():
+            conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            profile.apply(conn)
+            return conn
+
+        pool = ConnectionPool(connect, size=1)
+        checkpointer = WalCheckpointer(pool, interval=3600, mode="truncate")
+        try:
+            with pool.connection() as conn:
+                conn.execute("INSERT INTO personal_info VALUES (1, 'Ben')")
+                conn.commit()
+            busy, _, _ = checkpointer.checkpoint()
+            self.assertEqual(busy, 0)
+            self.assertEqual(checkpointer.stats()["checkpoints"], 1)
+            self.assertEqual(checkpointer.stats()["mode"], "TRUNCATE")
+        finally:
+            pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import sys
+import unittest
+from unittest.mock import MagicMock
+from Code.tcp_ip.supervisor import ProcessSupervisor
+
+
+def exit_with_error(code):
+    sys.exit(code)
+
+
+class TestProcessSupervisor(unittest.TestCase):
+
+    def test_restarts_exited_worker(self):
+        supervisor = ProcessSupervisor(exit_with_error, (3,), processes=1, server_logger=MagicMock(),
+                                       restart_delay=0, min_uptime=0)
+        supervisor.start()
+        try:
+            restarted = supervisor.monitor(timeout=30)
+        finally:
+            supervisor.stop()
+
+        self.assertEqual(restarted, [0])
+        self.assertEqual(supervisor.stats()["restarts"], 1)
+
+    def test_invalid_process_count(self):
+        with self.assertRaises(ValueError):
+            ProcessSupervisor(exit_with_error, (0,), processes=0, server_logger=MagicMock())
+
+
+if __name__ == '__main__':
+    unittest.main()
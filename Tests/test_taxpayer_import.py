@@ -0,0 +1,180 @@
+import os
+import csv
+import json
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from Code.database.database import DatabaseServices
+from Code.database.migrations import MigrationRunner
+from Code.database.taxpayer_import import TaxpayerImporter, TAXPAYER_COLUMNS, detect_format, main
+from Code.utils.taxpayer_validation import validate_taxpayer
+
+
+def build_record(national_id, **fields):
+    record = {"national_id": str(national_id), "first_name": "Ben", "last_name": "Kowalsky",
+              "date_of_birth": "2001-11-21", "gender": "male", "address_country": "Sweden",
+              "address_zip_code": "11122", "address_city": "Stockholm", "address_street": "Main",
+              "address_house_number": "12", "phone_country_code": "+46", "phone_number": "123456789",
+              "marital_status": "single"}
+    record.update(fields)
+    return record
+
+
+class TestValidateTaxpayer(unittest.TestCase):
+
+    def test_valid_taxpayer(self):
+        self.assertEqual(validate_taxpayer(build_record(1000)), [])
+
+    def test_missing_fields(self):
+        self.assertEqual(validate_taxpayer(build_record(1000, first_name="")), ["Please fill in all required fields."])
+        self.assertEqual(validate_taxpayer(build_record(1000, date_of_birth="1900-01-01")),
+                         ["Please fill in all required fields."])
+
+    def test_only_required_fields_are_checked(self):
+        # The New User window checks that the fields are filled in, not their format
+        self.assertEqual(validate_taxpayer(build_record(1000, address_country="Norway", phone_country_code="+47",
+                                                        phone_number="12345678")), [])
+        self.assertEqual(validate_taxpayer(build_record(1000, address_house_number="0")),
+                         ["Please fill in all required fields."])
+
+
+class TestTaxpayerImporter(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.temp_dir.name, 'import.db')
+        sql_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Code', 'database')
+        with sqlite3.connect(self.db_file) as conn:
+            for seed_file in ('personal_info.sql', 'contact_info.sql', 'tax_info.sql'):
+                with open(os.path.join(sql_dir, seed_file), 'r') as sql_file:
+                    conn.executescript(sql_file.read())
+        conn.close()
+        MigrationRunner(self.db_file, MagicMock()).run()
+        self.db_services = DatabaseServices(db_file=self.db_file, tms_logger=MagicMock())
+        self.personal_rows = self.count_rows("personal_info")
+
+    def tearDown(self):
+        self.db_services.close()
+        self.temp_dir.cleanup()
+
+    def count_rows(self, table):
+        return self.db_services.execute_query(f"SELECT COUNT(*) FROM {table}")[0][0]
+
+    def write_csv(self, records):
+        path = os.path.join(self.temp_dir.name, 'taxpayers.csv')
+        with open(path, 'w', newline='') as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=list(records[0]))
+            writer.writeheader()
+            writer.writerows(records)
+        return path
+
+    def write_jsonl(self, records):
+        path = os.path.join(self.temp_dir.name, 'taxpayers.jsonl')
+        with open(path, 'w') as jsonl_file:
+            for record in records:
+                jsonl_file.write(json.dumps(record) + "\n")
+        return path
+
+    def test_detect_format(self):
+        self.assertEqual(detect_format("taxpayers.CSV"), "csv")
+        self.assertEqual(detect_format("taxpayers.jsonl"), "jsonl")
+        with self.assertRaises(ValueError):
+            detect_format("taxpayers.xlsx")
+
+    def test_import_csv(self):
+        records = [build_record(national_id) for national_id in range(1000, 1250)]
+        records[10] = build_record(1010, phone_number="")
+        path = self.write_csv(records)
+        progress = []
+        importer = TaxpayerImporter(self.db_services, MagicMock(), batch_size=100, progress_callback=progress.append)
+
+        report = importer.run(path)
+
+        self.assertEqual((report["processed"], report["imported"], report["rejected"], report["batches"]),
+                         (250, 249, 1, 3))
+        self.assertEqual([batch["processed"] for batch in progress], [101, 201, 250])
+        self.assertEqual(self.count_rows("personal_info"), self.personal_rows + 249)
+        self.assertEqual(self.count_rows("tax_info"), self.count_rows("personal_info"))
+        self.assertFalse(os.path.exists(importer.checkpoint_path(path)))
+
+    def test_import_jsonl_uses_known_columns(self):
+        path = self.write_jsonl([build_record(1000, unknown_column="ignored", yearly_income=50000)])
+
+        report = TaxpayerImporter(self.db_services, MagicMock()).run(path)
+
+        self.assertEqual(report["imported"], 1)
+        self.assertIn("yearly_income", TAXPAYER_COLUMNS)
+        self.assertEqual(self.db_services.execute_query(
+            "SELECT yearly_income FROM tax_info WHERE national_id = 1000"), [(50000,)])
+
+    def test_resume_after_failed_batch(self):
+        records = [build_record(national_id) for national_id in range(1000, 1300)]
+        path = self.write_csv(records)
+        save_many_to_sql = self.db_services.save_many_to_sql
+        calls = []
+
+        def fail_third_batch(batch, **kwargs):
+            calls.append(len(batch))
+            if len(calls) == 3:
+                raise sqlite3.OperationalError("database is locked")
+            return save_many_to_sql(batch, **kwargs)
+
+        importer = TaxpayerImporter(self.db_services, MagicMock(), batch_size=100)
+        with patch.object(self.db_services, 'save_many_to_sql', side_effect=fail_third_batch):
+            with self.assertRaises(sqlite3.OperationalError):
+                importer.run(path)
+        self.assertEqual(self.count_rows("personal_info"), self.personal_rows + 200)
+        with open(importer.checkpoint_path(path), 'r') as checkpoint_file:
+            self.assertEqual(json.load(checkpoint_file)["processed"], 200)
+
+        report = importer.run(path)
+
+        self.assertEqual((report["resumed_at"], report["processed"], report["imported"]), (200, 300, 300))
+        self.assertEqual(self.count_rows("personal_info"), self.personal_rows + 300)
+
+    def test_conflicting_records_are_rejected(self):
+        records = [build_record(national_id) for national_id in range(1000, 1010)]
+        # Taken by a saved taxpayer, and twice in the same batch
+        records[3] = build_record(1)
+        records[7] = build_record(1002)
+        path = self.write_csv(records)
+
+        report = TaxpayerImporter(self.db_services, MagicMock(), batch_size=100).run(path)
+
+        self.assertEqual((report["processed"], report["imported"], report["rejected"]), (10, 8, 2))
+        self.assertEqual(self.count_rows("personal_info"), self.personal_rows + 8)
+        self.assertEqual(self.count_rows("tax_info"), self.count_rows("personal_info"))
+        self.assertFalse(os.path.exists(TaxpayerImporter.checkpoint_path(path)))
+
+    def test_malformed_lines_are_rejected(self):
+        path = os.path.join(self.temp_dir.name, 'taxpayers.jsonl')
+        with open(path, 'w') as jsonl_file:
+            jsonl_file.write(json.dumps(build_record(1000)) + "\n")
+            jsonl_file.write('{"national_id": "1001", "first_name": \n')
+            jsonl_file.write("[1, 2]\n")
+            jsonl_file.write(json.dumps(build_record(1002)) + "\n")
+        import_logger = MagicMock()
+
+        report = TaxpayerImporter(self.db_services, import_logger).run(path)
+
+        self.assertEqual((report["processed"], report["imported"], report["rejected"]), (4, 2, 2))
+        self.assertIn("not valid JSON", import_logger.log_error.call_args_list[0].args[0])
+
+    def test_command_line_import_migrates_database(self):
+        unmigrated_file = os.path.join(self.temp_dir.name, 'unmigrated.db')
+        sql_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Code', 'database')
+        with sqlite3.connect(unmigrated_file) as conn:
+            for seed_file in ('personal_info.sql', 'contact_info.sql', 'tax_info.sql'):
+                with open(os.path.join(sql_dir, seed_file), 'r') as sql_file:
+                    conn.executescript(sql_file.read())
+        conn.close()
+        path = self.write_csv([build_record(national_id) for national_id in (1000, 1001)])
+
+        with patch('Code.utils.tms_logs.TMSLogger'), patch.dict(os.environ), patch('builtins.print'):
+            self.assertEqual(main([path, "--db", unmigrated_file]), 0)
+
+        with sqlite3.connect(unmigrated_file) as conn:
+            saved = conn.execute("SELECT COUNT(*) FROM personal_info_name_keys WHERE national_id >= 1000").fetchone()
+        conn.close()
+        self.assertGreater(saved[0], 0)
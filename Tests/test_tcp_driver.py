@@ -0,0 +1,656 @@
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import unittest
+import bcrypt
+from unittest.mock import patch, MagicMock
+from Code.tcp_ip import tcp_driver
+from Code.tcp_ip.tcp_driver import TCPServer, TCPClient, TCP_ERROR_CODES
+from Code.tcp_ip.protocol import ConnectionState
+from Code.tcp_ip.async_server import AsyncTCPServer
+from Code.tcp_ip.idle_poller import IdleConnectionPoller
+from Code.tcp_ip.worker_pool import WorkerPool
+from Code.database.database import DatabaseServices
+from Code.database.migrations import MigrationRunner
+
+# Hash of the password "pw", with the lowest cost to keep the tests fast
+PASSWORD_HASH = bcrypt.hashpw(b"pw", bcrypt.gensalt(4)).decode()
+
+
+def build_request(command, **fields):
+    message = {
+        "header": {"Content-Type": "application/json", "Encoding": "utf-8"},
+        "request": {"command": command, **fields}
+    }
+    return json.dumps(message).encode() + b'\r\n'
+
+
+def send_and_receive(port, request):
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as client_socket:
+        client_socket.sendall(request)
+        data = b''
+        while True:
+            chunk = client_socket.recv(1024)
+            if not chunk:
+                break
+            data += chunk
+    return data
+
+
+class TestProcessRequest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = TCPServer("127.0.0.1", 0, new_user_window_instance=None)
+        tcp_driver.user_details_cache.clear()
+
+    def tearDown(self):
+        self.server.server_socket.close()
+
+    def test_invalid_json(self):
+        self.assertEqual(self.server.process_request("not a json"), b"Invalid JSON format\r\n")
+
+    def test_unknown_command(self):
+        message = build_request("unknown_command").decode().strip()
+        self.assertIsNone(self.server.process_request(message))
+
+    @patch.object(tcp_driver, 'database')
+    def test_find_user(self, mock_database):
+        mock_database.search_personal_info.return_value = [(2, 'Ben', 'Kowalsky', '2001-11-21')]
+        message = build_request("find_user", first_name="Ben", date_of_birth="21.11.2001").decode().strip()
+
+        response = json.loads(self.server.process_request(message))
+
+        mock_database.search_personal_info.assert_called_once_with(None, 'Ben', None, '2001-11-21',
+                                                                    columns=tcp_driver.SEARCH_RESULT_FIELDS)
+        self.assertEqual(response["command"], "search_successful")
+        self.assertEqual(response["user_info"][0]["last_name"], "Kowalsky")
+
+    @patch.object(tcp_driver, 'database')
+    def test_find_user_pages(self, mock_database):
+        mock_database.search_personal_info.return_value = [(national_id, 'Ben', 'Kowalsky', '2001-11-21')
+                                                            for national_id in (3, 5, 8)]
+        message = build_request("find_user", first_name="Ben", limit=2).decode().strip()
+
+        response = json.loads(self.server.process_request(message))
+
+        mock_database.search_personal_info.assert_called_once_with(
+            None, 'Ben', None, None, columns=tcp_driver.SEARCH_RESULT_FIELDS, limit=3, after_national_id=None)
+        self.assertEqual([user["national_id"] for user in response["user_info"]], [3, 5])
+        self.assertEqual(tcp_driver.decode_search_cursor(response["next_cursor"]), (5, None))
+
+        mock_database.search_personal_info.reset_mock()
+        mock_database.search_personal_info.return_value = [(8, 'Ben', 'Kowalsky', '2001-11-21')]
+        message = build_request("find_user", first_name="Ben", limit=2, cursor=response["next_cursor"])
+
+        response = json.loads(self.server.process_request(message.decode().strip()))
+
+        mock_database.search_personal_info.assert_called_once_with(
+            None, 'Ben', None, None, columns=tcp_driver.SEARCH_RESULT_FIELDS, limit=3, after_national_id=5)
+        self.assertIsNone(response["next_cursor"])
+
+    @patch.object(tcp_driver, 'database')
+    def test_find_user_invalid_cursor(self, mock_database):
+        message = build_request("find_user", first_name="Ben", limit=2, cursor="not a cursor").decode().strip()
+        response = json.loads(self.server.process_request(message))
+        self.assertEqual(response["command"], "search_unsuccessful")
+        mock_database.search_personal_info.assert_not_called()
+
+    @patch.object(tcp_driver, 'database')
+    def test_find_user_prefix_search(self, mock_database):
+        mock_database.prefix_match_expression.return_value = 'first_name : "be"*'
+        mock_database.search_personal_info_by_prefix.return_value = [
+            (national_id, 'Ben', 'Kowalsky', '2001-11-21', -1.5) for national_id in (3, 5, 8)]
+        message = build_request("find_user", first_name="Be", search_mode="prefix", limit=2).decode().strip()
+
+        response = json.loads(self.server.process_request(message))
+
+        mock_database.search_personal_info_by_prefix.assert_called_once_with(
+            'Be', None, columns=tcp_driver.SEARCH_RESULT_FIELDS, limit=3, after_national_id=None)
+        self.assertEqual([user["national_id"] for user in response["user_info"]], [3, 5])
+        self.assertEqual(tcp_driver.decode_search_cursor(response["next_cursor"]), (5, -1.5))
+
+        mock_database.search_personal_info_by_prefix.reset_mock()
+        message = build_request("find_user", first_name="Be", search_mode="prefix", limit=2,
+                                cursor=response["next_cursor"]).decode().strip()
+        self.server.process_request(message)
+        mock_database.search_personal_info_by_prefix.assert_called_once_with(
+            'Be', None, columns=tcp_driver.SEARCH_RESULT_FIELDS, limit=3, after_national_id=5, after_rank=-1.5)
+
+        # A cursor of an exact search cannot continue a ranked one
+        message = build_request("find_user", first_name="Be", search_mode="prefix", limit=2,
+                                cursor=tcp_driver.encode_search_cursor(5)).decode().strip()
+        self.assertEqual(json.loads(self.server.process_request(message))["message"], "Invalid cursor")
+        mock_database.search_personal_info.assert_not_called()
+
+    @patch.object(tcp_driver, 'database')
+    def test_find_user_fuzzy_search(self, mock_database):
+        mock_database.search_personal_info_fuzzy.return_value = [(2, 'Ben', 'Kowalsky', '2001-11-21', 1)]
+        mock_database.fuzzy_search_truncated.return_value = False
+        message = build_request("find_user", last_name="Kowalski", search_mode="fuzzy").decode().strip()
+
+        response = json.loads(self.server.process_request(message))
+
+        mock_database.search_personal_info_fuzzy.assert_called_once_with(
+            None, 'Kowalski', columns=tcp_driver.SEARCH_RESULT_FIELDS)
+        self.assertEqual(response["user_info"][0]["last_name"], "Kowalsky")
+        self.assertFalse(response["truncated"])
+
+        # Too common names are reported, the client asks for a more specific one
+        mock_database.fuzzy_search_truncated.return_value = True
+        message = build_request("find_user", last_name="Kowalski", search_mode="fuzzy", limit=5,
+                                stream=True).decode().strip()
+        mock_database.iter_personal_info_fuzzy.side_effect = lambda *args, **kwargs: (chunk for chunk in ())
+        messages = [json.loads(message) for message in self.server.process_request(message)]
+        self.assertEqual(messages, [{"command": "search_unsuccessful", "truncated": True}])
+        mock_database.fuzzy_search_truncated.assert_called_with(None, 'Kowalski')
+
+        message = build_request("find_user", national_id=2, search_mode="fuzzy").decode().strip()
+        self.assertEqual(json.loads(self.server.process_request(message))["command"], "search_unsuccessful")
+
+    @patch.object(tcp_driver, 'database')
+    def test_retrieve_user_details_is_cached(self, mock_database):
+        mock_database.in_transaction.return_value = False
+        mock_database.retrieve_user_details.return_value = [(2, 'Ben', 'Kowalsky', '2001-11-21', 'male', 'Sweden',
+                                                             '11122', 'Stockholm', 'Main', 12, '+46', 123456789,
+                                                             'single', 30, 50000, 0, 0, 0, 0, 0)]
+        message = build_request("retrieve_user_details", national_id=2).decode().strip()
+        hits = tcp_driver.user_details_cache.stats()["hits"]
+
+        first_response = self.server.process_request(message)
+        second_response = self.server.process_request(build_request("retrieve_user_details",
+                                                                    national_id="2").decode().strip())
+
+        self.assertEqual(first_response, second_response)
+        self.assertEqual(json.loads(first_response)["user_info"][0]["address_city"], "Stockholm")
+        mock_database.retrieve_user_details.assert_called_once_with(2, tcp_driver.TAXPAYER_COLUMNS)
+        self.assertEqual(tcp_driver.user_details_cache.stats()["hits"], hits + 1)
+
+        # Saving the user invalidates the cached response
+        tcp_driver.user_details_cache.invalidate([tcp_driver.user_details_cache_key("2")])
+        self.server.process_request(message)
+        self.assertEqual(mock_database.retrieve_user_details.call_count, 2)
+
+    @patch.object(tcp_driver, 'database')
+    def test_requested_fields(self, mock_database):
+        mock_database.search_personal_info.return_value = [(2, 'male')]
+        message = build_request("find_user", first_name="Ben", fields=["gender"]).decode().strip()
+
+        response = json.loads(self.server.process_request(message))
+
+        self.assertEqual(mock_database.search_personal_info.call_args.kwargs["columns"], ("national_id", "gender"))
+        self.assertEqual(response["user_info"], [{"national_id": 2, "gender": "male"}])
+
+        message = build_request("find_user", first_name="Ben", fields=["password"]).decode().strip()
+        self.assertEqual(json.loads(self.server.process_request(message))["command"], "search_unsuccessful")
+        self.assertEqual(mock_database.search_personal_info.call_count, 1)
+
+    @patch.object(tcp_driver, 'database')
+    def test_retrieve_user_details_fields_from_cache(self, mock_database):
+        mock_database.in_transaction.return_value = False
+        mock_database.retrieve_user_details.return_value = [(2, 'Ben', 'Kowalsky', '2001-11-21', 'male', 'Sweden',
+                                                             '11122', 'Stockholm', 'Main', 12, '+46', 123456789,
+                                                             'single', 30, 50000, 0, 0, 0, 0, 0)]
+        self.server.process_request(build_request("retrieve_user_details", national_id=2).decode().strip())
+
+        response = json.loads(self.server.process_request(
+            build_request("retrieve_user_details", national_id=2, fields=["yearly_income"]).decode().strip()))
+
+        self.assertEqual(response["user_info"], [{"national_id": 2, "yearly_income": 50000}])
+        self.assertEqual(mock_database.retrieve_user_details.call_count, 1)
+
+    @patch.object(tcp_driver, 'database')
+    def test_import_taxpayers_outside_import_directory(self, mock_database):
+        message = build_request("import_taxpayers", file_name="../database/taxpayers.db").decode().strip()
+        response = json.loads(self.server.process_request(message))
+        self.assertEqual(response["command"], "import_unsuccessful")
+        mock_database.save_many_to_sql.assert_not_called()
+
+    @patch.object(tcp_driver, 'database')
+    def test_login_without_password(self, mock_database):
+        message = build_request("login_request", username="Guest").decode().strip()
+        response = self.server.process_request(message)
+        self.assertEqual(response, b"Username and password must be provided\r\n")
+        mock_database.get_password_hash.assert_not_called()
+
+    @patch.object(tcp_driver, 'database')
+    def test_login_verifies_password_outside_database_lock(self, mock_database):
+        mock_database.get_password_hash.return_value = PASSWORD_HASH
+        lock_stats = []
+        verify = self.server.password_verifier.verify
+
+        def verify_and_record_lock(password, hashed_password):
+            lock_stats.append(tcp_driver.db_lock.stats())
+            return verify(password, hashed_password)
+
+        with patch.object(self.server.password_verifier, 'verify', side_effect=verify_and_record_lock):
+            response = self.server.process_request(
+                build_request("login_request", username="Guest", password="wrong").decode().strip())
+
+        self.assertEqual(response, b"Invalid username or password\r\n")
+        self.assertEqual(lock_stats[0]["active_readers"], 0)
+        self.assertEqual(self.server.get_stats()["password_verifier"]["completed"], 1)
+
+    @patch.object(tcp_driver, 'database')
+    def test_login_rate_limited(self, mock_database):
+        mock_database.get_password_hash.return_value = PASSWORD_HASH
+        connection = ConnectionState(("10.0.0.1", 50000))
+        responses = [self.server.process_request(
+            build_request("login_request", username=f"user{attempt}", password="wrong").decode().strip(), connection)
+            for attempt in range(6)]
+
+        self.assertEqual(responses[:5], [b"Invalid username or password\r\n"] * 5)
+        self.assertEqual(json.loads(responses[5])["command"], "login_rate_limited")
+        self.assertEqual(mock_database.get_password_hash.call_count, 5)
+
+        # Another address is limited by the attempts on the same username
+        connection = ConnectionState(("10.0.0.2", 50000))
+        for attempt in range(6):
+            response = self.server.process_request(
+                build_request("login_request", username="Guest", password="wrong").decode().strip(), connection)
+        self.assertEqual(json.loads(response)["command"], "login_rate_limited")
+        self.assertEqual(mock_database.get_password_hash.call_count, 10)
+
+    @patch.object(tcp_driver, 'database')
+    def test_session_token_required(self, mock_database):
+        mock_database.get_password_hash.return_value = PASSWORD_HASH
+        mock_database.search_personal_info.return_value = []
+        self.server.require_session = True
+        find_request = json.loads(build_request("find_user", first_name="Nobody"))
+
+        response = json.loads(self.server.process_request(json.dumps(find_request)))
+        self.assertEqual(response["command"], "session_invalid")
+        mock_database.search_personal_info.assert_not_called()
+
+        login = json.loads(self.server.process_request(
+            build_request("login_request", username="Guest", password="pw").decode().strip()))
+        self.assertEqual(login["command"], "login_successful")
+        find_request["header"][tcp_driver.SESSION_TOKEN_HEADER] = login["token"]
+
+        response = json.loads(self.server.process_request(json.dumps(find_request)))
+        self.assertEqual(response, {"command": "search_unsuccessful"})
+        self.assertEqual(mock_database.get_password_hash.call_count, 1)
+
+    def test_keep_alive_header(self):
+        connection = ConnectionState()
+        message = json.loads(build_request("unknown_command"))
+        message["header"]["Connection"] = "keep-alive"
+        self.server.process_request(json.dumps(message), connection)
+        self.assertTrue(connection.keep_alive)
+
+        self.server.process_request(build_request("unknown_command").decode().strip(), connection)
+        self.assertFalse(connection.keep_alive)
+        self.assertEqual(connection.requests, 2)
+
+    @patch.object(tcp_driver, 'database')
+    def test_batch(self, mock_database):
+        mock_database.search_personal_info.return_value = [(2, 'Ben', 'Kowalsky', '2001-11-21')]
+        mock_database.retrieve_user_details.return_value = []
+        message = build_request("batch", requests=[
+            {"command": "find_user", "first_name": "Ben"},
+            {"command": "retrieve_user_details", "national_id": 2}
+        ]).decode().strip()
+
+        response = json.loads(self.server.process_request(message))
+
+        self.assertEqual(response["command"], "batch_successful")
+        self.assertEqual([result.get("command") for result in response["results"]],
+                         ["search_successful", "retrieving_unsuccessful"])
+        mock_database.transaction.assert_called_once()
+
+    @patch.object(tcp_driver, 'database')
+    def test_batch_aborted_by_failed_request(self, mock_database):
+        mock_database.search_personal_info.return_value = []
+        message = build_request("batch", requests=[
+            {"command": "find_user", "first_name": "Nobody"},
+            {"command": "no_such_command"},
+            {"command": "find_user", "first_name": "Ben"}
+        ]).decode().strip()
+
+        response = json.loads(self.server.process_request(message))
+
+        self.assertEqual(response["command"], "batch_unsuccessful")
+        self.assertEqual(response["failed_request"], 1)
+        self.assertEqual(response["result"]["status"], "error")
+        mock_database.search_personal_info.assert_called_once()
+
+    @patch.object(tcp_driver, 'database')
+    def test_batch_failure(self, mock_database):
+        mock_database.search_personal_info.side_effect = RuntimeError("database is locked")
+        message = build_request("batch", requests=[{"command": "find_user", "first_name": "Ben"}]).decode().strip()
+        response = json.loads(self.server.process_request(message))
+        self.assertEqual(response, {"command": "batch_unsuccessful", "message": "database is locked"})
+
+        for requests in ([], [{"command": "batch", "requests": []}], ["find_user"]):
+            message = build_request("batch", requests=requests).decode().strip()
+            response = json.loads(self.server.process_request(message))
+            self.assertEqual(response["command"], "batch_unsuccessful")
+
+    @patch.object(tcp_driver, 'database')
+    def test_batch_rejects_import(self, mock_database):
+        message = build_request("batch", requests=[
+            {"command": "find_user", "first_name": "Ben"},
+            {"command": "import_taxpayers", "file_name": "taxpayers.csv"}
+        ]).decode().strip()
+
+        response = json.loads(self.server.process_request(message))
+
+        self.assertEqual(response, {"command": "batch_unsuccessful", "message": "Imports cannot be sent in a batch"})
+        mock_database.transaction.assert_not_called()
+        mock_database.search_personal_info.assert_not_called()
+
+    @patch.object(tcp_driver, 'database')
+    def test_stream_releases_lock_between_chunks(self, mock_database):
+        rows = [(national_id, 'Ben', 'Kowalsky', '2001-11-21') for national_id in range(1, 5)]
+        mock_database.iter_personal_info.side_effect = lambda *args, **kwargs: (chunk for chunk in (rows[:2], rows[2:]))
+        message = build_request("find_user", first_name="Ben", stream=True).decode().strip()
+
+        messages = self.server.process_request(message)
+        self.assertEqual(len(json.loads(next(messages))["user_info"]), 2)
+        # The stream waits for the client, a writer must not be held back meanwhile
+        self.assertEqual(tcp_driver.db_lock.stats()["active_readers"], 0)
+
+        final_message = json.loads(list(messages)[-1])
+        self.assertEqual(final_message["count"], 4)
+
+    def test_server_stats(self):
+        self.server.register_stats_provider("worker_pool", lambda: {"rejected": 3})
+        message = build_request("server_stats").decode().strip()
+        response = json.loads(self.server.process_request(message))
+        self.assertEqual(response["command"], "server_stats")
+        self.assertEqual(response["stats"]["worker_pool"], {"rejected": 3})
+        self.assertIn("db_lock", response["stats"])
+        self.assertEqual(response["stats"]["commands"]["server_stats"]["calls"], 0)
+
+    def test_registered_command(self):
+        self.server.register_command("echo", lambda request_data: {"echo": request_data["request"]["text"]})
+        message = build_request("echo", text="hello").decode().strip()
+        self.assertEqual(json.loads(self.server.process_request(message)), {"echo": "hello"})
+        self.assertEqual(self.server.get_stats()["commands"]["echo"]["calls"], 1)
+
+    def test_reject_busy(self):
+        server_side, client_side = socket.socketpair()
+        with client_side:
+            self.server.reject_busy(server_side)
+            response = json.loads(client_side.recv(1024))
+        self.assertEqual(response["command"], "server_busy")
+        self.assertEqual(response["status"], "error")
+
+
+class TestBatchTransaction(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.temp_dir.name, 'batch.db')
+        sql_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Code', 'database')
+        with sqlite3.connect(self.db_file) as conn:
+            for seed_file in ('personal_info.sql', 'contact_info.sql', 'tax_info.sql'):
+                with open(os.path.join(sql_dir, seed_file), 'r') as sql_file:
+                    conn.executescript(sql_file.read())
+        conn.close()
+        MigrationRunner(self.db_file, MagicMock()).run()
+        self.db_services = DatabaseServices(db_file=self.db_file, tms_logger=MagicMock())
+        self.server = TCPServer("127.0.0.1", 0, new_user_window_instance=None)
+
+    def tearDown(self):
+        self.server.server_socket.close()
+        self.db_services.close()
+        self.temp_dir.cleanup()
+
+    @staticmethod
+    def save_request(national_id):
+        return {"command": "save_new_user", "national_id": national_id, "first_name": "Ben",
+                "last_name": "Kowalsky", "date_of_birth": "2001-11-21", "gender": "male",
+                "address_country": "Poland", "phone_number": 123, "marital_status": "single"}
+
+    def test_failed_save_rolls_back_batch(self):
+        message = build_request("batch", requests=[self.save_request(5000), self.save_request(1)]).decode().strip()
+
+        with patch.object(tcp_driver, 'database', self.db_services):
+            response = json.loads(self.server.process_request(message))
+
+        self.assertEqual(response["command"], "batch_unsuccessful")
+        self.assertEqual(response["failed_request"], 1)
+        for table in ("personal_info", "contact_info", "tax_info"):
+            rows = self.db_services.execute_query(f"SELECT COUNT(*) FROM {table} WHERE national_id = 5000")
+            self.assertEqual(rows[0][0], 0)
+
+    def test_successful_batch_is_committed(self):
+        message = build_request("batch", requests=[self.save_request(5000), self.save_request(5001)])
+
+        with patch.object(tcp_driver, 'database', self.db_services):
+            response = json.loads(self.server.process_request(message.decode().strip()))
+
+        self.assertEqual(response["command"], "batch_successful")
+        rows = self.db_services.execute_query("SELECT COUNT(*) FROM personal_info WHERE national_id >= 5000")
+        self.assertEqual(rows[0][0], 2)
+
+
+class TestServerEngines(unittest.TestCase):
+
+    def setUp(self):
+        self.server = TCPServer("127.0.0.1", 0, new_user_window_instance=None)
+        self.port = self.server.server_socket.getsockname()[1]
+
+    def tearDown(self):
+        self.server.server_socket.close()
+
+    @patch.object(tcp_driver, 'database')
+    def test_threaded_engine(self, mock_database):
+        mock_database.search_personal_info.return_value = []
+
+        def accept_once():
+            client_socket, _ = self.server.server_socket.accept()
+            self.server.handle_request_match(client_socket)
+
+        accept_thread = threading.Thread(target=accept_once)
+        accept_thread.start()
+        response = send_and_receive(self.port, build_request("find_user", first_name="Nobody"))
+        accept_thread.join()
+
+        self.assertEqual(json.loads(response), {"command": "search_unsuccessful"})
+
+    def test_silent_connection_times_out(self):
+        self.server.idle_timeout = 0.05
+
+        def accept_once():
+            client_socket, _ = self.server.server_socket.accept()
+            self.server.handle_request_match(client_socket)
+
+        accept_thread = threading.Thread(target=accept_once)
+        accept_thread.start()
+        with socket.create_connection(("127.0.0.1", self.port), timeout=5) as client_socket:
+            # The worker gives up the connection although no request has been sent
+            accept_thread.join(timeout=5)
+            self.assertFalse(accept_thread.is_alive())
+            self.assertEqual(client_socket.recv(1024), b'')
+
+    @patch.object(tcp_driver, 'database')
+    def test_asyncio_engine(self, mock_database):
+        mock_database.get_password_hash.return_value = PASSWORD_HASH
+        async_server = AsyncTCPServer(self.server, executor_workers=2)
+        engine_thread = threading.Thread(target=async_server.run, daemon=True)
+        engine_thread.start()
+
+        responses = [send_and_receive(self.port, build_request("login_request", username="Guest", password="pw"))
+                     for _ in range(3)]
+
+        self.assertEqual([json.loads(response)["command"] for response in responses], ["login_successful"] * 3)
+        self.assertEqual(mock_database.get_password_hash.call_count, 3)
+
+        client = TCPClient(MagicMock(), "127.0.0.1", self.port)
+        try:
+            for _ in range(2):
+                response = client.send_request(build_request("login_request", username="Guest", password="pw"))
+                self.assertEqual(json.loads(response["response"])["message"], "User logged in successfully")
+        finally:
+            client.close()
+
+
+class TestIdlePolling(unittest.TestCase):
+
+    def setUp(self):
+        self.server = TCPServer("127.0.0.1", 0, new_user_window_instance=None, idle_timeout=5)
+        self.port = self.server.server_socket.getsockname()[1]
+        self.worker_pool = WorkerPool(self.server.handle_request_match, self.server.reject_busy,
+                                      pool_size=1, queue_size=4, server_logger=MagicMock())
+        self.worker_pool.start()
+        self.server.idle_poller = IdleConnectionPoller(self.worker_pool.submit, self.server.idle_timeout, MagicMock())
+        self.server.idle_poller.start()
+
+        def serve():
+            while True:
+                try:
+                    client_socket, _ = self.server.server_socket.accept()
+                except OSError:
+                    break
+                self.worker_pool.submit(client_socket)
+
+        threading.Thread(target=serve, daemon=True).start()
+
+    def tearDown(self):
+        self.server.server_socket.close()
+        self.server.idle_poller.stop()
+        self.worker_pool.stop()
+
+    @patch.object(tcp_driver, 'database')
+    def test_idle_connection_does_not_hold_worker(self, mock_database):
+        mock_database.search_personal_info.return_value = []
+        message = json.loads(build_request("find_user", first_name="Nobody"))
+        message["header"]["Connection"] = "keep-alive"
+        request = json.dumps(message).encode() + b'\r\n'
+
+        clients = [socket.create_connection(("127.0.0.1", self.port), timeout=2) for _ in range(2)]
+        try:
+            # A single worker serves both kept alive connections in turn, well before the idle timeout
+            for _ in range(3):
+                for client_socket in clients:
+                    client_socket.sendall(request)
+                    response = b''
+                    while not response.endswith(b'\r\n'):
+                        chunk = client_socket.recv(1024)
+                        self.assertTrue(chunk)
+                        response += chunk
+                    self.assertEqual(json.loads(response), {"command": "search_unsuccessful"})
+
+            # The worker parks a connection right after sending its response
+            for _ in range(100):
+                stats = self.server.idle_poller.stats()
+                if stats["parked"] == 6:
+                    break
+                threading.Event().wait(0.01)
+            self.assertEqual(stats["idle_connections"], 2)
+            self.assertEqual(stats["resumed"], 4)
+        finally:
+            for client_socket in clients:
+                client_socket.close()
+
+
+class TestKeepAlive(unittest.TestCase):
+
+    def setUp(self):
+        self.server = TCPServer("127.0.0.1", 0, new_user_window_instance=None, idle_timeout=5)
+        self.port = self.server.server_socket.getsockname()[1]
+        self.client = TCPClient(MagicMock(), "127.0.0.1", self.port)
+        self.accepted = 0
+
+        def serve():
+            while True:
+                try:
+                    client_socket, _ = self.server.server_socket.accept()
+                except OSError:
+                    break
+                self.accepted += 1
+                threading.Thread(target=self.server.handle_request_match, args=(client_socket,), daemon=True).start()
+
+        threading.Thread(target=serve, daemon=True).start()
+
+    def tearDown(self):
+        self.client.close()
+        self.server.server_socket.close()
+
+    @patch.object(tcp_driver, 'database')
+    def test_requests_reuse_connection(self, mock_database):
+        mock_database.search_personal_info.return_value = []
+        for _ in range(3):
+            response = self.client.send_request(build_request("find_user", first_name="Nobody"))
+            self.assertEqual(response["error"], TCP_ERROR_CODES["No error"])
+            self.assertEqual(json.loads(response["response"]), {"command": "search_unsuccessful"})
+        self.assertEqual(self.accepted, 1)
+
+    @patch.object(tcp_driver, 'database')
+    def test_reconnects_after_server_closed_connection(self, mock_database):
+        mock_database.get_password_hash.return_value = PASSWORD_HASH
+        self.server.idle_timeout = 0.05
+        request = build_request("login_request", username="Guest", password="wrong")
+
+        self.assertEqual(self.client.send_request(request)["response"], "Invalid username or password")
+        threading.Event().wait(0.2)
+        self.assertEqual(self.client.send_request(request)["response"], "Invalid username or password")
+        self.assertEqual(self.accepted, 2)
+
+    @patch.object(tcp_driver, 'database')
+    def test_large_response_arrives_whole(self, mock_database):
+        rows = [(national_id, 'Ben', 'Kowalsky', '2001-11-21') for national_id in range(2000)]
+        mock_database.search_personal_info.return_value = rows
+        request = build_request("find_user", first_name="Ben")
+
+        for framing in ("length-prefixed", "delimiter"):
+            self.client.set_framing(framing)
+            for _ in range(2):
+                response = json.loads(self.client.send_request(request)["response"])
+                self.assertEqual(len(response["user_info"]), 2000)
+        self.assertEqual(self.accepted, 2)
+
+    @patch.object(tcp_driver, 'database')
+    def test_send_batch(self, mock_database):
+        mock_database.search_personal_info.return_value = []
+        response = self.client.send_batch([{"command": "find_user", "first_name": "Nobody"}] * 3)
+        self.assertEqual(response["error"], TCP_ERROR_CODES["No error"])
+        self.assertEqual(response["response"], [{"command": "search_unsuccessful"}] * 3)
+
+        response = self.client.send_batch([])
+        self.assertEqual(response, {"error": TCP_ERROR_CODES["Batch request error"], "response": None})
+
+    @patch.object(tcp_driver, 'database')
+    def test_streamed_search(self, mock_database):
+        mock_database.search_personal_info.return_value = []
+        rows = [(national_id, 'Ben', 'Kowalsky', '2001-11-21') for national_id in range(1, 8)]
+        mock_database.iter_personal_info.side_effect = lambda *args, **kwargs: (rows[start:start + 3]
+                                                                               for start in range(0, 7, 3))
+        request = build_request("find_user", first_name="Ben", limit=6, stream=True)
+
+        for framing in ("length-prefixed", "delimiter"):
+            self.client.set_framing(framing)
+            partial_messages = []
+            response = self.client.send_stream_request(request, partial_messages.append)
+
+            final_message = json.loads(response["response"])
+            self.assertEqual(final_message["command"], "search_successful")
+            self.assertEqual(final_message["count"], 6)
+            self.assertEqual(tcp_driver.decode_search_cursor(final_message["next_cursor"]), (6, None))
+            self.assertEqual([len(message["user_info"]) for message in partial_messages], [3, 3])
+
+            # The connection is reused after the stream
+            response = self.client.send_request(build_request("find_user", first_name="Nobody"))
+            self.assertEqual(json.loads(response["response"]), {"command": "search_unsuccessful"})
+        self.assertEqual(self.accepted, 2)
+        mock_database.iter_personal_info.assert_called_with(None, 'Ben', None, None,
+                                                            columns=tcp_driver.SEARCH_RESULT_FIELDS, limit=7,
+                                                            after_national_id=None,
+                                                            chunk_size=tcp_driver.SEARCH_STREAM_CHUNK_SIZE)
+
+    def test_connection_error(self):
+        with socket.socket() as unused_socket:
+            unused_socket.bind(("127.0.0.1", 0))
+            unused_port = unused_socket.getsockname()[1]
+        self.client.set_port(unused_port)
+        response = self.client.send_request(build_request("find_user"))
+        self.assertEqual(response["error"], TCP_ERROR_CODES["TCP Connection error"])
+        self.assertFalse(self.client.is_busy())
+
+
+if __name__ == '__main__':
+    unittest.main()
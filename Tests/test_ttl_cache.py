@@ -0,0 +1,56 @@
+import unittest
+from Code.utils.ttl_cache import TTLCache
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TTLCache(max_size=2, ttl=10.0, clock=self.clock)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.put(1, "one")
+        self.cache.put(2, "two")
+        self.assertEqual(self.cache.get(1), "one")
+        self.cache.put(3, "three")
+
+        self.assertIsNone(self.cache.get(2))
+        self.assertEqual(self.cache.get(1), "one")
+        self.assertEqual(self.cache.get(3), "three")
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_entries_expire(self):
+        self.cache.put(1, "one")
+        self.clock.now = 9.9
+        self.assertEqual(self.cache.get(1), "one")
+        self.clock.now = 10.0
+        self.assertIsNone(self.cache.get(1))
+        stats = self.cache.stats()
+        self.assertEqual((stats["size"], stats["hits"], stats["misses"], stats["expirations"]), (0, 1, 1, 1))
+
+    def test_invalidate(self):
+        self.cache.put(1, "one")
+        self.cache.put(2, "two")
+        self.cache.invalidate([1, 5])
+        self.assertIsNone(self.cache.get(1))
+        self.assertEqual(self.cache.get(2), "two")
+        self.cache.clear()
+        self.assertEqual(self.cache.stats()["invalidations"], 2)
+
+    def test_disabled_cache(self):
+        cache = TTLCache(max_size=0)
+        cache.put(1, "one")
+        self.assertIsNone(cache.get(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
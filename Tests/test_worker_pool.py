@@ -0,0 +1,58 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+from Code.tcp_ip.worker_pool import WorkerPool
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.handled = []
+        self.rejected = []
+
+        def handler(client_socket_):
+            self.started.set()
+            self.release.wait(5)
+            self.handled.append(client_socket_)
+
+        self.pool = WorkerPool(handler, self.rejected.append, pool_size=1, queue_size=1, server_logger=MagicMock())
+        self.pool.start()
+
+    def tearDown(self):
+        self.release.set()
+        self.pool.stop()
+
+    def test_rejects_when_queue_is_full(self):
+        self.assertTrue(self.pool.submit("first"))
+        self.started.wait(5)
+        self.assertTrue(self.pool.submit("second"))
+        self.assertFalse(self.pool.submit("third"))
+
+        self.assertEqual(self.rejected, ["third"])
+        stats = self.pool.stats()
+        self.assertEqual(stats["pool_size"], 1)
+        self.assertEqual(stats["queue_depth"], 1)
+        self.assertEqual(stats["active_workers"], 1)
+        self.assertEqual(stats["rejected"], 1)
+
+    def test_handles_queued_connections(self):
+        self.pool.submit("first")
+        self.started.wait(5)
+        self.pool.submit("second")
+        self.release.set()
+        self.pool.stop()
+
+        self.assertEqual(self.handled, ["first", "second"])
+        self.assertEqual(self.pool.stats()["completed"], 2)
+
+    def test_invalid_sizes(self):
+        with self.assertRaises(ValueError):
+            WorkerPool(print, print, pool_size=0, queue_size=1, server_logger=MagicMock())
+        with self.assertRaises(ValueError):
+            WorkerPool(print, print, pool_size=1, queue_size=0, server_logger=MagicMock())
+
+
+if __name__ == '__main__':
+    unittest.main()